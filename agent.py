@@ -4,25 +4,45 @@ from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from langchain_community.utilities.sql_database import SQLDatabase
 
-from langchain_openai import ChatOpenAI
-import os
+from database import Base, engine, readonly_engine
+from llm_client import get_chat_model
+from sql_guard import MAX_ROWS, run_guarded
+import models  # registers the tables on Base
 
 load_dotenv()
 
-# Make sure this path points to your existing SQLite DB file
-sqlite_db_path = "sqlite:///./employees.db"
-
 system_prompt = """
 You are a helpful assistant that answers questions about employee data using SQL.
 
 Always try to generate a SQL query, even if you're unsure. Never respond with "I don't know".
+Rows in employees with a non-null deleted_at have been removed upstream; always filter on deleted_at IS NULL.
 """
 
+
+class GuardedSQLDatabase(SQLDatabase):
+    """SQLDatabase that runs every query through the read-only guard in sql_guard."""
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        if not isinstance(command, str) or parameters:
+            raise ValueError("Only plain SQL strings are supported")
+
+        columns, rows, truncated = run_guarded(self._engine, command)
+        result = [dict(zip(columns, row)) for row in rows]
+        if fetch == "one":
+            return result[:1]
+        if truncated:
+            result.append({"note": f"result truncated to the first {MAX_ROWS} rows"})
+        return result
+
+
+# The read-only connection cannot create the database file, so make sure the schema exists first
+Base.metadata.create_all(bind=engine)
+
 # Setup LangChain LLM
-llm = ChatOpenAI(model="gpt-4o-mini") 
+llm = get_chat_model("agent")
 
 # Setup LangChain SQL Database wrapper
-db = SQLDatabase.from_uri(sqlite_db_path)
+db = GuardedSQLDatabase(readonly_engine)
 
 # Create agent with SQL toolkit
 sql_agent = create_sql_agent(
@@ -31,4 +51,4 @@ sql_agent = create_sql_agent(
     verbose=True,
     handle_parsing_errors=True,  # Add this argument
     prefix=system_prompt
-)
\ No newline at end of file
+)
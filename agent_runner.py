@@ -0,0 +1,159 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from agent import sql_agent
+from metrics import metrics
+
+ASK_MAX_IN_FLIGHT = int(os.getenv("ASK_MAX_IN_FLIGHT", "4"))
+ASK_MAX_QUEUE = int(os.getenv("ASK_MAX_QUEUE", "16"))
+ASK_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ASK_QUEUE_TIMEOUT_SECONDS", "30"))
+
+
+class AgentBusy(Exception):
+    status_code = 429
+
+
+class AgentQueueTimeout(Exception):
+    status_code = 503
+
+
+def question_key(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+class AgentRunner:
+    """Runs agent questions on a dedicated bounded pool, away from the request threadpool.
+
+    Identical questions that are already queued or running share one run. Pool jobs and streamed answers
+    take slots from one semaphore, so together they never run more than max_in_flight agents."""
+
+    def __init__(self, agent, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.agent = agent
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="agent")
+        self._slots = threading.Semaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._in_flight: dict[str, Future] = {}
+
+    def _publish(self):
+        metrics.set_gauge("ask.in_flight", self._running)
+        metrics.set_gauge("ask.queue_depth", self._pending - self._running)
+
+    def _admit(self):
+        if self._pending >= self.max_in_flight + self.max_queue:
+            metrics.incr("ask.rejected.queue_full")
+            raise AgentBusy("Too many questions in flight, try again shortly")
+        self._pending += 1
+        self._publish()
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            self._publish()
+
+    def _take_slot(self, enqueued_at: float):
+        # Streams hold slots outside the pool, so a pool worker may still have to wait for one
+        remaining = enqueued_at + self.queue_timeout - time.monotonic()
+        if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+            waited = time.monotonic() - enqueued_at
+            metrics.incr("ask.rejected.queue_timeout")
+            raise AgentQueueTimeout(f"Question waited {waited:.1f}s in the queue")
+        metrics.observe("ask.queue_wait_seconds", time.monotonic() - enqueued_at)
+        with self._lock:
+            self._running += 1
+            self._publish()
+
+    def _give_slot(self):
+        with self._lock:
+            self._running -= 1
+            self._publish()
+        self._slots.release()
+
+    def _run(self, question: str, enqueued_at: float) -> str:
+        self._take_slot(enqueued_at)
+        started = time.perf_counter()
+        try:
+            raw_answer = self.agent.invoke(question)
+        finally:
+            metrics.observe("ask.run_seconds", time.perf_counter() - started)
+            self._give_slot()
+
+        # The agent returns a dict with the answer under "output"
+        if isinstance(raw_answer, dict):
+            raw_answer = raw_answer.get("output", raw_answer)
+        return raw_answer.strip() if isinstance(raw_answer, str) else str(raw_answer)
+
+    def submit(self, question: str) -> Future:
+        key = question_key(question)
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                metrics.incr("ask.coalesced")
+                return existing
+
+            self._admit()
+            enqueued_at = time.monotonic()
+            future = self._executor.submit(self._run, question, enqueued_at)
+            future.enqueued_at = enqueued_at
+            self._in_flight[key] = future
+
+        def _done(_):
+            with self._lock:
+                self._in_flight.pop(key, None)
+            self._release()
+
+        future.add_done_callback(_done)
+        return future
+
+    async def answer(self, question: str) -> str:
+        """Submits a question and waits for its answer, giving up if it is still queued after the queue timeout."""
+        future = self.submit(question)
+        waiting = asyncio.shield(asyncio.wrap_future(future))
+        try:
+            remaining = max(0.0, future.enqueued_at + self.queue_timeout - time.monotonic())
+            return await asyncio.wait_for(waiting, remaining)
+        except asyncio.TimeoutError:
+            # cancel() only succeeds while no worker has picked the job up; a running job is waited for
+            if future.cancel():
+                metrics.incr("ask.rejected.queue_timeout")
+                raise AgentQueueTimeout(f"Question waited {self.queue_timeout:.1f}s in the queue")
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Another caller sharing this run cancelled it at its queue deadline
+            if future.cancelled():
+                raise AgentQueueTimeout(f"Question waited {self.queue_timeout:.1f}s in the queue")
+            raise
+
+    def reserve(self):
+        """Takes one slot for work that runs outside the pool, like streamed answers, and returns its release.
+
+        Blocks for up to the queue timeout; the release may be called more than once."""
+        with self._lock:
+            self._admit()
+        try:
+            self._take_slot(time.monotonic())
+        except AgentQueueTimeout:
+            self._release()
+            raise
+
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+            self._give_slot()
+            self._release()
+
+        return release
+
+# Global instance
+agent_runner = AgentRunner(sql_agent, ASK_MAX_IN_FLIGHT, ASK_MAX_QUEUE, ASK_QUEUE_TIMEOUT_SECONDS)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+from agent_runner import AgentRunner, question_key
+from ask_templates import answer_from_template
+from metrics import metrics
+from sql_guard import SQLGuardError
+
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "200"))
+
+
+async def _answer(runner: AgentRunner, question: str, limit: asyncio.Semaphore) -> dict:
+    try:
+        local = await run_in_threadpool(answer_from_template, question)
+        if local is not None:
+            metrics.incr("ask.batch.template_answers")
+            return {"answer": local, "answered_by": "template"}
+
+        # Keep a batch from filling the shared agent queue on its own
+        async with limit:
+            answer = await runner.answer(question)
+        return {"answer": answer, "answered_by": "agent"}
+
+    except SQLGuardError as e:
+        return {"error": e.to_dict()}
+    except Exception as e:
+        return {"error": {"code": type(e).__name__, "message": str(e)}}
+
+
+async def stream_batch_answers(
+    runner: AgentRunner, questions: list[str], on_complete: Callable[[list[tuple[str, str]]], None]
+) -> AsyncIterator[str]:
+    """Answers deduplicated questions concurrently, yielding one NDJSON line per question as it finishes.
+
+    on_complete receives every (question, answer) pair produced, even when the client leaves mid-batch;
+    it runs inline, so it must only hand the pairs off."""
+    started = time.perf_counter()
+
+    positions: dict[str, list[int]] = {}
+    unique: dict[str, str] = {}
+    for index, question in enumerate(questions):
+        key = question_key(question)
+        positions.setdefault(key, []).append(index)
+        unique.setdefault(key, question)
+
+    metrics.incr("ask.batch.questions", len(questions))
+    metrics.incr("ask.batch.deduplicated", len(questions) - len(unique))
+
+    limit = asyncio.Semaphore(runner.max_in_flight)
+
+    async def run(key: str, question: str):
+        return key, await _answer(runner, question, limit)
+
+    tasks = [asyncio.create_task(run(key, question)) for key, question in unique.items()]
+    answered = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, result = await next_done
+            if "answer" in result:
+                answered.extend((questions[i], result["answer"]) for i in positions[key])
+            for index in positions[key]:
+                yield json.dumps({"index": index, "question": questions[index], **result}, default=str) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        # A disconnect cancels the generator here, where awaiting is no longer possible
+        on_complete(answered)
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("ask.batch.seconds", elapsed)
+    yield json.dumps({"done": True, "count": len(questions), "unique": len(unique), "seconds": round(elapsed, 3)}) + "\n"
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Callable
+
+from metrics import metrics
+from sql_guard import SQLGuardError
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+SQL_QUERY_TOOL = "sql_db_query"
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_agent_answer(agent, question: str, on_answer: Callable[[str], None]) -> AsyncIterator[str]:
+    """Streams agent progress as SSE events: start, sql, result, token, answer, error.
+
+    When the client goes away StreamingResponse cancels this generator, which stops the agent run."""
+    started = time.perf_counter()
+    yield sse_event("start", {"question": question})
+
+    events = agent.astream_events({"input": question}, version="v2")
+    llm_text = ""
+    answer_started = False
+
+    try:
+        async for event in events:
+            kind = event["event"]
+            if kind == "on_chain_stream" and not event.get("parent_ids"):
+                # The executor's planned actions carry the query; a tool's start event drops string inputs
+                chunk = event["data"].get("chunk")
+                for action in chunk.get("actions", []) if isinstance(chunk, dict) else []:
+                    if action.tool == SQL_QUERY_TOOL:
+                        yield sse_event("sql", {"query": action.tool_input})
+
+            elif kind == "on_tool_end" and event["name"] == SQL_QUERY_TOOL:
+                yield sse_event("result", {"output": str(event["data"].get("output"))})
+
+            elif kind == "on_chat_model_start":
+                llm_text = ""
+
+            elif kind == "on_chat_model_stream":
+                text = event["data"]["chunk"].content
+                if not text:
+                    continue
+                if answer_started:
+                    yield sse_event("token", {"text": text})
+                    continue
+
+                # Only tokens after the ReAct "Final Answer:" marker belong to the answer
+                llm_text += text
+                marker = llm_text.find(FINAL_ANSWER_MARKER)
+                if marker != -1:
+                    answer_started = True
+                    if first_token := llm_text[marker + len(FINAL_ANSWER_MARKER):].lstrip():
+                        yield sse_event("token", {"text": first_token})
+
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                output = event["data"].get("output") or {}
+                answer = str(output.get("output", "")).strip() if isinstance(output, dict) else str(output).strip()
+                on_answer(answer)
+                yield sse_event("answer", {"question": question, "answer": answer})
+
+    except (asyncio.CancelledError, GeneratorExit):
+        metrics.incr("ask.stream.disconnects")
+        raise
+    except SQLGuardError as e:
+        yield sse_event("error", e.to_dict())
+    except Exception as e:
+        yield sse_event("error", {"code": "agent_error", "message": str(e)})
+    finally:
+        # Closing the event stream cancels the underlying agent run
+        await events.aclose()
+        metrics.observe("ask.stream.seconds", time.perf_counter() - started)
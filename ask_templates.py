@@ -0,0 +1,65 @@
+import re
+
+from database import readonly_engine
+from sql_guard import run_guarded
+
+_SCOPE = r"(?:\s+(?:in|at|from|for)\s+(?:the\s+)?(?P<scope>[\w&.\- ]+?)(?:\s+(?:department|dept|office|location|team))?)?"
+
+# (pattern, sql without scope, sql with scope, answer format)
+TEMPLATES = [
+    (
+        re.compile(rf"^how many (?:employees|people|staff)(?: are there| do we have| work)?{_SCOPE}$"),
+        "SELECT COUNT(*) FROM employees WHERE deleted_at IS NULL",
+        "SELECT COUNT(*) FROM employees WHERE deleted_at IS NULL AND (lower(department) = ? OR lower(location) = ?)",
+        "There are {value} employees{scope}.",
+    ),
+    (
+        re.compile(rf"^what is the (?:average|avg|mean) salary(?: of (?:all )?employees)?{_SCOPE}$"),
+        "SELECT ROUND(AVG(salary), 2) FROM employees WHERE deleted_at IS NULL",
+        "SELECT ROUND(AVG(salary), 2) FROM employees WHERE deleted_at IS NULL AND (lower(department) = ? OR lower(location) = ?)",
+        "The average salary{scope} is {value}.",
+    ),
+    (
+        re.compile(rf"^what is the (?:total|sum of) salar(?:y|ies)(?: of (?:all )?employees)?{_SCOPE}$"),
+        "SELECT SUM(salary) FROM employees WHERE deleted_at IS NULL",
+        "SELECT SUM(salary) FROM employees WHERE deleted_at IS NULL AND (lower(department) = ? OR lower(location) = ?)",
+        "The total salary{scope} is {value}.",
+    ),
+    (
+        re.compile(r"^(?:list|what are) (?:all )?(?:the )?departments$"),
+        "SELECT group_concat(DISTINCT department) FROM employees WHERE deleted_at IS NULL AND department IS NOT NULL",
+        None,
+        "The departments are: {value}.",
+    ),
+    (
+        re.compile(r"^(?:list|what are) (?:all )?(?:the )?locations$"),
+        "SELECT group_concat(DISTINCT location) FROM employees WHERE deleted_at IS NULL AND location IS NOT NULL",
+        None,
+        "The locations are: {value}.",
+    ),
+]
+
+
+def normalise_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?. ")
+
+
+def answer_from_template(question: str) -> str | None:
+    """Answers common aggregate questions with a fixed query, skipping the agent."""
+    text = normalise_question(question)
+
+    for pattern, sql, scoped_sql, answer in TEMPLATES:
+        match = pattern.match(text)
+        if not match:
+            continue
+
+        scope = match.groupdict().get("scope")
+        if scope:
+            _, rows, _ = run_guarded(readonly_engine, scoped_sql, (scope, scope))
+        else:
+            _, rows, _ = run_guarded(readonly_engine, sql)
+
+        value = rows[0][0] if rows and rows[0][0] is not None else 0
+        return answer.format(value=value, scope=f" in {scope}" if scope else "")
+
+    return None
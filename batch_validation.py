@@ -0,0 +1,100 @@
+import time
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Annotated
+
+from pydantic import TypeAdapter, ValidationError, WrapValidator
+from typing_extensions import NotRequired, TypedDict
+
+from coercion import COERCION_SAMPLE_SIZE, coerce_values, coercer_registry
+from metrics import metrics
+from schema import UnifiedEmployee
+
+
+class _Rejected:
+    def __init__(self, errors: list[dict]):
+        self.errors = errors
+
+
+def _keep_rejected(value, handler):
+    # Only failing rows take this path; the rest of the batch stays in one validation pass
+    try:
+        return handler(value)
+    except ValidationError as e:
+        return _Rejected(e.errors(include_url=False, include_input=False))
+
+
+# UnifiedEmployee's fields as a TypedDict: plain dicts in and out, without building and dumping a model per row
+_EmployeeRow = TypedDict("_EmployeeRow", {
+    name: info.annotation if info.is_required() else NotRequired[info.annotation]
+    for name, info in UnifiedEmployee.model_fields.items()
+})
+_employee_batch = TypeAdapter(list[Annotated[_EmployeeRow, WrapValidator(_keep_rejected)]])
+_DEFAULTS = {name: info.default for name, info in UnifiedEmployee.model_fields.items() if not info.is_required()}
+
+
+@dataclass
+class BatchResult:
+    valid: list[dict] = field(default_factory=list)
+    valid_positions: list[int] = field(default_factory=list)
+    # (position in the batch, [{"field", "message", "type"}])
+    rejected: list[tuple[int, list[dict]]] = field(default_factory=list)
+
+
+def remap_record(record: dict, field_map: dict) -> dict:
+    return {unified: record.get(src) for src, unified in field_map.items()}
+
+
+def _error_details(error: dict) -> dict:
+    return {
+        "field": ".".join(str(part) for part in error["loc"]) or None,
+        "message": error["msg"],
+        "type": error["type"],
+    }
+
+
+def validate_batch(records: list[dict], field_map: dict, source_name: str | None = None) -> BatchResult:
+    """Maps, coerces and validates a batch of source records, splitting it into valid and rejected rows.
+
+    Columns are coerced one at a time and the batch is validated in a single pass."""
+    started = time.perf_counter()
+    # The last source field mapped to a unified field wins, as in remap_record
+    sources = {unified: src for src, unified in field_map.items()}
+    raw = {name: [record.get(src) for record in records] for name, src in sources.items()}
+    # Column by column so each compiled converter runs over the whole batch
+    coercers = coercer_registry.for_columns(
+        source_name, field_map, {name: values[:COERCION_SAMPLE_SIZE] for name, values in raw.items()}
+    )
+    coerced = {name: coerce_values(coercers[name], values) for name, values in raw.items()}
+
+    # In UnifiedEmployee's field order, with defaults for the optional fields the source doesn't have
+    names, columns = [], []
+    for name in UnifiedEmployee.model_fields:
+        if name in coerced:
+            names.append(name)
+            columns.append(coerced[name])
+        elif name in _DEFAULTS:
+            names.append(name)
+            columns.append(repeat(_DEFAULTS[name]))
+
+    if coerced:
+        unified = [dict(zip(names, values)) for values in zip(*columns)]
+    else:
+        unified = [dict(_DEFAULTS) for _ in records]
+    rows = _employee_batch.validate_python(unified)
+
+    result = BatchResult()
+    for position, row in enumerate(rows):
+        if isinstance(row, _Rejected):
+            result.rejected.append((position, [_error_details(error) for error in row.errors]))
+        else:
+            result.valid.append(row)
+            result.valid_positions.append(position)
+
+    elapsed = time.perf_counter() - started
+    metrics.incr("validation.rows", len(records))
+    metrics.incr("validation.rejected", len(result.rejected))
+    metrics.observe("validation.batch_seconds", elapsed)
+    if elapsed > 0:
+        metrics.set_gauge("validation.rows_per_second", round(len(records) / elapsed))
+    return result
@@ -0,0 +1,65 @@
+"""Compares ingesting a CSV through per-record upserts with the columnar frame path, from file to committed rows.
+
+Usage: python benchmarks/bench_ingest.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.mkdtemp(prefix="synchub-bench-")
+os.environ.setdefault("DATABASE_PATH", os.path.join(_scratch, "employees.db"))
+
+import pandas as pd
+
+import models  # noqa: F401  registers the tables
+from bench_normalize import FIELD_MAPPING, write_csv
+from database import SessionLocal, migrate
+from frame_normalizer import frame_to_records, normalize_frame
+from ingest import bulk_upsert_employees, bulk_upsert_frame
+
+
+def records_path(path: str, source_name: str) -> dict:
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    valid, _ = normalize_frame(frame, FIELD_MAPPING, canonicalize=False)
+    db = SessionLocal()
+    try:
+        counts = bulk_upsert_employees(db, source_name, frame_to_records(valid))
+        db.commit()
+        return counts
+    finally:
+        db.close()
+
+
+def frame_path(path: str, source_name: str) -> dict:
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    valid, _ = normalize_frame(frame, FIELD_MAPPING, canonicalize=False)
+    db = SessionLocal()
+    try:
+        counts = bulk_upsert_frame(db, source_name, valid)
+        db.commit()
+        return counts
+    finally:
+        db.close()
+
+
+def timed(fn, path: str, source_name: str, rows: int) -> float:
+    started = time.perf_counter()
+    counts = fn(path, source_name)
+    elapsed = time.perf_counter() - started
+    print(f"{fn.__name__:>13} {source_name}: {counts} in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    migrate()
+    path = os.path.join(_scratch, "employees.csv")
+    write_csv(path, rows)
+    # First load inserts every row, the second finds them all unchanged
+    for run in ("first load", "reload"):
+        records_seconds = timed(records_path, path, "BenchRecords", rows)
+        frame_seconds = timed(frame_path, path, "BenchFrame", rows)
+        print(f"{run} speedup: {records_seconds / frame_seconds:.1f}x")
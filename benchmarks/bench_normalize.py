@@ -0,0 +1,95 @@
+"""Compares the per-row normalisation loop, with and without coercion, with validate_batch and the columnar frame_normalizer path.
+
+Usage: python benchmarks/bench_normalize.py [rows]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from batch_validation import validate_batch
+from coercion import coercer_registry
+from frame_normalizer import normalize_frame, frame_to_records
+from schema import UnifiedEmployee
+
+FIELD_MAPPING = {
+    "id": "employee_id",
+    "name": "name",
+    "sal": "salary",
+    "email_id": "email",
+    "dept": "department",
+    "work_location": "location",
+}
+DEPARTMENTS = ["Engineering", "HR", "Finance", "Sales"]
+LOCATIONS = ["Bangalore", "Hyderabad", "Pune", "Mumbai"]
+
+
+def write_csv(path: str, rows: int):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELD_MAPPING)
+        for i in range(rows):
+            writer.writerow([
+                f"{i:07d}", f"Employee {i}", 10000 + i % 5000, f"emp{i}@example.com",
+                DEPARTMENTS[i % 4], LOCATIONS[i % 4],
+            ])
+
+
+def row_loop(path: str) -> int:
+    records = []
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            unified_kwargs = {unified: record.get(src) for src, unified in FIELD_MAPPING.items()}
+            records.append(UnifiedEmployee(**unified_kwargs).model_dump())
+    return len(records)
+
+
+def coerced_row_loop(path: str) -> int:
+    # The per-row equivalent of validate_batch, which coerces values before validating them
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    sample = {unified: [row.get(src) for row in rows[:1000]] for src, unified in FIELD_MAPPING.items()}
+    coercers = coercer_registry.for_columns(None, FIELD_MAPPING, sample)
+    records = []
+    for record in rows:
+        unified_kwargs = {unified: coercers[unified].value(record.get(src)) for src, unified in FIELD_MAPPING.items()}
+        records.append(UnifiedEmployee(**unified_kwargs).model_dump())
+    return len(records)
+
+
+def batch_validated(path: str) -> int:
+    with open(path, newline="") as f:
+        result = validate_batch(list(csv.DictReader(f)), FIELD_MAPPING)
+    return len(result.valid)
+
+
+def columnar(path: str) -> int:
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    valid, _ = normalize_frame(frame, FIELD_MAPPING, canonicalize=False)
+    return len(frame_to_records(valid))
+
+
+def timed(fn, path: str) -> float:
+    started = time.perf_counter()
+    rows = fn(path)
+    elapsed = time.perf_counter() - started
+    print(f"{fn.__name__:>15}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "employees.csv")
+        write_csv(path, rows)
+        loop_seconds = timed(row_loop, path)
+        coerced_seconds = timed(coerced_row_loop, path)
+        batch_seconds = timed(batch_validated, path)
+        frame_seconds = timed(columnar, path)
+    print(f"batch speedup: {loop_seconds / batch_seconds:.1f}x, {coerced_seconds / batch_seconds:.1f}x over the coerced loop")
+    print(f"columnar speedup: {loop_seconds / frame_seconds:.1f}x")
@@ -0,0 +1,90 @@
+"""Local webhook receiver for measuring outbox delivery throughput and lag.
+
+Start it, point the API at it and trigger a sync:
+
+    python benchmarks/webhook_receiver.py 9000
+    WEBHOOK_ENDPOINTS=http://127.0.0.1:9000/hook uvicorn main:app
+
+Every few seconds it prints changes/s, batch count, the lag between a change being logged and
+arriving here, and how many changes arrived out of order for their employee.
+
+Set FAIL_RATE=0.2 to reject a fifth of the batches and exercise retries.
+"""
+import gzip
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAIL_RATE = float(os.getenv("FAIL_RATE", "0"))
+REPORT_SECONDS = 5
+
+lock = threading.Lock()
+totals = {"changes": 0, "batches": 0, "rejected": 0, "out_of_order": 0, "lag_total": 0.0, "lag_max": 0.0}
+last_seq = {}
+
+
+def lag_seconds(changed_at: str) -> float:
+    logged = datetime.fromisoformat(changed_at).replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - logged).total_seconds()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+
+        if random.random() < FAIL_RATE:
+            with lock:
+                totals["rejected"] += 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        changes = json.loads(body)["changes"]
+        with lock:
+            totals["batches"] += 1
+            for change in changes:
+                key = (change["source_name"], change["source_record_id"])
+                if change["seq"] <= last_seq.get(key, 0):
+                    totals["out_of_order"] += 1
+                last_seq[key] = max(change["seq"], last_seq.get(key, 0))
+                lag = lag_seconds(change["changed_at"])
+                totals["changes"] += 1
+                totals["lag_total"] += lag
+                totals["lag_max"] = max(totals["lag_max"], lag)
+
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def report():
+    previous = 0
+    while True:
+        time.sleep(REPORT_SECONDS)
+        with lock:
+            snapshot = dict(totals)
+        delta = snapshot["changes"] - previous
+        previous = snapshot["changes"]
+        avg_lag = snapshot["lag_total"] / snapshot["changes"] if snapshot["changes"] else 0.0
+        print(
+            f"{delta / REPORT_SECONDS:,.0f} changes/s | total {snapshot['changes']} in {snapshot['batches']} batches "
+            f"| rejected {snapshot['rejected']} | lag avg {avg_lag:.2f}s max {snapshot['lag_max']:.2f}s "
+            f"| out of order {snapshot['out_of_order']}",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9000
+    threading.Thread(target=report, daemon=True).start()
+    print(f"Listening on http://127.0.0.1:{port}/hook")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
@@ -0,0 +1,210 @@
+import json
+import logging
+import re
+import threading
+from difflib import get_close_matches
+
+from langchain_core.prompts import PromptTemplate
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import SessionLocal
+from llm_client import get_chat_model
+from metrics import metrics
+from models import ValueAlias
+
+FUZZY_CUTOFF = 0.85
+
+logger = logging.getLogger(__name__)
+
+# canonical value -> known spellings, per unified field
+CANONICAL_VALUES = {
+    "department": {
+        "Engineering": ["engineering", "eng", "engg", "r&d", "r&d engg", "rnd", "research and development", "tech", "technology", "software", "development", "dev"],
+        "HR": ["hr", "human resources", "people", "people ops", "people operations", "talent"],
+        "Finance": ["finance", "fin", "accounts", "accounting"],
+        "Sales": ["sales", "business development", "bd"],
+        "Marketing": ["marketing", "mktg"],
+        "Operations": ["operations", "ops"],
+        "Legal": ["legal"],
+        "IT": ["it", "information technology"],
+    },
+    "location": {
+        "Bangalore": ["bangalore", "bengaluru", "blr"],
+        "Hyderabad": ["hyderabad", "hyd"],
+        "Pune": ["pune", "pnq"],
+        "Mumbai": ["mumbai", "bombay", "bom"],
+        "Chennai": ["chennai", "madras", "maa"],
+        "Delhi": ["delhi", "new delhi", "ncr", "del"],
+    },
+}
+
+# Tokens that are noise for a field, e.g. the "Blr" in a department called "ENG-Blr"
+NOISE_FIELDS = {"department": "location"}
+
+prompt_template = PromptTemplate.from_template("""
+You normalise "{field}" values from employee records.
+
+Known canonical values: {canonical}
+
+Map each of these raw values to one of the known canonical values: {values}
+
+Respond with a JSON object mapping every raw value to a canonical value, or to null when none fits.
+""")
+
+
+def _key(value: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", value.lower()).split())
+
+
+class Canonicalizer:
+    """Maps raw department/location spellings to canonical values.
+
+    Work is per distinct value: each one is resolved once (alias, fuzzy match, then the LLM in a
+    single batched call) and memoised in memory and in value_aliases."""
+
+    def __init__(self, canonical_values: dict):
+        self._lock = threading.Lock()
+        self._aliases = {
+            field: {_key(alias): canonical for canonical, aliases in values.items() for alias in [canonical, *aliases]}
+            for field, values in canonical_values.items()
+        }
+        self._memo: dict[str, dict[str, str]] = {field: {} for field in canonical_values}
+        self._loaded = False
+        self._llm = None
+
+    @property
+    def fields(self) -> list[str]:
+        return list(self._aliases)
+
+    def _load(self):
+        if self._loaded:
+            return
+        db = SessionLocal()
+        try:
+            for alias in db.scalars(select(ValueAlias)).all():
+                if alias.field in self._memo:
+                    self._memo[alias.field][alias.raw_value] = alias.canonical
+                    self._aliases[alias.field].setdefault(_key(alias.canonical), alias.canonical)
+        finally:
+            db.close()
+        self._loaded = True
+
+    def _save(self, field: str, resolved: dict[str, tuple[str, str]]):
+        if not resolved:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                insert(ValueAlias).on_conflict_do_nothing(index_elements=["field", "raw_value"]),
+                [
+                    {"field": field, "raw_value": raw, "canonical": canonical, "method": method}
+                    for raw, (canonical, method) in resolved.items()
+                ],
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _match(self, raw: str, aliases: dict, noise: dict) -> tuple[str, str] | None:
+        key = _key(raw)
+        if key in aliases:
+            return aliases[key], "exact"
+
+        stripped = " ".join(t for t in key.split() if t not in noise)
+        if stripped in aliases:
+            return aliases[stripped], "exact"
+
+        close = get_close_matches(stripped or key, list(aliases), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            return aliases[close[0]], "fuzzy"
+        return None
+
+    def _ask_llm(self, field: str, values: list[str], canonical: list[str]) -> dict[str, str | None] | None:
+        """Returns raw value -> canonical value or None, or None overall when the call failed."""
+        if self._llm is None:
+            self._llm = get_chat_model("canonicalizer", json_mode=True)
+
+        prompt = prompt_template.format(field=field, canonical=canonical, values=values)
+        try:
+            answer = json.loads(self._llm.invoke(prompt).content)
+            if not isinstance(answer, dict):
+                raise ValueError(f"Expected a JSON object, got {type(answer).__name__}")
+        except Exception:
+            metrics.incr("canonicalize.llm_errors")
+            logger.exception("Canonicalisation LLM call for %s failed", field)
+            return None
+        return {raw: answer.get(raw) if answer.get(raw) in canonical else None for raw in values}
+
+    def resolve(self, field: str, values) -> dict[str, str]:
+        """Returns raw value -> canonical value for every distinct non-empty value that could be resolved.
+
+        Matching and the LLM call run outside the lock; it is only held to read and merge the memo. When
+        the LLM call fails, its values are left out (callers keep them raw) and retried on the next call."""
+        with self._lock:
+            self._load()
+            memo = self._memo[field]
+            distinct = {v for v in values if isinstance(v, str) and v.strip()}
+            unseen = [v for v in distinct if v not in memo]
+            metrics.incr("canonicalize.distinct_values", len(distinct))
+            if not unseen:
+                return {v: memo[v] for v in distinct}
+            aliases = dict(self._aliases[field])
+            noise = dict(self._aliases.get(NOISE_FIELDS.get(field), {}))
+
+        resolved = {}
+        unmatched = []
+        for raw in unseen:
+            match = self._match(raw, aliases, noise)
+            if match:
+                resolved[raw] = match
+            else:
+                unmatched.append(raw)
+
+        if unmatched:
+            metrics.incr("canonicalize.llm_values", len(unmatched))
+            suggestions = self._ask_llm(field, unmatched, sorted(set(aliases.values())))
+            if suggestions is None:
+                metrics.incr("canonicalize.unresolved", len(unmatched))
+            else:
+                for raw in unmatched:
+                    # Nothing fits: the value becomes a canonical value of its own
+                    resolved[raw] = (suggestions[raw], "llm") if suggestions.get(raw) else (raw.strip(), "new")
+
+        with self._lock:
+            memo = self._memo[field]
+            # Another call may have resolved some of these values meanwhile; the first answer stays
+            added = {raw: match for raw, match in resolved.items() if raw not in memo}
+            for raw, (canonical, method) in added.items():
+                memo[raw] = canonical
+                if method == "new":
+                    self._aliases[field][_key(raw)] = canonical
+                metrics.incr(f"canonicalize.{method}")
+            result = {v: memo[v] for v in distinct if v in memo}
+
+        self._save(field, added)
+        return result
+
+    def canonicalize_records(self, records: list[dict]) -> list[dict]:
+        for field in self.fields:
+            mapping = self.resolve(field, {r.get(field) for r in records})
+            for record in records:
+                value = record.get(field)
+                if value in mapping:
+                    record[field] = mapping[value]
+        return records
+
+    def canonicalize_series(self, field: str, series):
+        """Frame version of canonicalize_records: one lookup per distinct value, then a vectorised map."""
+        mapping = self.resolve(field, series.dropna().unique())
+        if not mapping:
+            return series
+        return series.map(mapping).fillna(series)
+
+    def dictionaries(self) -> dict:
+        with self._lock:
+            self._load()
+            return {field: dict(sorted(memo.items())) for field, memo in self._memo.items()}
+
+# Global instance
+canonicalizer = Canonicalizer(CANONICAL_VALUES)
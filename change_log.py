@@ -0,0 +1,115 @@
+import os
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+import outbox
+from database import SessionLocal
+from metrics import metrics
+from models import EmployeeChange
+from qa_log_writer import utcnow
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7"))
+CHANGE_PAGE_LIMIT = 1000
+# How SQLAlchemy stores DateTime columns in SQLite, for rows written with raw executemany
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class ChangeLogGap(LookupError):
+    """The requested position has been compacted away; the consumer has to re-snapshot."""
+
+
+def head_seq(db: Session) -> int:
+    return db.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = 'employee_changes'")) or 0
+
+
+def _inserted_seqs(db: Session, count: int) -> tuple[int, int]:
+    """(first, last) seq of the count rows this transaction just inserted.
+
+    The first insert takes SQLite's write lock, so no other writer can interleave and the seqs are consecutive."""
+    last = db.scalar(text("SELECT last_insert_rowid()"))
+    return last - count + 1, last
+
+
+def record_changes(db: Session, changes: list[dict]):
+    # Written in the ingest transaction, so the log, the outbox and the table never disagree. The caller commits.
+    if changes:
+        now = utcnow()
+        db.execute(insert(EmployeeChange), [{"changed_at": now, **change} for change in changes])
+        outbox.capture(db, *_inserted_seqs(db, len(changes)))
+        metrics.incr("change_log.written", len(changes))
+
+
+def record_encoded_changes(db: Session, rows: list[tuple]):
+    """record_changes for (source_name, source_record_id, employee_id, op, changed JSON text) tuples, in one executemany."""
+    if rows:
+        now = utcnow().strftime(TIMESTAMP_FORMAT)
+        db.connection().exec_driver_sql(
+            "INSERT INTO employee_changes (source_name, source_record_id, employee_id, op, changed, changed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(*row, now) for row in rows],
+        )
+        outbox.capture(db, *_inserted_seqs(db, len(rows)))
+        metrics.incr("change_log.written", len(rows))
+
+
+def record_deletes(db: Session, where: str, parameters: tuple = ()) -> int:
+    """Logs a delete for every live employees row matching a raw SQL condition, in one INSERT ... SELECT.
+
+    Run it before the rows are deleted or tombstoned. The caller commits."""
+    logged = db.connection().exec_driver_sql(
+        "INSERT INTO employee_changes (source_name, source_record_id, employee_id, op, changed, changed_at) "
+        f"SELECT source_name, source_record_id, employee_id, 'delete', '{{}}', ? FROM employees "
+        f"WHERE deleted_at IS NULL AND {where}",
+        (utcnow().isoformat(" "), *parameters),
+    ).rowcount
+    if logged:
+        outbox.capture(db, *_inserted_seqs(db, logged))
+    metrics.incr("change_log.written", logged)
+    return logged
+
+
+def _bounds(db: Session) -> tuple[int, int]:
+    """(oldest retained seq, newest seq ever issued)."""
+    low = db.scalar(select(func.min(EmployeeChange.seq)))
+    head = head_seq(db)
+    return (low if low is not None else head + 1), head
+
+
+def changes_since(since: int, limit: int = 100) -> dict:
+    limit = min(limit, CHANGE_PAGE_LIMIT)
+    db = SessionLocal()
+    try:
+        low, head = _bounds(db)
+        if since < low - 1:
+            raise ChangeLogGap(f"Changes up to seq {low - 1} have been compacted; re-snapshot /employees and resume from head_seq {head}")
+        entries = db.scalars(
+            select(EmployeeChange).where(EmployeeChange.seq > since).order_by(EmployeeChange.seq).limit(limit)
+        ).all()
+    finally:
+        db.close()
+
+    return {
+        "changes": [entry.to_dict() for entry in entries],
+        "next_since": entries[-1].seq if entries else since,
+        "has_more": len(entries) == limit,
+        "head_seq": head,
+    }
+
+
+def compact(retention_days: int = CHANGE_LOG_RETENTION_DAYS) -> int:
+    """Drops entries older than the retention window; consumers further behind get a ChangeLogGap."""
+    cutoff = utcnow() - timedelta(days=retention_days)
+    db = SessionLocal()
+    try:
+        removed = db.execute(delete(EmployeeChange).where(EmployeeChange.changed_at < cutoff)).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    metrics.incr("change_log.compacted", removed)
+    return removed
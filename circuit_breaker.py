@@ -0,0 +1,74 @@
+import threading
+import time
+
+from metrics import metrics
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for reset_timeout seconds after failure_threshold consecutive failures.
+
+    Once the timeout passes, a single trial call is let through (half-open); its outcome closes or re-opens the circuit."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._publish("closed")
+
+    def _publish(self, state: str):
+        metrics.set_gauge(f"breaker.{self.name}.state", state)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._publish("half_open")
+                return True
+            metrics.incr(f"breaker.{self.name}.short_circuited")
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+            self._publish("closed")
+
+    def release_trial(self):
+        """Ends a trial call that neither succeeded nor failed, so the next allow() can try again."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    metrics.incr(f"breaker.{self.name}.opened")
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self._publish("open")
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
@@ -0,0 +1,251 @@
+import os
+import re
+from collections import Counter
+
+import pandas as pd
+
+# Cell values that mean "no value" in exports from the sources we see
+NULL_TOKENS = frozenset({"", "n/a", "na", "null", "none", "nil", "nan", "-", "--", "?"})
+# Pad every numeric employee id to this width across sources; 0 keeps each source's own padding
+EMPLOYEE_ID_PAD_WIDTH = int(os.getenv("EMPLOYEE_ID_PAD_WIDTH", "0"))
+COERCION_SAMPLE_SIZE = int(os.getenv("COERCION_SAMPLE_SIZE", "1000"))
+# Columns with at most this share of distinct values are coerced once per distinct value
+DISTINCT_RATIO = 0.5
+
+NUMBER_FIELDS = {"salary"}
+ID_FIELDS = {"employee_id"}
+
+_CURRENCY = re.compile(r"(?i)[$€£₹¥\s'\xa0]|\b(?:USD|EUR|GBP|INR|JPY)\b|\bRs\.?")
+_NUMBER_SHAPE = re.compile(r"\(?-?[\d.,]+\)?")
+_PLAIN_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_EUROPEAN = re.compile(r"\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+,\d{1,2}")
+_ENGLISH = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+\.\d{1,2}")
+_DIGITS = re.compile(r"\d+")
+_WHOLE_FLOAT = re.compile(r"(\d+)\.0+")
+
+
+def _is_null(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and value != value:
+        return True
+    return isinstance(value, str) and value.strip().lower() in NULL_TOKENS
+
+
+def _text_series(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    text = values.astype("string").str.strip()
+    null = text.isna() | text.str.lower().isin(NULL_TOKENS)
+    return text.mask(null), null
+
+
+def _by_distinct(values: pd.Series, convert) -> tuple[pd.Series, pd.Series]:
+    """Runs convert over each distinct value once and spreads the results back to every row.
+
+    String ops cost per value, and columns like department or salary repeat a few values many times."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    if len(uniques) > len(values) * DISTINCT_RATIO:
+        return convert(values)
+    converted, flags = convert(pd.Series(uniques, dtype=values.dtype))
+    converted = converted.take(codes).set_axis(values.index)
+    return converted, flags.take(codes).set_axis(values.index)
+
+
+class _Memo(dict):
+    def __init__(self, convert):
+        super().__init__()
+        self.convert = convert
+
+    def __missing__(self, key):
+        converted = self[key] = self.convert(key[1])
+        return converted
+
+
+def coerce_values(coercer, values: list) -> list:
+    """Runs coercer.value over a column, once per distinct value when the column repeats them.
+
+    Values are keyed with their type, so 1 and 1.0 in one column still convert separately."""
+    convert = coercer.value
+    try:
+        repeated = len(set(values)) <= len(values) * DISTINCT_RATIO
+    except TypeError:
+        # Unhashable values, like nested JSON from an API loader
+        repeated = False
+    if not repeated:
+        return [convert(value) for value in values]
+    memo = _Memo(convert)
+    return [memo[value.__class__, value] for value in values]
+
+
+class TextCoercer:
+    kind = "text"
+
+    def value(self, raw):
+        if raw is None:
+            return None
+        # str(nan) is "nan", a null token like the rest
+        text = str(raw).strip()
+        return None if text.lower() in NULL_TOKENS else text
+
+    def series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        return _by_distinct(values, self._series)
+
+    def _series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        text, _ = _text_series(values)
+        return text, pd.Series(False, index=values.index)
+
+
+class NumberCoercer:
+    """Parses currency-formatted numbers with a decimal separator inferred from the source's values.
+
+    Unparseable values are returned unchanged by value() so validation rejects them."""
+
+    kind = "number"
+
+    def __init__(self, decimal: str = "."):
+        self.decimal = decimal
+        self.thousands = "," if decimal == "." else "."
+
+    def _normalise(self, text: str) -> str | None:
+        text = _CURRENCY.sub("", text)
+        if not _NUMBER_SHAPE.fullmatch(text):
+            return None
+        negative = text.startswith("(") or "-" in text
+        digits = text.strip("()-").replace(self.thousands, "").replace(self.decimal, ".")
+        if not _PLAIN_NUMBER.fullmatch(digits):
+            return None
+        return f"-{digits}" if negative else digits
+
+    def value(self, raw):
+        if _is_null(raw):
+            return None
+        if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+            return float(raw)
+        normalised = self._normalise(str(raw))
+        return float(normalised) if normalised is not None else raw
+
+    def series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        if pd.api.types.is_numeric_dtype(values):
+            return values.astype(float), pd.Series(False, index=values.index)
+        return _by_distinct(values, self._series)
+
+    def _series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        text, null = _text_series(values)
+        # Pattern strings rather than compiled patterns, so pandas can hand them to pyarrow when it's installed
+        cleaned = text.str.replace(_CURRENCY.pattern, "", regex=True)
+        shaped = cleaned.str.fullmatch(_NUMBER_SHAPE.pattern).fillna(False)
+        negative = cleaned.str.startswith("(").fillna(False) | cleaned.str.contains("-", regex=False).fillna(False)
+        digits = (
+            cleaned.str.strip("()-")
+            .str.replace(self.thousands, "", regex=False)
+            .str.replace(self.decimal, ".", regex=False)
+        )
+        parsed = shaped & digits.str.fullmatch(_PLAIN_NUMBER.pattern).fillna(False)
+        numbers = pd.to_numeric(digits.where(parsed), errors="coerce")
+        numbers = numbers.mask(negative, -numbers)
+        return numbers, ~null & ~parsed
+
+
+class IdCoercer:
+    """Turns numeric ids into strings, dropping a float's ".0" and zero-padding to the source's width."""
+
+    kind = "id"
+
+    def __init__(self, width: int = 0):
+        self.width = width
+
+    def value(self, raw):
+        if _is_null(raw):
+            return None
+        if isinstance(raw, float) and raw.is_integer():
+            raw = int(raw)
+        text = str(raw).strip()
+        whole = "." in text and _WHOLE_FLOAT.fullmatch(text)
+        if whole:
+            text = whole.group(1)
+        if self.width and _DIGITS.fullmatch(text):
+            text = text.zfill(self.width)
+        return text
+
+    def series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        return _by_distinct(values, self._series)
+
+    def _series(self, values: pd.Series) -> tuple[pd.Series, pd.Series]:
+        text, _ = _text_series(values)
+        # Only dotted ids can be whole floats; most ids skip the regex
+        dotted = text.str.contains(".", regex=False).fillna(False)
+        if dotted.any():
+            text = text.mask(dotted, text[dotted].str.replace(_WHOLE_FLOAT.pattern, r"\1", regex=True))
+        if self.width:
+            text = text.mask(text.str.fullmatch(_DIGITS.pattern).fillna(False), text.str.zfill(self.width))
+        return text, pd.Series(False, index=values.index)
+
+
+def _sample_strings(values) -> list[str]:
+    sample = []
+    for value in values:
+        if not _is_null(value):
+            sample.append(str(value).strip())
+            if len(sample) >= COERCION_SAMPLE_SIZE:
+                break
+    return sample
+
+
+def infer_number_coercer(values) -> NumberCoercer:
+    votes = Counter()
+    for text in _sample_strings(values):
+        text = _CURRENCY.sub("", text).strip("()-")
+        if _EUROPEAN.fullmatch(text):
+            votes[","] += 1
+        elif _ENGLISH.fullmatch(text):
+            votes["."] += 1
+    return NumberCoercer(decimal="," if votes[","] > votes["."] else ".")
+
+
+def infer_id_coercer(values) -> IdCoercer:
+    if EMPLOYEE_ID_PAD_WIDTH:
+        return IdCoercer(EMPLOYEE_ID_PAD_WIDTH)
+    padded = Counter(len(text) for text in _sample_strings(values) if len(text) > 1 and text.startswith("0") and text.isdigit())
+    return IdCoercer(padded.most_common(1)[0][0] if padded else 0)
+
+
+def infer_coercer(field: str, values):
+    if field in NUMBER_FIELDS:
+        return infer_number_coercer(values)
+    if field in ID_FIELDS:
+        return infer_id_coercer(values)
+    return TextCoercer()
+
+
+class CoercerRegistry:
+    """Per-source, per-column coercers inferred from sampled values once and reused for every later batch.
+
+    Keyed by the source's field mapping, so a remapped source gets freshly inferred coercers."""
+
+    def __init__(self):
+        self._compiled: dict[tuple, dict] = {}
+
+    def for_columns(self, source_name: str | None, field_mapping: dict, columns: dict) -> dict:
+        """columns maps each unified field to an iterable of sampled values."""
+        key = (source_name, tuple(sorted(field_mapping.items())))
+        if source_name is not None and key in self._compiled:
+            return self._compiled[key]
+        coercers = {field: infer_coercer(field, values) for field, values in columns.items()}
+        if source_name is not None:
+            self._compiled[key] = coercers
+        return coercers
+
+    def for_frame(self, source_name: str | None, field_mapping: dict, frame: pd.DataFrame) -> dict:
+        sample = frame.head(COERCION_SAMPLE_SIZE)
+        return self.for_columns(source_name, field_mapping, {field: sample[field] for field in frame.columns})
+
+    def describe(self) -> dict:
+        return {
+            source: {
+                field: {"kind": c.kind, **{k: v for k, v in vars(c).items() if not k.startswith("_")}}
+                for field, c in coercers.items()
+            }
+            for (source, _), coercers in self._compiled.items()
+        }
+
+# Global instance
+coercer_registry = CoercerRegistry()
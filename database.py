@@ -1,17 +1,113 @@
-from sqlalchemy import create_engine, Column, String, Integer
+import logging
+import os
+
+from sqlalchemy import create_engine, inspect, Column, String, Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite:///./employees.db"
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./employees.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# Read-only handle to the same file, used for agent-generated SQL
+READONLY_DATABASE_URL = f"sqlite:///file:{DATABASE_PATH}?mode=ro&uri=true"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+readonly_engine = create_engine(READONLY_DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Ingest locks live in a file of their own: a sync holds the main database's write lock for its whole
+# transaction, and the lock's heartbeat still has to write meanwhile
+LOCK_DATABASE_PATH = os.getenv("LOCK_DATABASE_PATH", f"{DATABASE_PATH}.locks")
+lock_engine = create_engine(f"sqlite:///{LOCK_DATABASE_PATH}", connect_args={"check_same_thread": False})
+LockSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=lock_engine)
+
+LockBase = declarative_base()
+
+# source_name given to employees rows written before rows carried their source
+LEGACY_SOURCE = "legacy"
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _rebuild_for_autoincrement(conn, table):
+    # SQLite can't add AUTOINCREMENT to an existing table, so copy the rows into a new one
+    old = f"{table.name}_before_autoincrement"
+    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old}"')
+    for (index_name,) in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (old,)
+    ).fetchall():
+        conn.exec_driver_sql(f'DROP INDEX "{index_name}"')
+    table.create(bind=conn)
+    columns = ", ".join(f'"{name}"' for name in _column_names(conn, old) if name in table.columns)
+    conn.exec_driver_sql(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "{old}"')
+    conn.exec_driver_sql(f'DROP TABLE "{old}"')
+
+def _column_names(conn, table_name: str) -> list[str]:
+    return [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")').fetchall()]
+
+def _retire_legacy_employees(conn):
+    """Gives rows from before source tracking a provenance and tombstones them.
+
+    Those rows were upserted by employee_id alone, so which source wrote them is lost. They become the
+    "legacy" source keyed by employee_id (plus the row id for any duplicate), and are retired so that
+    re-syncing their real sources doesn't count them twice; their data stays in place."""
+    retired = conn.exec_driver_sql(
+        "UPDATE employees SET source_name = ?, "
+        # Rows relabelled earlier in this same UPDATE still count when finding each id's first row
+        "source_record_id = CASE WHEN id = (SELECT MIN(first.id) FROM employees first "
+        "WHERE (first.source_name IS NULL OR first.source_name = ?) AND first.employee_id IS employees.employee_id) "
+        "THEN COALESCE(employee_id, '#' || id) ELSE COALESCE(employee_id, '') || '#' || id END, "
+        "deleted_at = COALESCE(deleted_at, CURRENT_TIMESTAMP) "
+        "WHERE source_name IS NULL",
+        (LEGACY_SOURCE, LEGACY_SOURCE),
+    ).rowcount
+    if retired:
+        logger.info("Retired %d employees rows from before source tracking as source %r", retired, LEGACY_SOURCE)
+
+def migrate():
+    """Creates missing tables, then adds columns and indexes that older database files lack."""
+    Base.metadata.create_all(bind=engine)
+    LockBase.metadata.create_all(bind=lock_engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"].get("autoincrement"):
+                continue
+            sql = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+            ).scalar()
+            if sql and "AUTOINCREMENT" not in sql.upper():
+                _rebuild_for_autoincrement(conn, table)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+        _retire_legacy_employees(conn)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # Per-source partial indexes from older versions, superseded by ix_employees_source_live
+    with engine.begin() as conn:
+        stale = conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix\\_employees\\_src\\_%' ESCAPE '\\'"
+        ).scalars().all()
+        for name in stale:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+        # ingest_locks moved to the lock database
+        if LOCK_DATABASE_PATH != DATABASE_PATH:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS ingest_locks")
@@ -0,0 +1,279 @@
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from metrics import metrics
+from models import Employee, GoldenEmployee
+from qa_log_writer import utcnow
+
+# Blocks bigger than this are too generic to compare pairwise (e.g. a very common surname code)
+MAX_BLOCK_SIZE = int(os.getenv("ENTITY_MAX_BLOCK_SIZE", "200"))
+NAME_MATCH_THRESHOLD = float(os.getenv("ENTITY_NAME_MATCH_THRESHOLD", "0.9"))
+ID_NAME_MATCH_THRESHOLD = float(os.getenv("ENTITY_ID_NAME_MATCH_THRESHOLD", "0.75"))
+# Earlier sources win ties and source_priority rules, e.g. "FakeWorkday,FakeSAP"
+SOURCE_PRIORITY = [s.strip() for s in os.getenv("ENTITY_SOURCE_PRIORITY", "").split(",") if s.strip()]
+
+GOLDEN_FIELDS = ["employee_id", "name", "salary", "email", "department", "location"]
+DEFAULT_SURVIVORSHIP = {
+    "employee_id": "source_priority",
+    "name": "longest",
+    "salary": "most_recent",
+    "email": "most_common",
+    "department": "most_common",
+    "location": "most_recent",
+}
+
+
+def _survivorship_rules() -> dict:
+    # ENTITY_SURVIVORSHIP="salary:source_priority,location:most_common" overrides individual fields
+    rules = dict(DEFAULT_SURVIVORSHIP)
+    for item in os.getenv("ENTITY_SURVIVORSHIP", "").split(","):
+        if ":" in item:
+            name, rule = (part.strip() for part in item.split(":", 1))
+            rules[name] = rule
+    return rules
+
+
+SURVIVORSHIP_RULES = _survivorship_rules()
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"), **dict.fromkeys("CGJKQSXZ", "2"), **dict.fromkeys("DT", "3"),
+    "L": "4", **dict.fromkeys("MN", "5"), "R": "6",
+}
+_NON_ALPHA = re.compile(r"[^a-z ]+")
+
+
+def soundex(word: str) -> str:
+    letters = [c for c in word.upper() if "A" <= c <= "Z"]
+    if not letters:
+        return ""
+    out, last = [letters[0]], _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        code = _SOUNDEX_CODES.get(c, "")
+        if code and code != last:
+            out.append(code)
+        if c not in "HW":
+            last = code
+    return ("".join(out) + "000")[:4]
+
+
+def normalize_name(name) -> str:
+    return " ".join(_NON_ALPHA.sub(" ", str(name or "").lower()).split())
+
+
+def normalize_email(email) -> str:
+    email = str(email or "").strip().lower()
+    if "@" not in email:
+        return ""
+    local, domain = email.rsplit("@", 1)
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_employee_id(employee_id) -> str:
+    # Sources zero-pad numeric ids differently ("0000042" vs "42"), so numeric ids block on their value
+    employee_id = str(employee_id or "").strip()
+    return (employee_id.lstrip("0") or "0") if employee_id.isdigit() else employee_id
+
+
+def blocking_keys(record: dict) -> list[tuple[str, str]]:
+    keys = []
+    email = normalize_email(record.get("email"))
+    if email:
+        keys.append(("email", email))
+    tokens = normalize_name(record.get("name")).split()
+    if tokens:
+        keys.append(("name", f"{soundex(tokens[-1])}{tokens[0][0]}"))
+    employee_id = normalize_employee_id(record.get("employee_id"))
+    if employee_id:
+        keys.append(("id", employee_id))
+    return keys
+
+
+class _DisjointSet:
+    """Union-find that remembers which sources each set holds, so a link can be refused when two sets
+    already have a row from the same source (cannot-link)."""
+
+    def __init__(self, sources: list):
+        self.parent = list(range(len(sources)))
+        self.sources = [{source} for source in sources]
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> bool:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return False
+        root, child = min(ra, rb), max(ra, rb)
+        self.parent[child] = root
+        self.sources[root] |= self.sources[child]
+        self.sources[child] = set()
+        return True
+
+    def shares_source(self, a: int, b: int) -> bool:
+        return not self.sources[self.find(a)].isdisjoint(self.sources[self.find(b)])
+
+
+def _names_match(a: dict, b: dict, threshold: float) -> bool:
+    name_a, name_b = a["_name"], b["_name"]
+    if not name_a or not name_b:
+        return False
+    return name_a == name_b or SequenceMatcher(None, name_a, name_b).ratio() >= threshold
+
+
+def _compatible(a: dict, b: dict) -> bool:
+    # Two rows of one source are two people unless they share an email; conflicting emails never link
+    if a.get("source_name") == b.get("source_name"):
+        return False
+    return not (a["_email"] and b["_email"] and a["_email"] != b["_email"])
+
+
+@dataclass
+class LinkStats:
+    records: int = 0
+    blocks: int = 0
+    oversized_blocks: int = 0
+    comparisons: int = 0
+    links: int = 0
+    cannot_links: int = 0
+    clusters: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class LinkResult:
+    clusters: list[list[int]] = field(default_factory=list)
+    stats: LinkStats = field(default_factory=LinkStats)
+
+
+def link_records(records: list[dict]) -> LinkResult:
+    """Clusters records that describe the same person.
+
+    Records are only compared inside blocks sharing a key (normalised email, surname Soundex plus first
+    initial, or id), so the cost grows with block sizes rather than n². A shared email links outright;
+    a shared id or phonetic name links when the names are close enough, the rows are compatible and
+    the two clusters hold no rows from the same source, so chained fuzzy links cannot pull two people
+    of one source together. Email blocks are linked first so that check sees every strong link."""
+    started = time.perf_counter()
+    stats = LinkStats(records=len(records))
+    for record in records:
+        record["_name"] = normalize_name(record.get("name"))
+        record["_email"] = normalize_email(record.get("email"))
+
+    blocks: dict[tuple[str, str], list[int]] = defaultdict(list)
+    for i, record in enumerate(records):
+        for key in blocking_keys(record):
+            blocks[key].append(i)
+    stats.blocks = len(blocks)
+
+    links = _DisjointSet([record.get("source_name") for record in records])
+    thresholds = {"name": NAME_MATCH_THRESHOLD, "id": ID_NAME_MATCH_THRESHOLD}
+    for (kind, _), members in sorted(blocks.items(), key=lambda item: item[0][0] != "email"):
+        if len(members) < 2:
+            continue
+        if kind == "email":
+            for other in members[1:]:
+                stats.links += links.union(members[0], other)
+            continue
+        if len(members) > MAX_BLOCK_SIZE:
+            stats.oversized_blocks += 1
+            continue
+        for pos, a in enumerate(members):
+            for b in members[pos + 1:]:
+                if links.find(a) == links.find(b):
+                    continue
+                stats.comparisons += 1
+                if not (_compatible(records[a], records[b]) and _names_match(records[a], records[b], thresholds[kind])):
+                    continue
+                if links.shares_source(a, b):
+                    stats.cannot_links += 1
+                    continue
+                stats.links += links.union(a, b)
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for i in range(len(records)):
+        clusters[links.find(i)].append(i)
+    for record in records:
+        del record["_name"], record["_email"]
+
+    stats.clusters = len(clusters)
+    stats.seconds = time.perf_counter() - started
+    return LinkResult(clusters=list(clusters.values()), stats=stats)
+
+
+def _source_rank(record: dict) -> tuple:
+    source = record.get("source_name") or ""
+    rank = SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+    return rank, source
+
+
+def survive(members: list[dict], rules: dict = SURVIVORSHIP_RULES) -> dict:
+    """Builds one golden record from a cluster's rows, field by field, using each field's survivorship rule."""
+    by_priority = sorted(members, key=_source_rank)
+    golden = {}
+    for name in GOLDEN_FIELDS:
+        candidates = [m for m in by_priority if m.get(name) not in (None, "")]
+        if not candidates:
+            golden[name] = None
+            continue
+        rule = rules.get(name, "source_priority")
+        if rule == "most_recent":
+            chosen = max(candidates, key=lambda m: str(m.get("ingested_at") or ""))[name]
+        elif rule == "most_common":
+            # Counter keeps first-seen order, so ties go to the higher-priority source
+            chosen = Counter(m[name] for m in candidates).most_common(1)[0][0]
+        elif rule == "longest":
+            chosen = max((m[name] for m in candidates), key=lambda v: len(str(v)))
+        else:
+            chosen = candidates[0][name]
+        golden[name] = chosen
+    return golden
+
+
+def resolve_entities(db: Session) -> dict:
+    """Re-links every live employee row and rebuilds golden_employees. The caller commits.
+
+    A golden record's id is the smallest employee row id in its cluster, so it stays stable across runs
+    and only rows whose cluster changed get their person_id rewritten."""
+    rows = db.execute(
+        select(
+            Employee.id, Employee.person_id, Employee.source_name, Employee.source_record_id,
+            Employee.ingested_at, *(getattr(Employee, name) for name in GOLDEN_FIELDS),
+        ).where(Employee.deleted_at.is_(None))
+    ).mappings().all()
+    records = [dict(row) for row in rows]
+
+    result = link_records(records)
+    now = utcnow()
+    golden_rows, person_changes = [], []
+    for members in result.clusters:
+        cluster = [records[i] for i in members]
+        person_id = min(m["id"] for m in cluster)
+        golden_rows.append({
+            "id": person_id,
+            **survive(cluster),
+            "sources": sorted(f"{m['source_name']}:{m['source_record_id']}" for m in cluster),
+            "member_count": len(cluster),
+            "resolved_at": now,
+        })
+        person_changes.extend({"id": m["id"], "person_id": person_id} for m in cluster if m["person_id"] != person_id)
+
+    db.execute(delete(GoldenEmployee))
+    if golden_rows:
+        db.execute(insert(GoldenEmployee), golden_rows)
+    if person_changes:
+        db.execute(update(Employee), person_changes)
+
+    stats = result.stats
+    metrics.observe("entity_resolution.seconds", stats.seconds)
+    metrics.set_gauge("entity_resolution.golden_records", stats.clusters)
+    return {**vars(stats), "relinked": len(person_changes)}
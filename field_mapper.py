@@ -1,3 +1,5 @@
+import re
+
 fake_field_mappings = {
     "FakeSAP": {
         "emp_id": "employee_id",
@@ -15,4 +17,39 @@ fake_field_mappings = {
         "dept": "department",
         "work_location": "location"
     }
-}
\ No newline at end of file
+}
+
+
+def source_fields(records: list[dict]) -> list[str]:
+    # Union of the records' keys in first-seen order, so one mapping covers the whole source
+    return list(dict.fromkeys(key for record in records for key in record))
+
+
+# Keyword rules for recognising source columns, checked in order; each unified field is used once
+FIELD_NAME_RULES = [
+    ("email", ("email", "mail")),
+    ("department", ("dept", "department", "division", "team")),
+    ("location", ("location", "loc", "city", "office", "site")),
+    ("salary", ("sal", "salary", "pay", "compensation", "ctc", "wage")),
+    ("name", ("name",)),
+    ("employee_id", ("id", "number", "no", "code")),
+]
+
+
+def heuristic_field_mapping(fields: list[str]) -> dict:
+    known = {src.lower(): dst for mapping in fake_field_mappings.values() for src, dst in mapping.items()}
+
+    mapping = {}
+    used = set()
+    for field in fields:
+        unified = known.get(field.lower())
+        if unified is None:
+            tokens = [t for t in re.split(r"[^a-z0-9]+", field.lower()) if t]
+            unified = next(
+                (dst for dst, keywords in FIELD_NAME_RULES if dst not in used and any(t in keywords for t in tokens)),
+                None,
+            )
+        if unified is not None and unified not in used:
+            mapping[field] = unified
+            used.add(unified)
+    return mapping
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from canonicalize import canonicalizer
+from coercion import coercer_registry
+from schema import UnifiedEmployee
+
+UNIFIED_FIELDS = list(UnifiedEmployee.model_fields)
+REQUIRED_FIELDS = [name for name, field in UnifiedEmployee.model_fields.items() if field.is_required()]
+
+
+def normalize_frame(frame: pd.DataFrame, field_mapping: dict, canonicalize: bool = True, source_name: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Columnar equivalent of building UnifiedEmployee per row.
+
+    Values go through the source's compiled coercers first; passing source_name lets later chunks reuse them.
+    Returns (valid, invalid); invalid rows keep their original index and carry "error" and "error_field" columns."""
+    columns = {src: unified for src, unified in field_mapping.items() if src in frame.columns}
+    out = frame[list(columns)].rename(columns=columns)
+    out = out.reindex(columns=UNIFIED_FIELDS)
+
+    coercers = coercer_registry.for_frame(source_name, field_mapping, out)
+    unparseable = {}
+    for field, coercer in coercers.items():
+        out[field], unparseable[field] = coercer.series(out[field])
+
+    # First failing check per row wins, mirroring a single validation error per rejected row
+    errors = pd.Series("", index=out.index, dtype="object")
+    error_fields = pd.Series("", index=out.index, dtype="object")
+    checks = [(field, out[field].isna(), "Field required") for field in REQUIRED_FIELDS]
+    checks.append(("salary", unparseable["salary"], "Input should be a valid number"))
+    for field, failed, message in checks:
+        unset = failed & (errors == "")
+        errors = errors.mask(unset, message)
+        error_fields = error_fields.mask(unset, field)
+    bad = errors != ""
+
+    valid = out[~bad]
+    if canonicalize:
+        valid = valid.copy()
+        for field in canonicalizer.fields:
+            valid[field] = canonicalizer.canonicalize_series(field, valid[field])
+
+    invalid = frame[bad].assign(error=errors[bad], error_field=error_fields[bad])
+    return valid, invalid
+
+
+def frame_to_records(frame: pd.DataFrame) -> list[dict]:
+    # Column by column, object dtype first so missing values come out as None rather than NaN/<NA>
+    names = list(frame.columns)
+    columns = [frame[name].astype(object).where(frame[name].notna(), None).tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
@@ -0,0 +1,248 @@
+import hashlib
+import json
+from itertools import repeat
+from json.encoder import encode_basestring_ascii
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from change_log import TIMESTAMP_FORMAT, record_changes, record_deletes, record_encoded_changes
+from frame_normalizer import frame_to_records
+from metrics import metrics
+from models import Employee
+from qa_log_writer import utcnow
+from schema import UnifiedEmployee
+
+UPSERT_CHUNK_SIZE = 500
+HASHED_FIELDS = list(UnifiedEmployee.model_fields)
+_INSERT_SQL = (
+    f"INSERT INTO employees ({', '.join(HASHED_FIELDS)}, content_hash, source_name, source_record_id, ingested_at) "
+    f"VALUES ({', '.join('?' for _ in HASHED_FIELDS)}, ?, ?, ?, ?)"
+)
+
+
+def content_hash(record: dict) -> str:
+    # Numbers as floats so 12000 from one path and 12000.0 from another hash the same
+    values = [
+        float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+        for v in (record.get(field) for field in HASHED_FIELDS)
+    ]
+    payload = json.dumps(values, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _json_column(values: pd.Series) -> np.ndarray:
+    """Each value as the JSON text content_hash's json.dumps gives it, encoding every distinct value once."""
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=object).tolist()
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        encoded = [json.dumps(float(value)) for value in uniques]
+    else:
+        encoded = [encode_basestring_ascii(value) if isinstance(value, str) else json.dumps(value, default=str) for value in uniques]
+    # Missing values get code -1, which picks the trailing "null"
+    return np.array(encoded + ["null"], dtype=object)[codes]
+
+
+def frame_content_hashes(frame: pd.DataFrame) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """content_hash for every row of a normalised frame, plus the JSON-encoded columns they were built from."""
+    encoded = {field: _json_column(frame[field]) for field in HASHED_FIELDS}
+    payloads = "[" + encoded[HASHED_FIELDS[0]]
+    for field in HASHED_FIELDS[1:]:
+        payloads = payloads + "," + encoded[field]
+    payloads = payloads + "]"
+    blake2b = hashlib.blake2b
+    hashes = np.array([blake2b(payload.encode(), digest_size=16).hexdigest() for payload in payloads], dtype=object)
+    return hashes, encoded
+
+
+def _column_values(values: pd.Series) -> np.ndarray:
+    # Object dtype first so missing values come out as None rather than NaN/<NA>
+    return values.astype(object).where(values.notna(), None).to_numpy()
+
+
+def purge_source(db: Session, source_name: str) -> int:
+    """Deletes a source's rows with one statement on the (source_name, source_record_id) index. The caller commits."""
+    record_deletes(db, "source_name = ?", (source_name,))
+    deleted = db.execute(delete(Employee).where(Employee.source_name == source_name)).rowcount
+    metrics.incr("ingest.purged", deleted)
+    return deleted
+
+
+def source_counts(db: Session) -> dict[str, int]:
+    rows = db.execute(
+        select(Employee.source_name, func.count()).where(Employee.deleted_at.is_(None)).group_by(Employee.source_name)
+    ).all()
+    return {source or "Unknown": count for source, count in rows}
+
+
+def _same(stored, incoming) -> bool:
+    if isinstance(stored, (int, float)) and isinstance(incoming, (int, float)):
+        return float(stored) == float(incoming)
+    return stored == incoming
+
+
+def _change(record: dict, op: str, changed: dict) -> dict:
+    return {
+        "source_name": record["source_name"],
+        "source_record_id": record["source_record_id"],
+        "employee_id": record.get("employee_id"),
+        "op": op,
+        "changed": changed,
+    }
+
+
+def bulk_upsert_employees(db: Session, source_name: str, records: list[dict]) -> dict:
+    """Inserts or updates a source's employees by (source_name, source_record_id) with set-based statements.
+
+    Rows whose content hash matches the stored one are not written at all. Later records win when the
+    same id appears twice. The caller commits. Returns inserted/updated/unchanged counts."""
+    by_id = {record["employee_id"]: record for record in records}
+    ids = list(by_id)
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    now = utcnow()
+
+    for start in range(0, len(ids), UPSERT_CHUNK_SIZE):
+        chunk = ids[start:start + UPSERT_CHUNK_SIZE]
+        existing = {
+            row.source_record_id: row
+            for row in db.execute(
+                select(
+                    Employee.source_record_id, Employee.id, Employee.content_hash, Employee.deleted_at,
+                    *(getattr(Employee, field) for field in HASHED_FIELDS),
+                ).where(
+                    Employee.source_name == source_name,
+                    Employee.source_record_id.in_(chunk),
+                )
+            )
+        }
+
+        updates, inserts, changes = [], [], []
+        for record_id in chunk:
+            record = {
+                **by_id[record_id],
+                "content_hash": content_hash(by_id[record_id]),
+                "source_name": source_name,
+                "source_record_id": record_id,
+                "ingested_at": now,
+                "deleted_at": None,
+            }
+            stored = existing.get(record_id)
+            if stored is None:
+                inserts.append(record)
+                changes.append(_change(record, "insert", {f: record.get(f) for f in HASHED_FIELDS}))
+            elif stored.content_hash != record["content_hash"] or stored.deleted_at is not None:
+                # Changed, or back after a full refresh tombstoned it
+                updates.append({"id": stored.id, **record})
+                changed = {f: record.get(f) for f in HASHED_FIELDS if not _same(getattr(stored, f), record.get(f))}
+                changes.append(_change(record, "insert" if stored.deleted_at is not None else "update", changed))
+            else:
+                counts["unchanged"] += 1
+
+        if updates:
+            db.execute(update(Employee), updates)
+        if inserts:
+            db.execute(insert(Employee), inserts)
+        record_changes(db, changes)
+        counts["inserted"] += len(inserts)
+        counts["updated"] += len(updates)
+
+    for outcome, count in counts.items():
+        metrics.incr(f"ingest.{outcome}", count)
+    return counts
+
+
+def _stored_rows(db: Session, source_name: str, ids: np.ndarray) -> pd.DataFrame:
+    """content_hash and tombstone flag of the source's stored rows among ids, indexed by source_record_id."""
+    conn = db.connection()
+    rows = []
+    for start in range(0, len(ids), UPSERT_CHUNK_SIZE):
+        chunk = ids[start:start + UPSERT_CHUNK_SIZE].tolist()
+        rows.extend(conn.exec_driver_sql(
+            "SELECT source_record_id, 1, content_hash, deleted_at IS NOT NULL FROM employees "
+            f"WHERE source_name = ? AND source_record_id IN ({', '.join('?' for _ in chunk)})",
+            (source_name, *chunk),
+        ).fetchall())
+    stored = pd.DataFrame(rows, columns=["source_record_id", "found", "content_hash", "deleted"])
+    return stored.set_index("source_record_id").reindex(ids)
+
+
+def bulk_upsert_frame(db: Session, source_name: str, frame: pd.DataFrame) -> dict:
+    """bulk_upsert_employees for a normalised frame, kept columnar through hashing and writing.
+
+    New rows are written with one executemany straight from the column arrays, and their change entries
+    reuse the JSON the hashes were built from. Only changed rows become records, since their change
+    entries need a per-field diff against the stored row. The caller commits."""
+    frame = frame.drop_duplicates("employee_id", keep="last")
+    hashes, encoded = frame_content_hashes(frame)
+    ids = _column_values(frame["employee_id"])
+
+    stored = _stored_rows(db, source_name, ids)
+    found = stored["found"].notna().to_numpy()
+    same = (stored["content_hash"].to_numpy() == hashes) & ~stored["deleted"].eq(1).to_numpy()
+    new = np.flatnonzero(~found)
+    changed = np.flatnonzero(found & ~same)
+    counts = {"inserted": len(new), "updated": 0, "unchanged": int((found & same).sum())}
+
+    if len(new):
+        columns = [_column_values(frame[field])[new] for field in HASHED_FIELDS]
+        stamp = utcnow().strftime(TIMESTAMP_FORMAT)
+        db.connection().exec_driver_sql(
+            _INSERT_SQL, list(zip(*columns, hashes[new], repeat(source_name), ids[new], repeat(stamp)))
+        )
+        # An insert's change entry carries every field
+        entries = f'{{"{HASHED_FIELDS[0]}":' + encoded[HASHED_FIELDS[0]][new]
+        for field in HASHED_FIELDS[1:]:
+            entries = entries + f',"{field}":' + encoded[field][new]
+        entries = entries + "}"
+        record_encoded_changes(db, list(zip(repeat(source_name), ids[new], ids[new], repeat("insert"), entries)))
+
+    metrics.incr("ingest.inserted", counts["inserted"])
+    metrics.incr("ingest.unchanged", counts["unchanged"])
+    if len(changed):
+        # Changed or tombstoned rows take the per-record path, which counts its own metrics
+        counts["updated"] = bulk_upsert_employees(db, source_name, frame_to_records(frame.iloc[changed]))["updated"]
+    return counts
+
+
+class FullRefresh:
+    """Tombstones a source's rows that a full-refresh sync did not deliver.
+
+    Keys seen during the sync go into a temp table on the session's connection; finish() then marks every
+    live row of the source without a match in one anti-join over the (source_name, source_record_id) index,
+    instead of diffing Python sets of ids. Use within one transaction; the caller commits."""
+
+    TABLE = "refresh_seen"
+
+    def __init__(self, db: Session, source_name: str):
+        self.db = db
+        self.source_name = source_name
+        self.seen = 0
+        conn = db.connection()
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS temp.{self.TABLE}")
+        conn.exec_driver_sql(f"CREATE TEMP TABLE {self.TABLE} (source_record_id TEXT PRIMARY KEY)")
+
+    def add(self, record_ids):
+        rows = [(record_id,) for record_id in record_ids]
+        if rows:
+            self.db.connection().exec_driver_sql(f"INSERT OR IGNORE INTO temp.{self.TABLE} VALUES (?)", rows)
+            self.seen += len(rows)
+
+    def finish(self) -> int:
+        conn = self.db.connection()
+        missing = (
+            f"source_name = ? AND deleted_at IS NULL AND NOT EXISTS ("
+            f"SELECT 1 FROM temp.{self.TABLE} seen WHERE seen.source_record_id = employees.source_record_id)"
+        )
+        record_deletes(self.db, missing, (self.source_name,))
+        tombstoned = conn.exec_driver_sql(
+            f"UPDATE employees SET deleted_at = ? WHERE {missing}",
+            (utcnow().isoformat(" "), self.source_name),
+        ).rowcount
+        conn.exec_driver_sql(f"DROP TABLE temp.{self.TABLE}")
+        metrics.incr("ingest.tombstoned", tombstoned)
+        return tombstoned
+
+    def abandon(self):
+        self.db.connection().exec_driver_sql(f"DROP TABLE IF EXISTS temp.{self.TABLE}")
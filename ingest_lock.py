@@ -0,0 +1,244 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from database import LockSessionLocal, SessionLocal
+from metrics import metrics
+from models import IngestLock, IngestRun
+from qa_log_writer import utcnow
+
+# A lock not renewed for this long belongs to a dead worker and may be taken over
+INGEST_LOCK_TTL_SECONDS = float(os.getenv("INGEST_LOCK_TTL_SECONDS", "60"))
+INGEST_WAIT_TIMEOUT_SECONDS = float(os.getenv("INGEST_WAIT_TIMEOUT_SECONDS", "600"))
+INGEST_POLL_SECONDS = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+class IngestWaitTimeout(Exception):
+    status_code = 503
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _try_acquire(source_name: str, trigger: str, fingerprint: str | None = None) -> tuple[int | None, int | None]:
+    """Returns (our run id, None) when the lock was taken, otherwise (None, the holder's run id)."""
+    now = utcnow()
+    db = SessionLocal()
+    locks = LockSessionLocal()
+    try:
+        # A live lock is answered from the lock database alone, without queueing for the main one's write lock
+        held = locks.execute(
+            select(IngestLock.run_id, IngestLock.expires_at).where(IngestLock.source_name == source_name)
+        ).first()
+        if held is not None and held.expires_at >= now:
+            return None, held.run_id
+
+        run = IngestRun(
+            source_name=source_name, trigger=trigger, owner=_owner(), status="running",
+            fingerprint=fingerprint, started_at=now,
+        )
+        db.add(run)
+        db.flush()
+
+        previous = held.run_id if held is not None else None
+        statement = insert(IngestLock).values(
+            source_name=source_name, run_id=run.id, owner=run.owner,
+            expires_at=now + timedelta(seconds=INGEST_LOCK_TTL_SECONDS),
+        )
+        # Only an expired lock can be taken over
+        statement = statement.on_conflict_do_update(
+            index_elements=[IngestLock.source_name],
+            set_={"run_id": run.id, "owner": run.owner, "expires_at": statement.excluded.expires_at},
+            where=IngestLock.expires_at < now,
+        )
+        if locks.execute(statement).rowcount == 0:
+            locks.rollback()
+            db.rollback()
+            return None, locks.scalar(select(IngestLock.run_id).where(IngestLock.source_name == source_name))
+        locks.commit()
+
+        try:
+            if previous is not None:
+                db.execute(
+                    update(IngestRun)
+                    .where(IngestRun.id == previous, IngestRun.status == "running")
+                    .values(status="abandoned", error="lock expired", finished_at=now)
+                )
+                metrics.incr("ingest_lock.taken_over")
+            db.commit()
+        except Exception:
+            # A lock whose run row never committed would only stall waiters until it expired
+            _release(source_name, run.id)
+            raise
+        return run.id, None
+    finally:
+        locks.close()
+        db.close()
+
+
+def _renew(source_name: str, run_id: int):
+    locks = LockSessionLocal()
+    try:
+        locks.execute(
+            update(IngestLock)
+            .where(IngestLock.source_name == source_name, IngestLock.run_id == run_id)
+            .values(expires_at=utcnow() + timedelta(seconds=INGEST_LOCK_TTL_SECONDS))
+        )
+        locks.commit()
+    finally:
+        locks.close()
+
+
+def _release(source_name: str, run_id: int):
+    locks = LockSessionLocal()
+    try:
+        locks.execute(delete(IngestLock).where(IngestLock.source_name == source_name, IngestLock.run_id == run_id))
+        locks.commit()
+    finally:
+        locks.close()
+
+
+def _finish(source_name: str, run_id: int, status: str, result: dict | None = None, error: str | None = None):
+    # The outcome is committed before the lock is released, so whoever takes the lock next can see it
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(IngestRun)
+            .where(IngestRun.id == run_id)
+            .values(status=status, result=result, error=error, finished_at=utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+        _release(source_name, run_id)
+
+
+def _lock_expired(source_name: str, run_id: int) -> bool:
+    locks = LockSessionLocal()
+    try:
+        expires_at = locks.scalar(
+            select(IngestLock.expires_at).where(IngestLock.source_name == source_name, IngestLock.run_id == run_id)
+        )
+    finally:
+        locks.close()
+    return expires_at is None or expires_at < utcnow()
+
+
+def _wait_for(source_name: str, run_id: int, deadline: float) -> IngestRun | None:
+    """Waits for another run to finish; returns it, or None if its worker died without finishing."""
+    while time.monotonic() < deadline:
+        db = SessionLocal()
+        try:
+            run = db.get(IngestRun, run_id)
+        finally:
+            db.close()
+        if run is None or run.status != "running":
+            return run
+        if _lock_expired(source_name, run_id):
+            return None
+        time.sleep(INGEST_POLL_SECONDS)
+    raise IngestWaitTimeout(f"Timed out waiting for the running {source_name} ingest (run {run_id})")
+
+
+class _Heartbeat:
+    def __init__(self, source_name: str, run_id: int):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(source_name, run_id), name=f"ingest-lock-{run_id}", daemon=True)
+
+    def _run(self, source_name: str, run_id: int):
+        while not self._stop.wait(INGEST_LOCK_TTL_SECONDS / 3):
+            try:
+                _renew(source_name, run_id)
+            except Exception:
+                metrics.incr("ingest_lock.renew_errors")
+                logger.exception("Ingest lock renewal failed for %s", source_name)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_exclusive(source_name: str, trigger: str, work, attach: bool = True, wait: bool = True, fingerprint: str | None = None) -> dict:
+    """Runs work() while holding the source's ingest lock and records the run in ingest_runs.
+
+    The lock is a row in ingest_locks (in the lock database), so it holds across workers and its heartbeat
+    can renew it while work() has the main database's write lock. If another run holds it, attach=True
+    waits for that run and returns its result instead of repeating the work. attach=False waits for it
+    to finish and then runs, for callers like an upload whose data the other run does not have.
+    wait=False returns status "busy" straight away instead of waiting at all."""
+    deadline = time.monotonic() + INGEST_WAIT_TIMEOUT_SECONDS
+    while True:
+        run_id, holder = _try_acquire(source_name, trigger, fingerprint)
+        if run_id is not None:
+            break
+        metrics.incr("ingest_lock.contended")
+        if not wait:
+            return {"run_id": holder, "attached": False, "status": "busy", "result": None}
+        finished = _wait_for(source_name, holder, deadline)
+        if attach and finished is not None and finished.status == "succeeded":
+            metrics.incr("ingest_lock.attached")
+            return {"run_id": finished.id, "attached": True, "status": finished.status, "result": finished.result}
+
+    with _Heartbeat(source_name, run_id):
+        try:
+            result = work()
+        except Exception as e:
+            _finish(source_name, run_id, "failed", error=str(e)[:500])
+            raise
+    _finish(source_name, run_id, "succeeded", result=result)
+    return {"run_id": run_id, "attached": False, "status": "succeeded", "result": result}
+
+
+def last_fingerprint(source_name: str) -> str | None:
+    """Fingerprint of the source's latest successful or skipped run; None if that run did not record one."""
+    db = SessionLocal()
+    try:
+        return db.scalar(
+            select(IngestRun.fingerprint)
+            .where(IngestRun.source_name == source_name, IngestRun.status.in_(("succeeded", "skipped")))
+            .order_by(IngestRun.id.desc())
+            .limit(1)
+        )
+    finally:
+        db.close()
+
+
+def record_skipped(source_name: str, trigger: str, fingerprint: str) -> int:
+    now = utcnow()
+    db = SessionLocal()
+    try:
+        run = IngestRun(
+            source_name=source_name, trigger=trigger, owner=_owner(), status="skipped",
+            result={"reason": "source unchanged"}, fingerprint=fingerprint, started_at=now, finished_at=now,
+        )
+        db.add(run)
+        db.commit()
+        return run.id
+    finally:
+        db.close()
+
+
+def list_runs(source_name: str | None = None, limit: int = 50, before_id: int | None = None) -> list[dict]:
+    db = SessionLocal()
+    try:
+        query = select(IngestRun)
+        if source_name:
+            query = query.where(IngestRun.source_name == source_name)
+        if before_id is not None:
+            query = query.where(IngestRun.id < before_id)
+        return [run.to_dict() for run in db.scalars(query.order_by(IngestRun.id.desc()).limit(limit)).all()]
+    finally:
+        db.close()
@@ -0,0 +1,182 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from field_mapper import heuristic_field_mapping
+
+load_dotenv()
+
+# openai | ollama | fake
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+# record: call the backend and save every exchange; replay: answer only from the cassette
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "./cassettes/llm.json")
+
+_MAPPING_FIELDS = re.compile(r"Here are the fields: (\[.*?\])", re.DOTALL)
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def prompt_key(messages: List[BaseMessage], stop: Optional[List[str]] = None) -> str:
+    # Independent of the backend so a recording from one provider replays anywhere
+    payload = json.dumps([stop or [], [[m.type, m.content] for m in messages]], default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Cassette:
+    """Recorded prompt -> response pairs kept in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._interactions = json.load(f).get("interactions", {})
+
+    def get(self, key: str) -> Optional[str]:
+        interaction = self._interactions.get(key)
+        return interaction["response"] if interaction else None
+
+    def put(self, key: str, prompt: str, response: str):
+        with self._lock:
+            self._interactions[key] = {"prompt": prompt, "response": response}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump({"interactions": self._interactions}, f, indent=2)
+
+
+def _message(content: str, prompt: str) -> AIMessage:
+    input_tokens, output_tokens = _estimate_tokens(prompt), _estimate_tokens(content)
+    return AIMessage(
+        content=content,
+        usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+    )
+
+
+def _single_chunk(result: ChatResult, run_manager=None) -> Iterator[ChatGenerationChunk]:
+    # Streaming callers (the agent) need chunks; these backends answer in one piece, so that piece is the only chunk
+    message = result.generations[0].message
+    chunk = ChatGenerationChunk(message=AIMessageChunk(content=message.content, usage_metadata=message.usage_metadata))
+    if run_manager:
+        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+    yield chunk
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline backend.
+
+    Mapping prompts are answered from the field_mapper rules table, anything else from the cassette."""
+
+    latency_seconds: float = 0.0
+    cassette: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"latency_seconds": self.latency_seconds}
+
+    def _respond(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> str:
+        prompt = messages[-1].content
+
+        fields = _MAPPING_FIELDS.search(prompt)
+        if fields:
+            return json.dumps(heuristic_field_mapping(ast.literal_eval(fields.group(1))))
+
+        recorded = self.cassette.get(prompt_key(messages, stop)) if self.cassette else None
+        if recorded is not None:
+            return recorded
+        return "Final Answer: No recorded response for this question."
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        content = self._respond(messages, stop)
+        return ChatResult(generations=[ChatGeneration(message=_message(content, messages[-1].content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        yield from _single_chunk(self._generate(messages, stop, **kwargs), run_manager)
+
+
+class CassetteChatModel(BaseChatModel):
+    """Records the wrapped backend's responses to a cassette, or replays them without it."""
+
+    cassette: Any
+    inner: Optional[BaseChatModel] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassette-{self.inner._llm_type}" if self.inner else "cassette"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        key = prompt_key(messages, stop)
+
+        if self.inner is None:
+            recorded = self.cassette.get(key)
+            if recorded is None:
+                raise CassetteMiss(f"No recorded response for prompt {key[:12]} in {self.cassette.path}")
+            message = _message(recorded, messages[-1].content)
+        else:
+            message = self.inner.invoke(messages, stop=stop, **kwargs)
+            self.cassette.put(key, messages[-1].content, message.content)
+
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        # Recorded whole, replayed whole
+        yield from _single_chunk(self._generate(messages, stop, **kwargs), run_manager)
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def open_cassette(path: str) -> Cassette:
+    # Every caller shares one Cassette per file so recordings don't overwrite each other
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+def build_backend(json_mode: bool = False) -> BaseChatModel:
+    """json_mode asks the provider for a bare JSON object instead of free text."""
+    cassette = open_cassette(LLM_CASSETTE_PATH) if LLM_CASSETTE_MODE or LLM_BACKEND == "fake" else None
+    if LLM_CASSETTE_MODE == "replay":
+        return CassetteChatModel(cassette=cassette)
+
+    if LLM_BACKEND == "fake":
+        backend = FakeChatModel(latency_seconds=FAKE_LLM_LATENCY_MS / 1000, cassette=cassette)
+    elif LLM_BACKEND == "ollama":
+        from langchain_ollama import ChatOllama
+        backend = ChatOllama(model=OLLAMA_MODEL, format="json" if json_mode else None)
+    elif LLM_BACKEND == "openai":
+        from langchain_openai import ChatOpenAI
+        model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+        backend = ChatOpenAI(model=LLM_MODEL, stream_usage=True, model_kwargs=model_kwargs)
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}")
+
+    if LLM_CASSETTE_MODE == "record":
+        return CassetteChatModel(cassette=cassette, inner=backend)
+    return backend
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from llm_backends import build_backend
+from llm_governor import BACKGROUND, CALLER_CLASSES, estimate_tokens, llm_governor
+from metrics import metrics
+
+load_dotenv()
+
+# Files the service creates at runtime, kept out of the working directory
+DATA_DIR = os.getenv("DATA_DIR", "./data")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.db"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+# readwrite: use and fill the cache; replay: cache only, never call the provider; off: no cache
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "readwrite")
+
+
+class LLMCacheMiss(Exception):
+    pass
+
+
+class LLMResponseCache:
+    """Persistent prompt-hash -> response cache with LRU eviction, stored in its own SQLite file."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, usage TEXT, created_at REAL, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[tuple[str, dict]]:
+        with self._lock:
+            row = self._conn.execute("SELECT content, usage FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row[0], json.loads(row[1] or "{}")
+
+    def put(self, key: str, content: str, usage: dict):
+        now = time.time()
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO llm_cache (key, content, usage, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, content, json.dumps(usage), now, now),
+            ).rowcount
+            self._size += inserted
+
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+                metrics.incr("llm.cache.evictions", overflow)
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._size -= self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        return {"path": LLM_CACHE_PATH, "entries": self._size, "max_entries": self.max_entries}
+
+
+# The wrapper reports each call itself; the inner model's own callback events would repeat every token
+_INNER_CONFIG = {"callbacks": []}
+
+
+def _as_chunk(message: BaseMessage) -> AIMessageChunk:
+    # Models without their own _stream hand stream() callers a whole AIMessage instead of chunks
+    if isinstance(message, AIMessageChunk):
+        return message
+    return AIMessageChunk(content=message.content, usage_metadata=getattr(message, "usage_metadata", None))
+
+
+class CachedChatModel(BaseChatModel):
+    """Wraps a chat model with the shared response cache and per-caller usage accounting."""
+
+    inner: BaseChatModel
+    caller: str
+    response_cache: Optional[Any] = None
+    mode: str = "readwrite"
+    traffic_class: str = BACKGROUND
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.inner._llm_type}"
+
+    def _cache_key(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs) -> str:
+        llm_string = self.inner._get_llm_string(stop=stop, **kwargs)
+        payload = json.dumps([llm_string, [[m.type, m.content] for m in messages]], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def forget(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs):
+        """Drops a cached response, e.g. one the caller found unusable, so a retry reaches the provider."""
+        if self.response_cache is not None:
+            self.response_cache.delete(self._cache_key(messages, stop, **kwargs))
+
+    def _lookup(self, key: str) -> Optional[str]:
+        if self.mode == "off" or self.response_cache is None:
+            return None
+
+        hit = self.response_cache.get(key)
+        if hit is None:
+            metrics.incr(f"llm.{self.caller}.cache_misses")
+            if self.mode == "replay":
+                raise LLMCacheMiss(f"No cached response for {self.caller} prompt {key[:12]} in replay mode")
+            return None
+
+        content, usage = hit
+        metrics.incr(f"llm.{self.caller}.cache_hits")
+        metrics.incr(f"llm.{self.caller}.tokens_saved", usage.get("total_tokens", 0))
+        usage_log.record(self.caller, key, 0.0, {}, cached=True)
+        return content
+
+    def _admit(self, messages: List[BaseMessage]) -> int:
+        # Only calls that reach the provider spend rate budget; cache hits are free
+        estimated = estimate_tokens(messages)
+        llm_governor.acquire(self.traffic_class, estimated)
+        return estimated
+
+    def _record(self, key: str, message: BaseMessage, started: float, estimated: int):
+        elapsed = time.perf_counter() - started
+        usage = dict(getattr(message, "usage_metadata", None) or {})
+        llm_governor.settle(self.traffic_class, estimated, usage.get("total_tokens", estimated))
+
+        metrics.incr(f"llm.{self.caller}.calls")
+        metrics.incr(f"llm.{self.caller}.input_tokens", usage.get("input_tokens", 0))
+        metrics.incr(f"llm.{self.caller}.output_tokens", usage.get("output_tokens", 0))
+        metrics.observe(f"llm.{self.caller}.latency_seconds", elapsed)
+        usage_log.record(self.caller, key, elapsed, usage, cached=False)
+
+        if self.mode != "off" and self.response_cache is not None:
+            self.response_cache.put(key, message.content, usage)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=cached))])
+
+        estimated = self._admit(messages)
+        started = time.perf_counter()
+        message = self.inner.invoke(messages, config=_INNER_CONFIG, stop=stop, **kwargs)
+        self._record(key, message, started, estimated)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        key = self._cache_key(messages, stop, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=cached))
+            return
+
+        estimated = self._admit(messages)
+        started = time.perf_counter()
+        full = None
+        for message in self.inner.stream(messages, config=_INNER_CONFIG, stop=stop, **kwargs):
+            chunk = _as_chunk(message)
+            full = chunk if full is None else full + chunk
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+        if full is not None:
+            self._record(key, full, started, estimated)
+
+
+class UsageLog:
+    """Keeps the most recent LLM calls for /llm/usage."""
+
+    def __init__(self, size: int = 200):
+        self._calls = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, caller: str, key: str, seconds: float, usage: dict, cached: bool):
+        with self._lock:
+            self._calls.append({
+                "caller": caller,
+                "prompt_hash": key[:16],
+                "cached": cached,
+                "seconds": round(seconds, 4),
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "at": time.time(),
+            })
+
+    def recent(self) -> list[dict]:
+        with self._lock:
+            return list(self._calls)
+
+
+# Global instances
+usage_log = UsageLog()
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES)
+
+
+def get_chat_model(caller: str, json_mode: bool = False) -> CachedChatModel:
+    return CachedChatModel(
+        inner=build_backend(json_mode),
+        caller=caller,
+        response_cache=llm_cache,
+        mode=LLM_CACHE_MODE,
+        traffic_class=CALLER_CLASSES.get(caller, BACKGROUND),
+    )
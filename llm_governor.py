@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from metrics import metrics
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "256"))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Lower runs first
+PRIORITIES = {INTERACTIVE: 0, BACKGROUND: 1}
+DEADLINES = {
+    INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_DEADLINE_SECONDS", "20")),
+    BACKGROUND: float(os.getenv("LLM_BACKGROUND_DEADLINE_SECONDS", "120")),
+}
+CALLER_CLASSES = {"agent": INTERACTIVE}
+
+
+class GovernorDeadlineExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.refill_per_second)
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        # Can go negative when a call used more than estimated; the debt is repaid by refill
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMGovernor:
+    """Shares one requests/min and tokens/min budget across all LLM callers.
+
+    Waiters are served strictly by priority class, then arrival order, and give up at their deadline."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def _publish_queue(self):
+        for traffic_class, priority in PRIORITIES.items():
+            queued = sum(1 for p, _ in self._waiting if p == priority)
+            metrics.set_gauge(f"llm.governor.{traffic_class}.queued", queued)
+
+    def acquire(self, traffic_class: str, tokens: int, deadline_seconds: float | None = None):
+        ticket = (PRIORITIES[traffic_class], next(self._seq))
+        started = time.monotonic()
+        deadline = started + (deadline_seconds if deadline_seconds is not None else DEADLINES[traffic_class])
+
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._publish_queue()
+            try:
+                while True:
+                    wait = None
+                    if self._waiting[0] == ticket:
+                        wait = max(self._requests.time_until(1), self._tokens.time_until(tokens))
+                        if wait <= 0:
+                            self._requests.take(1)
+                            self._tokens.take(tokens)
+                            break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.incr(f"llm.governor.{traffic_class}.deadline_exceeded")
+                        raise GovernorDeadlineExceeded(f"No {traffic_class} LLM capacity within the deadline")
+                    self._cond.wait(min(wait, remaining) if wait is not None else remaining)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._publish_queue()
+                self._cond.notify_all()
+
+        metrics.incr(f"llm.governor.{traffic_class}.requests")
+        metrics.observe(f"llm.governor.{traffic_class}.wait_seconds", time.monotonic() - started)
+
+    def settle(self, traffic_class: str, estimated: int, actual: int):
+        with self._cond:
+            self._tokens.adjust(estimated - actual)
+            self._cond.notify_all()
+        metrics.incr(f"llm.governor.{traffic_class}.tokens", actual)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "requests_available": round(self._requests.tokens, 1),
+                "requests_per_minute": self._requests.capacity,
+                "tokens_available": round(self._tokens.tokens),
+                "tokens_per_minute": self._tokens.capacity,
+                "waiting": len(self._waiting),
+            }
+
+
+def estimate_tokens(messages) -> int:
+    return sum(len(str(m.content)) for m in messages) // 4 + LLM_COMPLETION_TOKEN_ESTIMATE
+
+# Global instance
+llm_governor = LLMGovernor(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
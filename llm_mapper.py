@@ -1,13 +1,39 @@
 from dotenv import load_dotenv
 from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
 from langchain_core.prompts import PromptTemplate
 import json
-import re
+import os
+import random
+import time
+
+from circuit_breaker import CircuitBreaker
+from field_mapper import heuristic_field_mapping
+from llm_client import get_chat_model
+from llm_governor import GovernorDeadlineExceeded
+from mapping_registry import MappingPendingReview, accepted_mappings, latest_approved, latest_mapping, resolve_pinned, save_mapping
+from metrics import metrics
+from schema_drift import diff_headers, header_fingerprint
+from schema import UnifiedEmployee
 
 load_dotenv()
 
-llm = ChatOpenAI(model = "gpt-4o-mini")
+MAPPING_MAX_ATTEMPTS = int(os.getenv("MAPPING_MAX_ATTEMPTS", "3"))
+MAPPING_BACKOFF_BASE_SECONDS = float(os.getenv("MAPPING_BACKOFF_BASE_SECONDS", "0.5"))
+MAPPING_BACKOFF_MAX_SECONDS = float(os.getenv("MAPPING_BACKOFF_MAX_SECONDS", "8"))
+
+UNIFIED_FIELDS = set(UnifiedEmployee.model_fields)
+
+llm = get_chat_model("mapper", json_mode=True)
+
+mapping_breaker = CircuitBreaker(
+    "mapping",
+    failure_threshold=int(os.getenv("MAPPING_BREAKER_THRESHOLD", "5")),
+    reset_timeout=float(os.getenv("MAPPING_BREAKER_RESET_SECONDS", "30")),
+)
+
+# Last mapping the LLM produced per source, served while the provider is unhealthy
+_last_good_mappings: dict[str, dict] = {}
 
 prompt_template = PromptTemplate.from_template("""
 Given a list of keys from a data source called "{source_name}", map them to a standard unified schema for employee data.
@@ -25,20 +51,180 @@ Example:
 Now give only the JSON mapping.
 """)
 
-def get_dynamic_field_mapping(source_name: str, fields: list[str]) -> dict:
+
+class MappingValidationError(ValueError):
+    pass
+
+
+def validate_mapping(raw, fields: list[str], require_employee_id: bool = True) -> dict:
+    if not isinstance(raw, dict):
+        raise MappingValidationError(f"Expected a JSON object, got {type(raw).__name__}")
+
+    mapping = {}
+    for src_field, unified_field in raw.items():
+        # Ignore fields the source doesn't have and fields the model chose not to map
+        if src_field not in fields or unified_field is None:
+            continue
+        if unified_field not in UNIFIED_FIELDS:
+            raise MappingValidationError(f"{src_field!r} mapped to unknown field {unified_field!r}")
+        if unified_field in mapping.values():
+            raise MappingValidationError(f"More than one field mapped to {unified_field!r}")
+        mapping[src_field] = unified_field
+
+    if require_employee_id and "employee_id" not in mapping.values():
+        raise MappingValidationError("No field mapped to employee_id")
+    return mapping
+
+
+def _request_mapping(source_name: str, fields: list[str], require_employee_id: bool) -> dict:
     prompt = prompt_template.format(source_name=source_name, fields=fields)
     res = llm.invoke(prompt)
-    raw_output = res.content.strip()
 
-    # Extract only the JSON using a regex (robust af)
-    match = re.search(r"\{.*\}", raw_output, re.DOTALL)
-    if match:
-        json_str = match.group(0)
+    try:
+        return validate_mapping(json.loads(res.content), fields, require_employee_id)
+    except (json.JSONDecodeError, MappingValidationError) as e:
+        # Don't let the cache hand the same bad reply to the retry
+        llm.forget([HumanMessage(content=prompt)])
+        raise MappingValidationError(str(e)) from e
+
+
+def _fallback_mapping(source_name: str, fields: list[str]) -> dict:
+    cached = _last_good_mappings.get(source_name)
+    if cached and all(src in fields for src in cached):
+        metrics.incr("mapping.fallback.cached")
+        return dict(cached)
+
+    metrics.incr("mapping.fallback.heuristic")
+    return heuristic_field_mapping(fields)
+
+
+def _map_fields(source_name: str, fields: list[str], require_employee_id: bool = True) -> tuple[dict, bool]:
+    """Returns (mapping, degraded); degraded mappings came from a fallback, not the LLM."""
+    metrics.incr("mapping.llm_fields", len(fields))
+
+    for attempt in range(MAPPING_MAX_ATTEMPTS):
+        if not mapping_breaker.allow():
+            break
+
         try:
-            return json.loads(json_str)
+            mapping = _request_mapping(source_name, fields, require_employee_id)
+            mapping_breaker.record_success()
+            if require_employee_id:
+                _last_good_mappings[source_name] = mapping
+            return mapping, False
+        except GovernorDeadlineExceeded:
+            # Our own rate budget is exhausted; retrying would only queue behind it again. The provider
+            # was never asked, so a half-open trial must not stay claimed
+            mapping_breaker.release_trial()
+            metrics.incr("mapping.throttled")
+            break
+        except MappingValidationError as e:
+            # The provider answered, just badly; that says nothing about its health
+            mapping_breaker.record_success()
+            metrics.incr("mapping.invalid_responses")
+            print(f"Invalid mapping from LLM for {source_name}: {e}")
         except Exception as e:
-            print("Failed to parse cleaned JSON:", json_str)
-            raise e
+            mapping_breaker.record_failure()
+            metrics.incr("mapping.provider_errors")
+            print(f"Mapping request for {source_name} failed: {e}")
+
+        if attempt < MAPPING_MAX_ATTEMPTS - 1:
+            metrics.incr("mapping.retries")
+            cap = min(MAPPING_BACKOFF_MAX_SECONDS, MAPPING_BACKOFF_BASE_SECONDS * 2 ** attempt)
+            time.sleep(random.uniform(0, cap))
+
+    return _fallback_mapping(source_name, fields), True
+
+
+def _carry_over(previous, fields: list[str]):
+    """The previous mapping applied to these headers: unchanged and renamed columns keep their targets."""
+    drift = diff_headers(previous.fields, fields)
+    mapping = {f: previous.mapping[f] for f in drift.unchanged if f in previous.mapping}
+    for old, new in drift.renamed.items():
+        if old in previous.mapping:
+            mapping[new] = previous.mapping[old]
+    return mapping, drift
+
+
+def _propose(source_name: str, fields: list[str], approved) -> int | None:
+    """Saves a proposed mapping for headers no approved version covers; None if only a fallback was available."""
+    if approved is None:
+        mapping, degraded = _map_fields(source_name, fields)
+        # Don't let a fallback become a proposal a reviewer might approve
+        return None if degraded else save_mapping(source_name, fields, mapping)
+
+    mapping, drift = _carry_over(approved, fields)
+
+    # New columns: cheap heuristics first, the LLM only for what they can't place
+    taken = set(mapping.values())
+    pending = drift.new_columns
+    for src, unified in heuristic_field_mapping(pending).items():
+        if unified not in taken:
+            mapping[src] = unified
+            taken.add(unified)
+
+    remapped = [f for f in pending if f not in mapping]
+    if remapped:
+        partial, degraded = _map_fields(source_name, remapped, require_employee_id=False)
+        if degraded:
+            return None
+        for src, unified in partial.items():
+            if unified not in taken:
+                mapping[src] = unified
+                taken.add(unified)
+
+    metrics.incr("mapping.drift_events")
+    return save_mapping(source_name, fields, mapping, drift, remapped)
+
+
+def get_dynamic_field_mapping(source_name: str, fields: list[str]) -> dict:
+    """Maps source fields to the unified schema using reviewed mappings only.
+
+    A pinned mapping wins outright, then the latest approved version. Headers it doesn't cover are
+    mapped once, through heuristics and then the LLM, and saved as a proposed version; until that is
+    approved, the approved mapping keeps applying to the columns it knows and new columns stay unmapped.
+    Raises MappingPendingReview when no approved mapping can be applied at all."""
+    fields = list(fields)
+    fingerprint = header_fingerprint(fields)
+
+    # Unchanged headers skip the database too
+    accepted, revision = accepted_mappings.lookup(source_name, fingerprint)
+    if accepted is not None:
+        return accepted
+
+    pinned = resolve_pinned(source_name, fields)
+    if pinned is not None:
+        metrics.incr("mapping.pinned_hits")
+        accepted_mappings.put(source_name, fingerprint, pinned, revision)
+        return dict(pinned)
+
+    approved = latest_approved(source_name)
+    if approved is not None and approved.fingerprint == fingerprint:
+        mapping = approved.mapping
     else:
-        print("Couldn’t find JSON in LLM response:", raw_output)
-        raise ValueError("No valid JSON object found in response")
\ No newline at end of file
+        latest = latest_mapping(source_name)
+        if latest is not None and latest.fingerprint == fingerprint:
+            # Already proposed for these headers
+            proposal = latest.version
+        else:
+            proposal = _propose(source_name, fields, approved)
+
+        mapping = _carry_over(approved, fields)[0] if approved is not None else {}
+        if "employee_id" not in mapping.values():
+            raise MappingPendingReview(source_name, proposal)
+        metrics.incr("mapping.pending_review")
+        if proposal is None:
+            # Nothing was proposed, so the next call asks the LLM again
+            return dict(mapping)
+
+    # Ignored after a save above, which moved the registry past revision; the next call caches it
+    accepted_mappings.put(source_name, fingerprint, mapping, revision)
+    return dict(mapping)
+
+
+def mapping_health() -> dict:
+    counters = metrics.snapshot()["counters"]
+    return {
+        "breaker": mapping_breaker.snapshot(),
+        **{name: count for name, count in counters.items() if name.startswith("mapping.")},
+    }
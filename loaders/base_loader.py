@@ -1,6 +1,14 @@
+import hashlib
+import json
 from abc import ABC, abstractmethod
+from typing import Iterator
+
+import pandas as pd
 
 class BaseLoader(ABC):
+    # Loaders that hold tabular data natively set this and override load_frames
+    supports_frames = False
+
     @abstractmethod
     def name(self) -> str:
         ...
@@ -8,3 +16,23 @@ class BaseLoader(ABC):
     @abstractmethod
     def load(self) -> list[dict]:
         ...
+
+    def load_frames(self, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        records = self.load()
+        for start in range(0, len(records), chunksize):
+            chunk = records[start:start + chunksize]
+            # Index by position in the full load so rejected rows can be traced back to the source
+            yield pd.DataFrame(chunk, index=range(start, start + len(chunk)))
+
+    def fingerprint(self) -> str | None:
+        """Changes whenever the source's data does; scheduled syncs skip a source whose fingerprint is unchanged.
+
+        None, the default, means there is no cheap check and every scheduled run syncs. Loaders that can ask the
+        source for a version, ETag or modified time override this; small in-memory sources can return
+        content_fingerprint()."""
+        return None
+
+    def content_fingerprint(self) -> str:
+        """Hash of a full load(): costs as much as the load itself, so only worth it where loading is cheap."""
+        payload = json.dumps(self.load(), sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
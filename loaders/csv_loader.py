@@ -1,19 +1,38 @@
+import hashlib
+
+import pandas as pd
+
 from .base_loader import BaseLoader
 from .loader_registry import loader_registry
 
 class CSVLoader(BaseLoader):
+    supports_frames = True
+
     def __init__(self):
-        self._records = []
+        self._frame = pd.DataFrame()
         self._source_name = "CSV"
 
     def name(self):
         return self._source_name
 
     def set_data(self, name: str, records: list[dict]):
+        self.set_frame(name, pd.DataFrame(records, dtype=str))
+
+    def set_frame(self, name: str, frame: pd.DataFrame):
         self._source_name = name
-        self._records = records
+        self._frame = frame
 
     def load(self):
-        return self._records
+        return self._frame.to_dict("records")
+
+    def fingerprint(self):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x1f".join(map(str, self._frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(self._frame, index=False).values.tobytes())
+        return digest.hexdigest()
+
+    def load_frames(self, chunksize: int = 100_000):
+        for start in range(0, len(self._frame), chunksize):
+            yield self._frame.iloc[start:start + chunksize]
 
-loader_registry.register(CSVLoader())
\ No newline at end of file
+loader_registry.register(CSVLoader())
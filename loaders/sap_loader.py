@@ -6,6 +6,10 @@ class FakeSAPLoader(BaseLoader):
     def name(self):
         return "FakeSAP"
 
+    def fingerprint(self):
+        # In memory, so hashing a load is cheap
+        return self.content_fingerprint()
+
     def load(self):
         return [
             {"emp_id":"001", "emp_sal":12000, "emp_name":"Ramesh"},
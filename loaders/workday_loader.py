@@ -5,6 +5,10 @@ class FakeWorkdayLoader(BaseLoader):
     def name(self):
         return "FakeWorkday"
 
+    def fingerprint(self):
+        # In memory, so hashing a load is cheap
+        return self.content_fingerprint()
+
     def load(self):
         return [
             {"id":"001", "name":"Ramesh", "sal":12000},
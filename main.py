@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Form, Body
+from fastapi import FastAPI, HTTPException, Depends, Body, Request, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Literal
 from datetime import datetime
 import pandas as pd
-from io import StringIO
+import asyncio
+import logging
+import time
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import select, func
@@ -11,8 +16,6 @@ from models import Employee
 from database import SessionLocal, get_db
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.runnables import Runnable
-import csv
-import io
 
 import loaders.sap_loader
 import loaders.workday_loader
@@ -20,15 +23,42 @@ import loaders.workday_loader
 
 from loaders.loader_registry import loader_registry
 from loaders.csv_loader import CSVLoader
-from schema import UnifiedEmployee
-from field_mapper import fake_field_mappings
-from llm_mapper import get_dynamic_field_mapping
-from database import SessionLocal, engine
-from models import Employee, QALog
+from field_mapper import fake_field_mappings, source_fields
+from llm_mapper import get_dynamic_field_mapping, mapping_health
+import mapping_registry
+from mapping_registry import drift_events, MappingNotFound, MappingPendingReview
+from database import SessionLocal, migrate
+from models import Employee, QALog, GoldenEmployee
 from agent import sql_agent
-
-QALog.metadata.create_all(bind=engine)
-Employee.metadata.create_all(bind=engine)
+from sql_guard import SQLGuardError
+from metrics import metrics
+from ask_stream import stream_agent_answer
+from agent_runner import agent_runner, AgentBusy, AgentQueueTimeout
+from ask_batch import stream_batch_answers, ASK_BATCH_MAX_QUESTIONS
+from qa_log_writer import qa_log_writer
+from outbox import outbox_dispatcher
+from source_registry import source_registry
+from canonicalize import canonicalizer
+from frame_normalizer import normalize_frame
+from ingest import bulk_upsert_frame, purge_source, source_counts, FullRefresh
+from ingest_lock import run_exclusive, list_runs, IngestWaitTimeout
+from sync import sync_source
+from sync_scheduler import sync_scheduler
+from entity_resolution import resolve_entities
+from change_log import changes_since, ChangeLogGap, CHANGE_PAGE_LIMIT
+from change_log import compact as compact_change_log
+from batch_validation import validate_batch
+from coercion import coercer_registry
+from quarantine import quarantine_frame, quarantine_rejected, list_quarantined, QUARANTINE_PAGE_LIMIT
+from quarantine import replay as replay_quarantined
+from upload_stream import CSVUploadStream, UploadError, UPLOAD_CSV_OPENAPI
+from llm_client import llm_cache, usage_log
+from llm_governor import llm_governor
+
+logger = logging.getLogger(__name__)
+
+migrate()
+mapping_registry.seed_registry()
 app = FastAPI(
     title="SyncHub API",
     description="A backend platform to connect enterprise data sources, auto-map employee records with LLMs, and normalize everything into a unified schema.",
@@ -39,27 +69,35 @@ app = FastAPI(
     },
 )
 
-# In-memory storage for now
-connected_sources = []
+@app.on_event("startup")
+def start_background_writers():
+    qa_log_writer.start()
+    outbox_dispatcher.start()
+    sync_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_background_writers():
+    sync_scheduler.stop()
+    qa_log_writer.stop()
+    outbox_dispatcher.stop()
 
 # --- Models ---
 class Source(BaseModel):
     name: str # e.g. FakeSAP, FakeWorkday
+    # full_refresh tombstones stored rows the source no longer returns
+    mode: Literal["incremental", "full_refresh"] = "incremental"
+
+class MappingImport(BaseModel):
+    mappings: List[Dict]
 
 class AskRequest(BaseModel):
     question: str
 
-def normalise_employee_record(record:dict, source_name:str) -> UnifiedEmployee:
-
-    field_map = get_dynamic_field_mapping(source_name, list[record.keys()])
-    
-    # field_map = fake_field_mappings[source_name]
-
-    unified_kwargs = {}
-    for src_field, unified_field in field_map.items():
-        unified_kwargs[unified_field] = record.get(src_field)
+class AskBatchRequest(BaseModel):
+    questions: List[str]
 
-    return UnifiedEmployee(**unified_kwargs)
+class QuarantineReplay(BaseModel):
+    ids: Optional[List[int]] = None
 
 # --- Routes ---
 @app.get("/", summary="Health check")
@@ -71,179 +109,401 @@ def connect_source(source: Source):
     if not loader_registry.exists(source.name):
         raise HTTPException(status_code=404, detail = 'Source not supported yet')
     
-    for s in connected_sources:
-        if s["name"] == source.name:
-            return {"message": f"{source.name} already connected"}
-    
-    connected_sources.append({
-            "name": source.name,
-            "connected_at": datetime.now().isoformat()
-        }
-    )
+    if not source_registry.connect(source.name, source.mode):
+        return {"message": f"{source.name} already connected"}
+
     return {"message": f"{source.name} connected successfully"}
 
 @app.delete("/disconnect-source", summary="Disconnect a data source")
-def disconnect_source(source: Source = Body(...)):
-    global connected_sources
-    initial_count = len(connected_sources)
+def disconnect_source(source: Source = Body(...), purge: bool = Query(False, description="Also delete the source's employee rows"), db: Session = Depends(get_db)):
+    if not source_registry.disconnect(source.name):
+        raise HTTPException(status_code=404, detail=f"{source.name} was not connected.")
 
-    connected_sources = [
-        s for s in connected_sources if s["name"] != source.name
-    ]
+    if not purge:
+        return {"message": f"{source.name} disconnected successfully"}
 
-    if len(connected_sources) == initial_count:
-        raise HTTPException(status_code=404, detail=f"{source.name} was not connected.")
-    
-    return {"message": f"{source.name} disconnected successfully"}
+    def purge():
+        deleted = purge_source(db, source.name)
+        db.commit()
+        return {"purged": deleted}
+
+    try:
+        # Under the source's lock, so a sync already in flight finishes first instead of writing rows back afterwards
+        run = run_exclusive(source.name, "disconnect", purge, attach=False)
+    except IngestWaitTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    return {"message": f"{source.name} disconnected successfully", "purged": run["result"]["purged"], "run_id": run["run_id"]}
 
 @app.get("/get-data", summary="Get data from connected sources")
 def get_data():
-    all_data = []
-    db: Session = next(get_db())
+    synced = {}
+    runs = {}
+    quarantined = 0
 
+    connected_sources = source_registry.all()
     for source in connected_sources:
         src_name = source["name"]
-        source_data = loader_registry.get(src_name).load()
-
-        for record in source_data:
-            unified = normalise_employee_record(record, src_name)
-            data = unified.model_dump()
-
-            existing = db.scalar(select(Employee).where(Employee.employee_id == data["employee_id"]))
-
-            if existing:
-                for key, value in data.items():
-                    setattr(existing, key, value)
-            else:
-                new_emp = Employee(**data)
-                db.add(new_emp)
+        if not loader_registry.exists(src_name):
+            # Uploaded CSV loaders live in the worker that received the upload
+            synced[src_name] = {"skipped": "loader not available in this worker"}
+            continue
+        try:
+            # A sync of this source already running elsewhere is waited for and its result reused
+            with sync_scheduler.interactive():
+                run = run_exclusive(src_name, "get-data", lambda: sync_source(src_name, source.get("mode", "incremental")))
+        except MappingPendingReview as e:
+            synced[src_name] = {"skipped": str(e), "pending_version": e.version}
+            continue
+        except IngestWaitTimeout as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except SQLAlchemyError as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        synced[src_name] = run["result"]
+        runs[src_name] = {"run_id": run["run_id"], "attached": run["attached"]}
+        quarantined += run["result"].get("quarantined", 0)
+
+    names = [name for name in synced if "skipped" not in synced[name]]
+    db = SessionLocal()
+    try:
+        employees = db.scalars(
+            select(Employee).where(Employee.source_name.in_(names), Employee.deleted_at.is_(None))
+        ).all()
+        all_data = [employee.to_dict() for employee in employees]
+    finally:
+        db.close()
 
-            all_data.append(data)
+    return {"sources_connected": connected_sources, "data": all_data, "synced": synced, "runs": runs, "quarantined": quarantined}
 
-    try:
-        db.commit()
-    except SQLAlchemyError as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+@app.get("/ingest-runs", summary="Ingest run history, newest first")
+def get_ingest_runs(
+    source_name: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Return runs older than this run id"),
+):
+    return {"runs": list_runs(source_name, limit, before_id)}
 
-    return {"sources_connected": connected_sources, "data": all_data}
+@app.get("/sync-schedule", summary="Scheduled sources with their next run and recent run history")
+def get_sync_schedule():
+    return {"sources": sync_scheduler.status()}
 
 
 @app.get("/list-connected-sources", summary="List connected sources")
 def list_sources():
-    return {"connected_sources": connected_sources}
+    return {"connected_sources": source_registry.all()}
 
 @app.get("/normalised-data", summary="Normalise data into a unified format")
-def get_normalised_data():
+def get_normalised_data(db: Session = Depends(get_db)):
     all_records = []
+    quarantined = 0
     for source_name, loader in loader_registry.all().items():
         records = loader.load()
-        for record in records:
-            try:
-                unified = normalise_employee_record(record, source_name)
-                all_records.append(unified.model_dump())
-            except Exception as e:
-                print(f"Failed to normalize from {source_name}: {e}")
-    
-    return {"normalized_records": all_records}
+        if not records:
+            continue
+        try:
+            field_map = get_dynamic_field_mapping(source_name, source_fields(records))
+        except MappingPendingReview:
+            continue
+        result = validate_batch(records, field_map, source_name=source_name)
+        all_records.extend(result.valid)
+        quarantined += quarantine_rejected(db, source_name, records, result.rejected)
+
+    try:
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Failed to quarantine rejected records: {e}")
+
+    return {"normalized_records": all_records, "quarantined": quarantined}
+
+@app.get("/quarantine", summary="Rejected records with their validation errors and source offsets")
+def get_quarantine(
+    source_name: Optional[str] = None,
+    status: Optional[str] = "pending",
+    limit: int = Query(100, ge=1, le=QUARANTINE_PAGE_LIMIT),
+    before_id: Optional[int] = None,
+):
+    return list_quarantined(source_name, status, limit, before_id)
+
+@app.post("/quarantine/{source_name}/replay", summary="Re-validate quarantined records against the current mapping")
+def replay_quarantine(source_name: str, body: QuarantineReplay = Body(default=QuarantineReplay())):
+    try:
+        return replay_quarantined(source_name, body.ids)
+    except MappingPendingReview as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IngestWaitTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
 @app.get("/field-mapping/{source_name}", summary="Get field mapping from original to normalised")
 def get_field_mapping(source_name: str):
     if not loader_registry.exists(source_name):
         raise HTTPException(status_code=404, detail="Source not found.")
     
-    sample_record = loader_registry.get(source_name).load()[0]
+    records = loader_registry.get(source_name).load()
+    if not records:
+        raise HTTPException(status_code=404, detail="Source has no records to map.")
     try:
-        mapping = get_dynamic_field_mapping(source_name, list(sample_record.keys()))
-        return {"source": source_name, "field_mapping": mapping}
+        mapping = get_dynamic_field_mapping(source_name, source_fields(records))
+        return {
+            "source": source_name,
+            "field_mapping": mapping,
+            "coercers": coercer_registry.describe().get(source_name, {}),
+            "drift_events": drift_events(source_name),
+        }
+    except MappingPendingReview as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Mapping failed: {str(e)}")
     
-@app.post("/upload-csv", summary="Upload CSV files")
-async def upload_csv(source_name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if file.content_type != 'text/csv':
-        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+@app.get("/mappings/export", summary="Export every mapping version as JSON")
+def export_mappings():
+    return {"mappings": mapping_registry.export_mappings()}
 
-    content = await file.read()
-    decoded = content.decode('utf-8')
-    reader = csv.DictReader(io.StringIO(decoded))
-    rows = list(reader)
+@app.post("/mappings/import", summary="Import mapping versions exported from another instance")
+def import_mappings(body: MappingImport):
+    try:
+        imported = mapping_registry.import_mappings(body.mappings)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid mapping import: {e}")
+    return {"imported": imported}
+
+@app.get("/mappings/{source_name}", summary="List mapping versions for a source")
+def list_mapping_versions(source_name: str):
+    return {"source": source_name, "versions": mapping_registry.list_versions(source_name)}
+
+@app.post("/mappings/{source_name}/{version}/{action}", summary="Approve, pin, unpin or roll back to a mapping version")
+def change_mapping_version(source_name: str, version: int, action: str):
+    actions = {
+        "approve": lambda: mapping_registry.set_status(source_name, version, status="approved"),
+        "pin": lambda: mapping_registry.set_status(source_name, version, pinned=True),
+        "unpin": lambda: mapping_registry.set_status(source_name, version, pinned=False),
+        "rollback": lambda: mapping_registry.rollback(source_name, version),
+    }
+    if action not in actions:
+        raise HTTPException(status_code=404, detail=f"Unknown action {action}")
+    try:
+        return {"source": source_name, "mapping": actions[action]()}
+    except MappingNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/canonical-values", summary="Learned raw -> canonical values for department and location")
+def get_canonical_values():
+    return canonicalizer.dictionaries()
+
+@app.get("/mapping/health", summary="Mapping circuit breaker state and retry counts")
+def get_mapping_health():
+    return mapping_health()
+
+@app.post("/upload-csv", summary="Upload CSV files", openapi_extra=UPLOAD_CSV_OPENAPI)
+async def upload_csv(
+    request: Request,
+    mode: Literal["incremental", "full_refresh"] = Query("incremental", description="full_refresh tombstones rows missing from this file"),
+    db: Session = Depends(get_db),
+):
+    try:
+        upload = CSVUploadStream(request.headers.get("content-type", ""))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not rows:
+    # Start field mapping as soon as the header line arrives, overlapping it with the rest of the upload
+    mapping_task = None
+    try:
+        async for chunk in request.stream():
+            upload.feed(chunk)
+            if mapping_task is None and upload.ready_for_mapping:
+                mapping_task = asyncio.create_task(
+                    run_in_threadpool(get_dynamic_field_mapping, upload.source_name, upload.header)
+                )
+        upload.finish()
+        frame = upload.frame()
+    except (UploadError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        if mapping_task is not None:
+            mapping_task.cancel()
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        upload.close()
+
+    source_name = upload.source_name
+    if frame.empty:
+        if mapping_task is not None:
+            mapping_task.cancel()
         raise HTTPException(status_code=400, detail="CSV is empty")
 
     # Create or update the CSV loader
     csv_loader = CSVLoader()
-    csv_loader.set_data(source_name, rows)
+    csv_loader.set_frame(source_name, frame)
     loader_registry.register(csv_loader)
 
-    # LLM field mapping
-    field_mapping = get_dynamic_field_mapping(source_name, list(rows[0].keys()))
-
-    saved = 0
-    for record in rows:
-        unified_kwargs = {}
-        for src_field, unified_field in field_mapping.items():
-            unified_kwargs[unified_field] = record.get(src_field)
-
-        employee = Employee(**unified_kwargs)
-
-        existing = db.query(Employee).filter_by(employee_id=employee.employee_id).first()
-        if existing:
-            for key, value in unified_kwargs.items():
-                setattr(existing, key, value)
-        else:
-            db.add(employee)
-        saved += 1
+    # LLM field mapping, usually already resolved by now
+    waited = time.perf_counter()
+    if mapping_task is None:
+        # The header and source name only completed when the body was finalised
+        mapping_task = run_in_threadpool(get_dynamic_field_mapping, source_name, list(frame.columns))
+    try:
+        field_mapping = await mapping_task
+    except MappingPendingReview as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception("Mapping the upload for %s failed", source_name)
+        metrics.incr("upload.mapping_errors")
+        raise HTTPException(status_code=422, detail=f"Could not map the CSV header: {e}")
+    metrics.observe("upload.mapping_wait_seconds", time.perf_counter() - waited)
+
+    valid, invalid = await run_in_threadpool(normalize_frame, frame, field_mapping, source_name=source_name)
+
+    def save():
+        counts = bulk_upsert_frame(db, source_name, valid)
+        counts["quarantined"] = quarantine_frame(db, source_name, invalid)
+        if mode == "full_refresh":
+            # Rejected rows may still be real employees, so only a clean file may delete
+            refresh = FullRefresh(db, source_name)
+            if invalid.empty:
+                refresh.add(valid["employee_id"])
+                counts["tombstoned"] = refresh.finish()
+            else:
+                refresh.abandon()
+                counts["tombstoned"] = 0
+        db.commit()
+        outbox_dispatcher.notify()
+        return counts
 
-    db.commit()
-    return {"message": f"{saved} records processed and saved from {source_name}"}
+    try:
+        # The file's rows are not what a running sync is writing, so wait our turn instead of attaching
+        with sync_scheduler.interactive():
+            run = await run_in_threadpool(run_exclusive, source_name, "upload", save, False)
+    except IngestWaitTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    counts = run["result"]
+    return {
+        "message": f"{counts['inserted'] + counts['updated'] + counts['unchanged']} records processed and saved from {source_name}",
+        **counts,
+        "rejected": len(invalid),
+        "run_id": run["run_id"],
+    }
 
 @app.get("/employees", summary="Display all data records")
-def list_employees(db: Session = Depends(get_db)):
+def list_employees(source_name: Optional[str] = None, include_deleted: bool = False, db: Session = Depends(get_db)):
     try:
-        employees = db.query(Employee).all()
+        query = db.query(Employee)
+        if not include_deleted:
+            query = query.filter(Employee.deleted_at.is_(None))
+        if source_name:
+            query = query.filter(Employee.source_name == source_name)
+        employees = query.all()
         return {"count": len(employees), "employees": [e.to_dict() for e in employees]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.post("/ask", summary="Ask questions to the database")
-def ask_question(request: AskRequest, db: Session = Depends(get_db)):
+async def ask_question(request: AskRequest):
     question = request.question.strip()
     
     if not question:
         raise HTTPException(status_code=400, detail="Empty question")
 
     try:
-        # Raw SQL response from agent
-        raw_answer = sql_agent.invoke(question)
-        
-        # Format output
-        if isinstance(raw_answer, str):
-            formatted = raw_answer.strip()
-        else:
-            formatted = str(raw_answer)
-
-        # Log to DB
-        log = QALog(question=question, answer=formatted)
-        db.add(log)
-        db.commit()
-        db.refresh(log)
+        # Agent runs on its own bounded pool; identical in-flight questions share a run
+        formatted = await agent_runner.answer(question)
+
+        # Log to DB in the background
+        qa_log_writer.enqueue(question, formatted)
 
         return {
             "question": question,
             "answer": formatted
         }
 
+    except (AgentBusy, AgentQueueTimeout) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except SQLGuardError as e:
+        raise HTTPException(status_code=e.status_code, detail={"question": question, **e.to_dict()})
     except Exception as e:
         return {
             "question": question,
             "error": str(e)
         }
     
+@app.post("/ask/stream", summary="Ask a question and stream agent progress as server-sent events")
+async def ask_question_stream(request: AskRequest):
+    question = request.question.strip()
+
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty question")
+
+    try:
+        # Streams share the agent slots with /ask, waiting for one like a queued question would
+        release_slot = await run_in_threadpool(agent_runner.reserve)
+    except (AgentBusy, AgentQueueTimeout) as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    def log_answer(answer: str):
+        qa_log_writer.enqueue(question, answer)
+
+    async def events():
+        try:
+            async for event in stream_agent_answer(sql_agent, question, log_answer):
+                yield event
+        finally:
+            release_slot()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client leaves before the body starts and the generator never does
+        background=BackgroundTask(release_slot),
+    )
+
+@app.post("/ask/batch", summary="Answer many questions in one pass, streamed as NDJSON")
+async def ask_batch(request: AskBatchRequest):
+    questions = [q.strip() for q in request.questions]
+
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Empty question")
+    if len(questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {ASK_BATCH_MAX_QUESTIONS} questions per batch")
+
+    return StreamingResponse(
+        # The whole batch is buffered together, so it lands in one flush
+        stream_batch_answers(agent_runner, questions, qa_log_writer.enqueue_many),
+        media_type="application/x-ndjson",
+    )
+
+@app.get("/metrics", summary="Internal service metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+@app.get("/llm/usage", summary="Recent LLM calls, token usage and cache state")
+def get_llm_usage():
+    return {"cache": llm_cache.stats(), "governor": llm_governor.snapshot(), "recent_calls": usage_log.recent()}
+
 @app.get("/logs", summary="Logs of prior queries and answers")
-def get_logs(db: Session = Depends(get_db)):
-    logs = db.query(QALog).order_by(QALog.asked_at.desc()).limit(20).all()
+def get_logs(
+    limit: int = Query(20, ge=1, le=200),
+    before_id: Optional[int] = Query(None, description="Cursor: return logs older than this id"),
+    q: Optional[str] = Query(None, description="Only questions containing this text"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    query = db.query(QALog)
+    if before_id is not None:
+        query = query.filter(QALog.id < before_id)
+    if q:
+        query = query.filter(QALog.question.ilike(f"%{q}%"))
+    if since:
+        query = query.filter(QALog.asked_at >= since)
+    if until:
+        query = query.filter(QALog.asked_at < until)
+
+    logs = query.order_by(QALog.id.desc()).limit(limit + 1).all()
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+
     return {
         "logs": [
             {
@@ -253,32 +513,92 @@ def get_logs(db: Session = Depends(get_db)):
                 "asked_at": log.asked_at
             }
             for log in logs
-        ]
+        ],
+        "next_before_id": logs[-1].id if has_more else None,
     }
 
+@app.post("/logs/compact", summary="Archive Q&A logs older than the retention window")
+def compact_logs():
+    qa_log_writer.flush()
+    return {"archived": qa_log_writer.compact()}
+
+@app.post("/entities/resolve", summary="Link employees across sources and rebuild golden records")
+def resolve_entity_records(db: Session = Depends(get_db)):
+    try:
+        stats = resolve_entities(db)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    return stats
+
+@app.get("/golden-records", summary="One merged record per person across all sources")
+def list_golden_records(
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    query = db.query(GoldenEmployee)
+    if after_id is not None:
+        query = query.filter(GoldenEmployee.id > after_id)
+    records = query.order_by(GoldenEmployee.id).limit(limit).all()
+    return {
+        "records": [r.to_dict() for r in records],
+        "next_after_id": records[-1].id if len(records) == limit else None,
+    }
+
+@app.get("/golden-records/{person_id}", summary="A golden record with the source rows it was built from")
+def get_golden_record(person_id: int, db: Session = Depends(get_db)):
+    golden = db.get(GoldenEmployee, person_id)
+    if golden is None:
+        raise HTTPException(status_code=404, detail="Golden record not found")
+    members = db.query(Employee).filter(Employee.person_id == person_id, Employee.deleted_at.is_(None)).all()
+    return {**golden.to_dict(), "members": [m.to_dict() for m in members]}
+
+@app.get("/changes", summary="Employee inserts, updates and deletes after a sequence number")
+def get_changes(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=CHANGE_PAGE_LIMIT)):
+    try:
+        return changes_since(since, limit)
+    except ChangeLogGap as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+@app.post("/changes/compact", summary="Drop change log entries older than the retention window")
+def compact_changes():
+    return {"removed": compact_change_log()}
+
+@app.get("/outbox", summary="Webhook delivery backlog per endpoint")
+def get_outbox_stats():
+    return outbox_dispatcher.stats()
+
+@app.post("/outbox/retry-dead", summary="Re-queue messages that exhausted their delivery attempts")
+def retry_dead_outbox(endpoint: Optional[str] = None):
+    return {"requeued": outbox_dispatcher.retry_dead(endpoint)}
+
 @app.get("/stats", summary="Overall statistics of database")
-def get_stats(db: Session = Depends(get_db)):
+def get_stats(source_name: Optional[str] = None, db: Session = Depends(get_db)):
     try:
+        # Live rows, optionally of one source: every query below is answered from ix_employees_source_live
+        scope = [Employee.deleted_at.is_(None)]
+        if source_name:
+            scope.append(Employee.source_name == source_name)
+
         # Total employees
-        total_employees = db.query(func.count(Employee.id)).scalar()
+        total_employees = db.query(func.count(Employee.id)).filter(*scope).scalar()
 
         # Count by department
-        dept_counts = db.query(Employee.department, func.count()).group_by(Employee.department).all()
+        dept_counts = db.query(Employee.department, func.count()).filter(*scope).group_by(Employee.department).all()
         department_stats = {dept or "Unknown": count for dept, count in dept_counts}
 
         # Count by location
-        loc_counts = db.query(Employee.location, func.count()).group_by(Employee.location).all()
+        loc_counts = db.query(Employee.location, func.count()).filter(*scope).group_by(Employee.location).all()
         location_stats = {loc or "Unknown": count for loc, count in loc_counts}
 
-        # Count by connected source
-        source_stats = {
-            source["name"]: len(loader_registry.get(source["name"]).load())
-            for source in connected_sources
-        }
+        # Count by source, from stored rows rather than reloading every source
+        source_stats = source_counts(db)
 
         return {
             "total_employees": total_employees,
-            "connected_sources": len(connected_sources),
+            "connected_sources": len(source_registry.all()),
             "source_wise_records": source_stats,
             "by_department": department_stats,
             "by_location": location_stats,
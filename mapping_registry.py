@@ -0,0 +1,332 @@
+import os
+import threading
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from field_mapper import fake_field_mappings
+from models import MappingDriftEvent, SourceMapping
+from schema import UnifiedEmployee
+from schema_drift import HeaderDrift, header_fingerprint
+
+# How long a worker trusts its accepted mappings before re-checking the registry revision
+MAPPING_CACHE_TTL_SECONDS = float(os.getenv("MAPPING_CACHE_TTL_SECONDS", "1"))
+# Saving a version retries when another worker took the same version number first
+MAPPING_SAVE_ATTEMPTS = 3
+
+
+class MappingNotFound(LookupError):
+    pass
+
+
+class MappingPendingReview(LookupError):
+    """The source has no approved mapping usable for these headers; version is the proposal awaiting review."""
+
+    def __init__(self, source_name: str, version: int | None):
+        self.source_name = source_name
+        self.version = version
+        if version is None:
+            message = f"{source_name} has no approved mapping and none could be proposed"
+        else:
+            message = f"{source_name} mapping version {version} is pending review; approve or pin it to ingest"
+        super().__init__(message)
+
+
+def _next_version(source_name: str):
+    # Computed inside the INSERT so the read and the write happen under one write lock
+    return (
+        select(func.coalesce(func.max(SourceMapping.version), 0) + 1)
+        .where(SourceMapping.source_name == source_name)
+        .scalar_subquery()
+    )
+
+
+def _next_revision():
+    return select(func.coalesce(func.max(SourceMapping.revision), 0) + 1).scalar_subquery()
+
+
+def _current_revision() -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.max(SourceMapping.revision))) or 0
+    finally:
+        db.close()
+
+
+class AcceptedMappings:
+    """source_name -> (header fingerprint, mapping) last handed out by llm_mapper in this process.
+
+    Any worker's pin, unpin, rollback or new version bumps the registry revision, so comparing
+    max(revision) with the one the cache was filled at is enough to drop stale entries everywhere."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[str, dict]] = {}
+        self._revision = None
+        self._checked_at = 0.0
+
+    def lookup(self, source_name: str, fingerprint: str) -> tuple[dict | None, int]:
+        """Returns the cached mapping for these headers, if any, and the revision to pass back to put()."""
+        with self._lock:
+            if self._revision is None or time.monotonic() - self._checked_at >= MAPPING_CACHE_TTL_SECONDS:
+                revision = _current_revision()
+                if revision != self._revision:
+                    self._entries.clear()
+                    self._revision = revision
+                self._checked_at = time.monotonic()
+            entry = self._entries.get(source_name)
+            mapping = dict(entry[1]) if entry and entry[0] == fingerprint else None
+            return mapping, self._revision
+
+    def put(self, source_name: str, fingerprint: str, mapping: dict, revision: int):
+        with self._lock:
+            # Built from an older registry state than the cache now reflects
+            if revision == self._revision:
+                self._entries[source_name] = (fingerprint, dict(mapping))
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._revision = None
+
+# Global instance
+accepted_mappings = AcceptedMappings()
+
+
+def _saving(work):
+    """Runs work(db) in its own transaction and commits, retrying on a version number conflict."""
+    for attempt in range(MAPPING_SAVE_ATTEMPTS):
+        db = SessionLocal()
+        try:
+            result = work(db)
+            db.commit()
+            accepted_mappings.invalidate()
+            return result
+        except IntegrityError:
+            db.rollback()
+            if attempt == MAPPING_SAVE_ATTEMPTS - 1:
+                raise
+        finally:
+            db.close()
+
+
+def _get_version(db, source_name: str, version: int) -> SourceMapping:
+    entry = db.scalar(
+        select(SourceMapping).where(SourceMapping.source_name == source_name, SourceMapping.version == version)
+    )
+    if entry is None:
+        raise MappingNotFound(f"{source_name} has no mapping version {version}")
+    return entry
+
+
+def _add_version(db, source_name: str, fields: list[str], mapping: dict, status: str = "proposed", pinned: bool = False) -> SourceMapping:
+    entry = SourceMapping(
+        source_name=source_name,
+        fingerprint=header_fingerprint(fields),
+        fields=list(fields),
+        mapping=mapping,
+        version=_next_version(source_name),
+        status=status,
+        pinned=pinned,
+        revision=_next_revision(),
+    )
+    db.add(entry)
+    db.flush()
+    if pinned:
+        _unpin_others(db, entry)
+    return entry
+
+
+def _unpin_others(db, entry: SourceMapping):
+    db.execute(
+        update(SourceMapping)
+        .where(
+            SourceMapping.source_name == entry.source_name,
+            SourceMapping.fingerprint == entry.fingerprint,
+            SourceMapping.id != entry.id,
+            SourceMapping.pinned.is_(True),
+        )
+        .values(pinned=False, revision=_next_revision())
+    )
+
+
+def latest_mapping(source_name: str) -> SourceMapping | None:
+    db = SessionLocal()
+    try:
+        return db.scalar(
+            select(SourceMapping)
+            .where(SourceMapping.source_name == source_name)
+            .order_by(SourceMapping.version.desc(), SourceMapping.id.desc())
+            .limit(1)
+        )
+    finally:
+        db.close()
+
+
+def latest_approved(source_name: str) -> SourceMapping | None:
+    """The newest reviewed version, the only kind ingest may apply besides a pinned one."""
+    db = SessionLocal()
+    try:
+        return db.scalar(
+            select(SourceMapping)
+            .where(SourceMapping.source_name == source_name, SourceMapping.status == "approved")
+            .order_by(SourceMapping.version.desc(), SourceMapping.id.desc())
+            .limit(1)
+        )
+    finally:
+        db.close()
+
+
+def resolve_pinned(source_name: str, fields: list[str]) -> dict | None:
+    """Returns the pinned mapping covering these fields, if any, restricted to the fields present.
+
+    An exact header match wins over a pinned mapping that merely covers every field."""
+    db = SessionLocal()
+    try:
+        pinned = db.scalars(
+            select(SourceMapping)
+            .where(SourceMapping.source_name == source_name, SourceMapping.pinned.is_(True))
+            .order_by(SourceMapping.version.desc())
+        ).all()
+    finally:
+        db.close()
+
+    fingerprint = header_fingerprint(fields)
+    present = set(fields)
+    exact = [entry for entry in pinned if entry.fingerprint == fingerprint]
+    candidates = exact or [entry for entry in pinned if present <= set(entry.fields)]
+    if not candidates:
+        return None
+    return {src: unified for src, unified in candidates[0].mapping.items() if src in present}
+
+
+def save_mapping(source_name: str, fields: list[str], mapping: dict, drift: HeaderDrift | None = None, remapped: list[str] | None = None) -> int:
+    """Saves a proposed version and returns its number."""
+    def work(db):
+        entry = _add_version(db, source_name, fields, mapping)
+        if drift is not None:
+            db.add(MappingDriftEvent(
+                source_name=source_name,
+                added=drift.added,
+                removed=drift.removed,
+                renamed=drift.renamed,
+                remapped=remapped or [],
+            ))
+        return entry.version
+
+    return _saving(work)
+
+
+def list_versions(source_name: str) -> list[dict]:
+    db = SessionLocal()
+    try:
+        entries = db.scalars(
+            select(SourceMapping)
+            .where(SourceMapping.source_name == source_name)
+            .order_by(SourceMapping.version.desc())
+        ).all()
+        return [entry.to_dict() for entry in entries]
+    finally:
+        db.close()
+
+
+def set_status(source_name: str, version: int, status: str | None = None, pinned: bool | None = None) -> dict:
+    def work(db):
+        entry = _get_version(db, source_name, version)
+        if status is not None:
+            entry.status = status
+        if pinned is not None:
+            entry.pinned = pinned
+            if pinned:
+                # Pinning implies the mapping was reviewed
+                entry.status = "approved"
+                _unpin_others(db, entry)
+        entry.revision = _next_revision()
+        db.flush()
+        return entry.to_dict()
+
+    return _saving(work)
+
+
+def rollback(source_name: str, version: int) -> dict:
+    """Re-publishes an older version as a new, pinned version."""
+    def work(db):
+        target = _get_version(db, source_name, version)
+        entry = _add_version(db, source_name, target.fields, target.mapping, status="approved", pinned=True)
+        return entry.to_dict()
+
+    return _saving(work)
+
+
+def export_mappings() -> list[dict]:
+    db = SessionLocal()
+    try:
+        entries = db.scalars(select(SourceMapping).order_by(SourceMapping.source_name, SourceMapping.version)).all()
+        return [entry.to_dict() for entry in entries]
+    finally:
+        db.close()
+
+
+def import_mappings(entries: list[dict]) -> int:
+    """Adds each entry as a new version of its source, skipping ones identical to the current latest."""
+    unified_fields = set(UnifiedEmployee.model_fields)
+    for entry in entries:
+        unknown = set(entry["mapping"].values()) - unified_fields
+        if unknown:
+            raise ValueError(f"{entry['source_name']} maps to unknown fields {sorted(unknown)}")
+
+    def work(db):
+        imported = 0
+        for entry in entries:
+            source_name = entry["source_name"]
+            fields = entry.get("fields") or list(entry["mapping"])
+            latest = db.scalar(
+                select(SourceMapping)
+                .where(SourceMapping.source_name == source_name)
+                .order_by(SourceMapping.version.desc())
+                .limit(1)
+            )
+            if latest and latest.mapping == entry["mapping"] and latest.fingerprint == header_fingerprint(fields):
+                continue
+            _add_version(db, source_name, fields, entry["mapping"], entry.get("status", "approved"), entry.get("pinned", False))
+            imported += 1
+        return imported
+
+    return _saving(work)
+
+
+def seed_registry():
+    """Numbers legacy rows and pins the built-in fake_field_mappings for sources without any mapping yet."""
+    def work(db):
+        db.execute(update(SourceMapping).where(SourceMapping.version.is_(None)).values(version=SourceMapping.id))
+        for source_name, mapping in fake_field_mappings.items():
+            exists = db.scalar(select(SourceMapping.id).where(SourceMapping.source_name == source_name).limit(1))
+            if exists is None:
+                _add_version(db, source_name, list(mapping), mapping, status="approved", pinned=True)
+
+    _saving(work)
+
+
+def drift_events(source_name: str, limit: int = 20) -> list[dict]:
+    db = SessionLocal()
+    try:
+        events = db.scalars(
+            select(MappingDriftEvent)
+            .where(MappingDriftEvent.source_name == source_name)
+            .order_by(MappingDriftEvent.id.desc())
+            .limit(limit)
+        ).all()
+        return [
+            {
+                "added": e.added,
+                "removed": e.removed,
+                "renamed": e.renamed,
+                "remapped": e.remapped,
+                "detected_at": e.detected_at,
+            }
+            for e in events
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Thread-safe in-process counters, gauges and timings, served on /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._timings = {}
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            stat = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            stat["count"] += 1
+            stat["total"] += value
+            stat["max"] = max(stat["max"], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: {**stat, "avg": stat["total"] / stat["count"] if stat["count"] else 0.0}
+                for name, stat in self._timings.items()
+            }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": timings,
+            }
+
+# Global instance
+metrics = Metrics()
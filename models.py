@@ -1,25 +1,125 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
-from database import Base
+from sqlalchemy import Column, Integer, Float, String, Boolean, DateTime, JSON, Index, func
+from database import Base, LockBase
 
 
 class QALog(Base):
     __tablename__ = "qa_logs"
+    # AUTOINCREMENT so ids are never reused after compaction empties the table
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
-    asked_at = Column(DateTime(timezone=True), server_default=func.now())
+    asked_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class QALogArchive(Base):
+    __tablename__ = "qa_logs_archive"
+
+    id = Column(Integer, primary_key=True)
+    # The qa_logs id the row had before it was archived
+    log_id = Column(Integer, index=True)
+    question = Column(String, nullable=False)
+    answer = Column(String, nullable=False)
+    asked_at = Column(DateTime(timezone=True), index=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SourceMapping(Base):
+    __tablename__ = "source_mappings"
+    __table_args__ = (Index("ux_source_mappings_source_version", "source_name", "version", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_name = Column(String, nullable=False, index=True)
+    fingerprint = Column(String, nullable=False, index=True)
+    fields = Column(JSON, nullable=False)
+    mapping = Column(JSON, nullable=False)
+    version = Column(Integer, index=True)
+    status = Column(String, default="proposed")  # proposed | approved
+    pinned = Column(Boolean, default=False)
+    # Set past every other row's on each insert or status change, so max(revision) tells workers their cache is stale
+    revision = Column(Integer, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def to_dict(self):
+        return {
+            "source_name": self.source_name,
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "fields": self.fields,
+            "mapping": self.mapping,
+            "status": self.status,
+            "pinned": bool(self.pinned),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+class MappingDriftEvent(Base):
+    __tablename__ = "mapping_drift_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_name = Column(String, nullable=False, index=True)
+    added = Column(JSON, nullable=False)
+    removed = Column(JSON, nullable=False)
+    renamed = Column(JSON, nullable=False)
+    remapped = Column(JSON, nullable=False)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ValueAlias(Base):
+    __tablename__ = "value_aliases"
+    __table_args__ = (Index("ux_value_aliases_field_raw", "field", "raw_value", unique=True),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    field = Column(String, nullable=False)
+    raw_value = Column(String, nullable=False)
+    canonical = Column(String, nullable=False)
+    method = Column(String, nullable=False)  # exact | fuzzy | llm | new
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class QuarantinedRecord(Base):
+    __tablename__ = "quarantine"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_name = Column(String, nullable=False, index=True)
+    source_offset = Column(Integer)  # row position within the source load, when known
+    record = Column(JSON, nullable=False)  # raw record as the source delivered it
+    errors = Column(JSON, nullable=False)
+    status = Column(String, default="pending", index=True)  # pending | replayed
+    attempts = Column(Integer, default=0)
+    quarantined_at = Column(DateTime(timezone=True), server_default=func.now())
+    replayed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "source_name": self.source_name,
+            "source_offset": self.source_offset,
+            "record": self.record,
+            "errors": self.errors,
+            "status": self.status,
+            "attempts": self.attempts,
+            "quarantined_at": self.quarantined_at.isoformat() if self.quarantined_at else None,
+            "replayed_at": self.replayed_at.isoformat() if self.replayed_at else None,
+        }
 
 class Employee(Base):
     __tablename__ = "employees"
+    # One row per record per source; the stats queries (live rows, optionally one source) are covered by the second index
+    __table_args__ = (
+        Index("ux_employees_source_record", "source_name", "source_record_id", unique=True),
+        Index("ix_employees_source_live", "source_name", "deleted_at", "department", "location"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(String, index=True)
     name = Column(String)
-    salary = Column(Integer)
+    salary = Column(Float)
     email = Column(String, nullable=True)
     department = Column(String, nullable=True)
     location = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)  # digest of the normalised fields, see ingest.content_hash
+    source_name = Column(String, nullable=True)
+    source_record_id = Column(String, nullable=True)  # the record's id within its source
+    ingested_at = Column(DateTime(timezone=True), nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # tombstone set by a full-refresh sync
+    person_id = Column(Integer, nullable=True, index=True)  # golden_employees.id after entity resolution
 
     def to_dict(self):
         return {
@@ -29,4 +129,143 @@ class Employee(Base):
             "email": self.email,
             "department": self.department,
             "location": self.location,
-        }
\ No newline at end of file
+            "source_name": self.source_name,
+            "source_record_id": self.source_record_id,
+            "ingested_at": self.ingested_at.isoformat() if self.ingested_at else None,
+            "deleted_at": self.deleted_at.isoformat() if self.deleted_at else None,
+            "person_id": self.person_id,
+        }
+class GoldenEmployee(Base):
+    __tablename__ = "golden_employees"
+
+    # Smallest employees.id in the cluster, so it survives re-resolution
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(String)
+    name = Column(String)
+    salary = Column(Float)
+    email = Column(String, nullable=True)
+    department = Column(String, nullable=True)
+    location = Column(String, nullable=True)
+    sources = Column(JSON, nullable=False)  # ["source_name:source_record_id", ...]
+    member_count = Column(Integer, nullable=False)
+    resolved_at = Column(DateTime(timezone=True))
+
+    def to_dict(self):
+        return {
+            "person_id": self.id,
+            "employee_id": self.employee_id,
+            "name": self.name,
+            "salary": self.salary,
+            "email": self.email,
+            "department": self.department,
+            "location": self.location,
+            "sources": self.sources,
+            "member_count": self.member_count,
+            "resolved_at": self.resolved_at.isoformat() if self.resolved_at else None,
+        }
+
+class EmployeeChange(Base):
+    __tablename__ = "employee_changes"
+    # AUTOINCREMENT so seq never goes backwards, even after compaction empties the table
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    source_name = Column(String, nullable=False)
+    source_record_id = Column(String, nullable=False)
+    employee_id = Column(String)
+    op = Column(String, nullable=False)  # insert | update | delete
+    changed = Column(JSON, nullable=False)  # new values of the fields that changed
+    changed_at = Column(DateTime(timezone=True), index=True)
+
+    def to_dict(self):
+        return {
+            "seq": self.seq,
+            "source_name": self.source_name,
+            "source_record_id": self.source_record_id,
+            "employee_id": self.employee_id,
+            "op": self.op,
+            "changed": self.changed,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None,
+        }
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_endpoint_status_id", "endpoint", "status", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    endpoint = Column(String, nullable=False)
+    change_seq = Column(Integer, nullable=False)  # employee_changes.seq this message carries
+    partition_key = Column(String, nullable=False)  # source_name:source_record_id, delivered in order
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="pending")  # pending | sending | delivered | dead
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True))
+    lease_until = Column(DateTime(timezone=True), nullable=True)  # while sending: when another worker may reclaim it
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+class ConnectedSource(Base):
+    __tablename__ = "sources"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    mode = Column(String, nullable=False, default="incremental")  # incremental | full_refresh
+    connected = Column(Boolean, nullable=False, default=True)
+    connected_at = Column(DateTime(timezone=True))
+    # Bumped past every other row's on each change, so max(version) tells workers their cache is stale
+    version = Column(Integer, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "connected_at": self.connected_at.isoformat() if self.connected_at else None,
+        }
+
+class IngestRun(Base):
+    __tablename__ = "ingest_runs"
+
+    id = Column(Integer, primary_key=True)
+    source_name = Column(String, nullable=False, index=True)
+    trigger = Column(String, nullable=False)  # get-data | upload | scheduler | disconnect | replay
+    owner = Column(String, nullable=False)  # host:pid:thread that ran it
+    status = Column(String, nullable=False, default="running")  # running | succeeded | failed | abandoned | skipped
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    # Loader fingerprint the run synced; the scheduler skips a source while it stays the same
+    fingerprint = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def to_dict(self):
+        duration = (self.finished_at - self.started_at).total_seconds() if self.finished_at and self.started_at else None
+        rows = sum(self.result.get(key, 0) for key in ("inserted", "updated", "unchanged", "rejected")) if self.result else None
+        return {
+            "run_id": self.id,
+            "source_name": self.source_name,
+            "trigger": self.trigger,
+            "owner": self.owner,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "fingerprint": self.fingerprint,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": duration,
+            "rows": rows,
+            "rows_per_second": round(rows / duration) if rows and duration else None,
+        }
+
+class IngestLock(LockBase):
+    __tablename__ = "ingest_locks"
+
+    # One row per source while a run holds it; expires_at lets a crashed worker's lock be taken over.
+    # Stored in the lock database (LOCK_DATABASE_PATH) so it can be renewed while a sync is writing.
+    source_name = Column(String, primary_key=True)
+    run_id = Column(Integer, nullable=False)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,273 @@
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from metrics import metrics
+from models import OutboxMessage
+from qa_log_writer import utcnow
+
+# Comma-separated URLs that receive batches of employee changes
+WEBHOOK_ENDPOINTS = [u.strip() for u in os.getenv("WEBHOOK_ENDPOINTS", "").split(",") if u.strip()]
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+# Parallel lanes per endpoint; one employee's changes always travel in the same lane
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "4"))
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", "1"))
+WEBHOOK_MAX_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_MAX_BACKOFF_SECONDS", "300"))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "0.5"))
+OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "24"))
+# How long a claimed batch stays with its worker; after that another worker may send it again
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+_CAPTURE_SQL = (
+    "INSERT INTO outbox_messages "
+    "(endpoint, change_seq, partition_key, payload, status, attempts, next_attempt_at, created_at) "
+    "SELECT ?, seq, source_name || ':' || source_record_id, "
+    "json_object('seq', seq, 'source_name', source_name, 'source_record_id', source_record_id, "
+    "'employee_id', employee_id, 'op', op, 'changed', json(changed), 'changed_at', changed_at), "
+    "'pending', 0, ?, ? FROM employee_changes WHERE seq BETWEEN ? AND ?"
+)
+
+
+def capture(db: Session, first_seq: int, last_seq: int) -> int:
+    """Copies the change log entries first_seq..last_seq into the outbox, once per endpoint.
+
+    Runs inside the ingest transaction, so a change is queued for delivery if and only if it commits."""
+    captured = 0
+    now = utcnow().isoformat(" ")
+    for endpoint in WEBHOOK_ENDPOINTS:
+        captured += db.connection().exec_driver_sql(_CAPTURE_SQL, (endpoint, now, now, first_seq, last_seq)).rowcount
+    return captured
+
+
+def _backoff(attempts: int) -> float:
+    # Full jitter keeps retrying lanes from hitting a recovering receiver in lockstep
+    return random.uniform(0, min(WEBHOOK_MAX_BACKOFF_SECONDS, WEBHOOK_BACKOFF_SECONDS * 2 ** attempts))
+
+
+class OutboxDispatcher:
+    """Delivers outbox messages to each endpoint in gzip-compressed JSON batches from a background thread.
+
+    Each endpoint gets WEBHOOK_CONCURRENCY lanes, and an employee always maps to the same lane. A message
+    waiting out a retry blocks that employee's later messages, so every employee's changes arrive in order.
+    Messages that fail WEBHOOK_MAX_ATTEMPTS times are marked dead and stop blocking.
+
+    Every worker runs a dispatcher, so batches are claimed (status "sending" with a lease) before they are
+    posted; a message claimed by another worker blocks its employee's later messages too."""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._last_prune = 0.0
+
+    def _claim_lanes(self, db: Session, endpoint: str) -> dict[int, list]:
+        """Picks this round's batches and marks them sending. The caller commits."""
+        now = utcnow()
+        # Batches whose worker died mid-send go back to pending. Being a write, this also takes SQLite's
+        # write lock, so no other worker can read or claim the same rows until the caller commits.
+        db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.endpoint == endpoint, OutboxMessage.status == "sending", OutboxMessage.lease_until < now)
+            .values(status="pending", lease_until=None)
+        )
+        queued = db.execute(
+            select(OutboxMessage.id, OutboxMessage.partition_key, OutboxMessage.payload, OutboxMessage.status,
+                   OutboxMessage.attempts, OutboxMessage.next_attempt_at, OutboxMessage.created_at)
+            .where(OutboxMessage.endpoint == endpoint, OutboxMessage.status.in_(["pending", "sending"]))
+            .order_by(OutboxMessage.id)
+            .limit(WEBHOOK_BATCH_SIZE * WEBHOOK_CONCURRENCY)
+        ).all()
+
+        blocked, lanes = set(), defaultdict(list)
+        for message in queued:
+            if message.partition_key in blocked:
+                continue
+            if message.status == "sending" or (message.next_attempt_at and message.next_attempt_at > now):
+                blocked.add(message.partition_key)
+                continue
+            lane = lanes[zlib.crc32(message.partition_key.encode()) % WEBHOOK_CONCURRENCY]
+            if len(lane) < WEBHOOK_BATCH_SIZE:
+                lane.append(message)
+            else:
+                # Lane is full this round; later messages for this key must wait their turn
+                blocked.add(message.partition_key)
+
+        claimed = [m.id for lane in lanes.values() for m in lane]
+        if claimed:
+            db.execute(
+                update(OutboxMessage).where(OutboxMessage.id.in_(claimed))
+                .values(status="sending", lease_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+            )
+        return lanes
+
+    def _post(self, endpoint: str, messages: list):
+        body = gzip.compress(json.dumps({"changes": [m.payload for m in messages]}, default=str).encode())
+        request = urllib.request.Request(endpoint, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Outbox-First-Id": str(messages[0].id),
+            "X-Outbox-Last-Id": str(messages[-1].id),
+        })
+        with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+            response.read()
+
+    def _deliver(self, endpoint: str, messages: list):
+        started = time.perf_counter()
+        ids = [m.id for m in messages]
+        db = SessionLocal()
+        try:
+            try:
+                self._post(endpoint, messages)
+            except Exception as e:
+                # Anything from a refused connection to a truncated response or a malformed URL counts as
+                # an attempt, so a batch that can never be sent ends up dead rather than retried forever
+                self._failed(db, messages, str(e) or type(e).__name__)
+                metrics.incr("outbox.failed_batches")
+                return
+            now = utcnow()
+            db.execute(
+                update(OutboxMessage).where(OutboxMessage.id.in_(ids))
+                .values(status="delivered", delivered_at=now, lease_until=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        metrics.incr("outbox.delivered", len(messages))
+        metrics.observe("outbox.batch_seconds", time.perf_counter() - started)
+        metrics.observe("outbox.lag_seconds", (now - min(m.created_at for m in messages)).total_seconds())
+
+    def _failed(self, db: Session, messages: list, error: str):
+        now = utcnow()
+        changes = []
+        for m in messages:
+            attempts = m.attempts + 1
+            dead = attempts >= WEBHOOK_MAX_ATTEMPTS
+            changes.append({
+                "id": m.id,
+                "attempts": attempts,
+                "status": "dead" if dead else "pending",
+                "next_attempt_at": now + timedelta(seconds=_backoff(attempts)),
+                "lease_until": None,
+                "last_error": error[:500],
+            })
+            if dead:
+                metrics.incr("outbox.dead")
+        db.execute(update(OutboxMessage), changes)
+        db.commit()
+
+    def dispatch_once(self) -> int:
+        """Sends one round of due batches to every endpoint; returns the number of messages attempted."""
+        jobs, attempted = [], 0
+        db = SessionLocal()
+        try:
+            for endpoint in WEBHOOK_ENDPOINTS:
+                lanes = self._claim_lanes(db, endpoint)
+                db.commit()
+                for messages in lanes.values():
+                    jobs.append(self._pool.submit(self._deliver, endpoint, messages))
+                    attempted += len(messages)
+        finally:
+            db.close()
+        for job in jobs:
+            job.result()
+        metrics.set_gauge("outbox.last_round_messages", attempted)
+        return attempted
+
+    def prune(self) -> int:
+        cutoff = utcnow() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+        db = SessionLocal()
+        try:
+            removed = db.execute(
+                delete(OutboxMessage).where(OutboxMessage.status == "delivered", OutboxMessage.delivered_at < cutoff)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        return removed
+
+    def stats(self) -> dict:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(OutboxMessage.endpoint, OutboxMessage.status, func.count(), func.min(OutboxMessage.created_at))
+                .group_by(OutboxMessage.endpoint, OutboxMessage.status)
+            ).all()
+        finally:
+            db.close()
+
+        now = utcnow()
+        endpoints = {endpoint: {} for endpoint in WEBHOOK_ENDPOINTS}
+        for endpoint, status, count, oldest in rows:
+            entry = endpoints.setdefault(endpoint, {})
+            entry[status] = count
+            if status == "pending" and oldest is not None:
+                entry["oldest_pending_seconds"] = round((now - oldest).total_seconds(), 1)
+        return {"endpoints": endpoints, "concurrency": WEBHOOK_CONCURRENCY, "batch_size": WEBHOOK_BATCH_SIZE}
+
+    def retry_dead(self, endpoint: str | None = None) -> int:
+        db = SessionLocal()
+        try:
+            query = update(OutboxMessage).where(OutboxMessage.status == "dead")
+            if endpoint:
+                query = query.where(OutboxMessage.endpoint == endpoint)
+            requeued = db.execute(query.values(status="pending", attempts=0, next_attempt_at=utcnow())).rowcount
+            db.commit()
+        finally:
+            db.close()
+        self._wake.set()
+        return requeued
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(OUTBOX_POLL_INTERVAL_SECONDS)
+            self._wake.clear()
+            try:
+                while self.dispatch_once() and not self._stopping.is_set():
+                    pass
+                if time.monotonic() - self._last_prune > 3600:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except Exception:
+                metrics.incr("outbox.dispatcher_errors")
+                logger.exception("Outbox dispatcher failed")
+
+    def start(self):
+        if self._thread is None and WEBHOOK_ENDPOINTS:
+            self._stopping.clear()
+            self._pool = ThreadPoolExecutor(max_workers=len(WEBHOOK_ENDPOINTS) * WEBHOOK_CONCURRENCY, thread_name_prefix="outbox")
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+# Global instance
+outbox_dispatcher = OutboxDispatcher()
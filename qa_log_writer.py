@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select
+
+from database import SessionLocal
+from metrics import metrics
+from models import QALog, QALogArchive
+
+QA_LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("QA_LOG_FLUSH_INTERVAL_SECONDS", "1"))
+QA_LOG_FLUSH_BATCH = int(os.getenv("QA_LOG_FLUSH_BATCH", "500"))
+QA_LOG_MAX_BUFFER = int(os.getenv("QA_LOG_MAX_BUFFER", "50000"))
+QA_LOG_RETENTION_DAYS = int(os.getenv("QA_LOG_RETENTION_DAYS", "30"))
+QA_LOG_COMPACT_INTERVAL_SECONDS = float(os.getenv("QA_LOG_COMPACT_INTERVAL_SECONDS", "3600"))
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    # Same naive-UTC convention as the CURRENT_TIMESTAMP server default
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class QALogWriter:
+    """Buffers Q&A log rows in memory and writes them in batches from a background thread."""
+
+    def __init__(self):
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last_compaction = 0.0
+
+    def enqueue(self, question: str, answer: str):
+        self.enqueue_many([(question, answer)])
+
+    def enqueue_many(self, pairs: list[tuple[str, str]]):
+        asked_at = utcnow()
+        with self._lock:
+            self._buffer.extend({"question": q, "answer": a, "asked_at": asked_at} for q, a in pairs)
+            overflow = len(self._buffer) - QA_LOG_MAX_BUFFER
+            for _ in range(max(overflow, 0)):
+                self._buffer.popleft()
+            size = len(self._buffer)
+
+        if overflow > 0:
+            metrics.incr("qa_log.dropped", overflow)
+        metrics.set_gauge("qa_log.buffered", size)
+        if size >= QA_LOG_FLUSH_BATCH:
+            self._wake.set()
+
+    def flush(self) -> int:
+        with self._lock:
+            rows = list(self._buffer)
+            self._buffer.clear()
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            db.execute(insert(QALog), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the rows back so the next flush retries them
+            with self._lock:
+                self._buffer.extendleft(reversed(rows))
+            metrics.incr("qa_log.flush_errors")
+            raise
+        finally:
+            db.close()
+
+        metrics.incr("qa_log.written", len(rows))
+        metrics.observe("qa_log.flush_seconds", time.perf_counter() - started)
+        metrics.set_gauge("qa_log.buffered", len(self._buffer))
+        return len(rows)
+
+    def compact(self, retention_days: int = QA_LOG_RETENTION_DAYS) -> int:
+        """Moves rows older than the retention window into qa_logs_archive."""
+        cutoff = utcnow() - timedelta(days=retention_days)
+        old_rows = select(QALog.id, QALog.question, QALog.answer, QALog.asked_at).where(QALog.asked_at < cutoff)
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                insert(QALogArchive).from_select(["log_id", "question", "answer", "asked_at"], old_rows)
+            )
+            archived = db.execute(delete(QALog).where(QALog.asked_at < cutoff)).rowcount
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        metrics.incr("qa_log.archived", archived)
+        return archived
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(QA_LOG_FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_compaction > QA_LOG_COMPACT_INTERVAL_SECONDS:
+                    self._last_compaction = time.monotonic()
+                    self.compact()
+            except Exception:
+                metrics.incr("qa_log.writer_errors")
+                logger.exception("QA log writer failed")
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="qa-log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+# Global instance
+qa_log_writer = QALogWriter()
@@ -0,0 +1,153 @@
+import json
+
+import pandas as pd
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from batch_validation import validate_batch
+from canonicalize import canonicalizer
+from database import SessionLocal
+from field_mapper import source_fields
+from frame_normalizer import frame_to_records
+from ingest import bulk_upsert_employees
+from ingest_lock import run_exclusive
+from llm_mapper import get_dynamic_field_mapping
+from metrics import metrics
+from models import QuarantinedRecord
+from outbox import outbox_dispatcher
+from qa_log_writer import utcnow
+
+QUARANTINE_PAGE_LIMIT = 500
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _record_key(record: dict) -> str:
+    return json.dumps(record, sort_keys=True, default=str)
+
+
+def _pending_rows(db: Session, source_name: str, offsets: list[int | None]) -> set[tuple[int, str]]:
+    offsets = sorted({offset for offset in offsets if offset is not None})
+    pending = set()
+    for start in range(0, len(offsets), LOOKUP_CHUNK_SIZE):
+        rows = db.execute(
+            select(QuarantinedRecord.source_offset, QuarantinedRecord.record).where(
+                QuarantinedRecord.source_name == source_name,
+                QuarantinedRecord.status == "pending",
+                QuarantinedRecord.source_offset.in_(offsets[start:start + LOOKUP_CHUNK_SIZE]),
+            )
+        ).all()
+        pending.update((offset, _record_key(record)) for offset, record in rows)
+    return pending
+
+
+def quarantine_records(db: Session, source_name: str, entries: list[tuple[int | None, dict, list[dict]]]) -> int:
+    """Stores (source offset, raw record, errors) entries. The caller commits, so quarantined rows land
+    in the same transaction as the valid ones.
+
+    A row already pending at the same offset with the same content is not quarantined twice."""
+    pending = _pending_rows(db, source_name, [offset for offset, _, _ in entries])
+    rows = [
+        {
+            "source_name": source_name,
+            "source_offset": offset,
+            "record": record,
+            "errors": errors,
+            "status": "pending",
+            "attempts": 0,
+        }
+        for offset, record, errors in entries
+        if (offset, _record_key(record)) not in pending
+    ]
+    if rows:
+        db.execute(insert(QuarantinedRecord), rows)
+        metrics.incr("quarantine.added", len(rows))
+    return len(rows)
+
+
+def quarantine_rejected(db: Session, source_name: str, records: list[dict], rejected: list[tuple[int, list[dict]]], offset: int = 0) -> int:
+    # Rejected positions from validate_batch, shifted by the batch's offset within the source
+    return quarantine_records(db, source_name, [
+        (offset + position, records[position], errors) for position, errors in rejected
+    ])
+
+
+def quarantine_frame(db: Session, source_name: str, invalid: pd.DataFrame) -> int:
+    # Invalid frame from normalize_frame; its index is the row offset within the source
+    if invalid.empty:
+        return 0
+    records = frame_to_records(invalid.drop(columns=["error", "error_field"]))
+    return quarantine_records(db, source_name, [
+        (int(offset), record, [{"field": field or None, "message": message, "type": "frame"}])
+        for offset, record, field, message in zip(invalid.index, records, invalid["error_field"], invalid["error"])
+    ])
+
+
+def list_quarantined(source_name: str | None = None, status: str | None = "pending", limit: int = 100, before_id: int | None = None) -> dict:
+    limit = min(limit, QUARANTINE_PAGE_LIMIT)
+    db = SessionLocal()
+    try:
+        query = select(QuarantinedRecord)
+        if source_name:
+            query = query.where(QuarantinedRecord.source_name == source_name)
+        if status:
+            query = query.where(QuarantinedRecord.status == status)
+        if before_id is not None:
+            query = query.where(QuarantinedRecord.id < before_id)
+        entries = db.scalars(query.order_by(QuarantinedRecord.id.desc()).limit(limit)).all()
+    finally:
+        db.close()
+
+    return {
+        "records": [entry.to_dict() for entry in entries],
+        "next_before_id": entries[-1].id if len(entries) == limit else None,
+    }
+
+
+def replay(source_name: str, ids: list[int] | None = None) -> dict:
+    """Re-validates pending quarantined rows for a source against its current mapping.
+
+    Rows that now pass are saved and marked replayed; the rest stay pending with refreshed errors.
+    Runs under the source's ingest lock like a sync, and wakes the outbox for the changes it records."""
+    run = run_exclusive(source_name, "replay", lambda: _replay(source_name, ids), attach=False)
+    outbox_dispatcher.notify()
+    return {**run["result"], "run_id": run["run_id"]}
+
+
+def _replay(source_name: str, ids: list[int] | None) -> dict:
+    db = SessionLocal()
+    try:
+        query = select(QuarantinedRecord).where(
+            QuarantinedRecord.source_name == source_name,
+            QuarantinedRecord.status == "pending",
+        )
+        if ids:
+            query = query.where(QuarantinedRecord.id.in_(ids))
+        entries = db.scalars(query.order_by(QuarantinedRecord.id)).all()
+        if not entries:
+            return {"source": source_name, "replayed": 0, "still_invalid": 0}
+
+        records = [entry.record for entry in entries]
+        field_map = get_dynamic_field_mapping(source_name, source_fields(records))
+        result = validate_batch(records, field_map, source_name=source_name)
+
+        canonicalizer.canonicalize_records(result.valid)
+        counts = bulk_upsert_employees(db, source_name, result.valid)
+
+        now = utcnow()
+        replayed = [
+            {"id": entries[i].id, "status": "replayed", "attempts": entries[i].attempts + 1, "replayed_at": now}
+            for i in result.valid_positions
+        ]
+        still_invalid = [
+            {"id": entries[i].id, "errors": errors, "attempts": entries[i].attempts + 1}
+            for i, errors in result.rejected
+        ]
+        for changes in (replayed, still_invalid):
+            if changes:
+                db.execute(update(QuarantinedRecord), changes)
+        db.commit()
+    finally:
+        db.close()
+
+    metrics.incr("quarantine.replayed", len(result.valid))
+    return {"source": source_name, "replayed": len(result.valid), "still_invalid": len(result.rejected), **counts}
@@ -0,0 +1,59 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+# How alike two column names must be for a removed/added pair to count as a rename
+RENAME_SIMILARITY = 0.7
+
+
+@dataclass
+class HeaderDrift:
+    unchanged: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    renamed: dict[str, str] = field(default_factory=dict)  # old name -> new name
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed)
+
+    @property
+    def new_columns(self) -> list[str]:
+        """Added columns that aren't just a renamed old column."""
+        renamed_to = set(self.renamed.values())
+        return [f for f in self.added if f not in renamed_to]
+
+
+def header_fingerprint(fields: list[str]) -> str:
+    return hashlib.sha1("\x1f".join(sorted(fields)).encode()).hexdigest()
+
+
+def _normalise(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def diff_headers(old_fields: list[str], new_fields: list[str]) -> HeaderDrift:
+    old_set, new_set = set(old_fields), set(new_fields)
+    drift = HeaderDrift(
+        unchanged=[f for f in new_fields if f in old_set],
+        added=[f for f in new_fields if f not in old_set],
+        removed=[f for f in old_fields if f not in new_set],
+    )
+
+    # Pair removed and added columns greedily, most similar names first
+    candidates = sorted(
+        (
+            (SequenceMatcher(None, _normalise(old), _normalise(new)).ratio(), old, new)
+            for old in drift.removed
+            for new in drift.added
+        ),
+        reverse=True,
+    )
+    for ratio, old, new in candidates:
+        if ratio < RENAME_SIMILARITY:
+            break
+        if old not in drift.renamed and new not in drift.renamed.values():
+            drift.renamed[old] = new
+
+    return drift
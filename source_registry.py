@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from database import SessionLocal
+from models import ConnectedSource
+from qa_log_writer import utcnow
+
+# How long a worker trusts its cached source list before re-checking the version
+SOURCE_CACHE_TTL_SECONDS = float(os.getenv("SOURCE_CACHE_TTL_SECONDS", "1"))
+
+
+def _next_version():
+    return select(func.coalesce(func.max(ConnectedSource.version), 0) + 1).scalar_subquery()
+
+
+class SourceRegistry:
+    """Connected sources persisted in the sources table, with a per-process read cache.
+
+    Every change bumps the changed row's version past all others inside the same statement, so a worker
+    only has to compare max(version) (an index lookup) with what it loaded to know its cache is stale."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: dict[str, dict] = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < SOURCE_CACHE_TTL_SECONDS:
+                return
+            db = SessionLocal()
+            try:
+                version = db.scalar(select(func.max(ConnectedSource.version))) or 0
+                if version != self._version:
+                    rows = db.scalars(
+                        select(ConnectedSource).where(ConnectedSource.connected.is_(True)).order_by(ConnectedSource.connected_at)
+                    ).all()
+                    self._sources = {row.name: row.to_dict() for row in rows}
+                    self._version = version
+            finally:
+                db.close()
+            self._checked_at = time.monotonic()
+
+    def _invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def all(self) -> list[dict]:
+        self._refresh()
+        return list(self._sources.values())
+
+    def get(self, name: str) -> dict | None:
+        self._refresh()
+        return self._sources.get(name)
+
+    def connect(self, name: str, mode: str = "incremental") -> bool:
+        """Returns False when the source was already connected."""
+        db = SessionLocal()
+        try:
+            statement = insert(ConnectedSource).values(
+                name=name, mode=mode, connected=True, connected_at=utcnow(), version=_next_version()
+            )
+            # Reconnecting a disconnected source reuses its row; an already connected one is left alone
+            statement = statement.on_conflict_do_update(
+                index_elements=[ConnectedSource.name],
+                set_={"mode": mode, "connected": True, "connected_at": utcnow(), "version": _next_version()},
+                where=ConnectedSource.connected.is_(False),
+            )
+            created = db.execute(statement).rowcount > 0
+            db.commit()
+        finally:
+            db.close()
+        self._invalidate()
+        return created
+
+    def disconnect(self, name: str) -> bool:
+        db = SessionLocal()
+        try:
+            disconnected = db.execute(
+                update(ConnectedSource)
+                .where(ConnectedSource.name == name, ConnectedSource.connected.is_(True))
+                .values(connected=False, version=_next_version())
+            ).rowcount > 0
+            db.commit()
+        finally:
+            db.close()
+        self._invalidate()
+        return disconnected
+
+# Global instance
+source_registry = SourceRegistry()
@@ -0,0 +1,142 @@
+import os
+import re
+import sqlite3
+import time
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DatabaseError, OperationalError
+
+from metrics import metrics
+
+QUERY_TIMEOUT_SECONDS = float(os.getenv("SQL_GUARD_TIMEOUT_SECONDS", "5"))
+MAX_VM_STEPS = int(os.getenv("SQL_GUARD_MAX_VM_STEPS", "20000000"))
+MAX_ROWS = int(os.getenv("SQL_GUARD_MAX_ROWS", "500"))
+# Full-table scans allowed under one plan node; two or more means an unindexed nested-loop join
+MAX_NESTED_SCANS = int(os.getenv("SQL_GUARD_MAX_NESTED_SCANS", "1"))
+PROGRESS_INTERVAL = 10000
+
+_ALLOWED_STATEMENT = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+# Authorizer actions a query may use; anything else, like a write behind a WITH clause, is denied when prepared
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+class SQLGuardError(Exception):
+    code = "sql_guard_error"
+    status_code = 400
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "message": str(self)}
+
+
+class QueryRejected(SQLGuardError):
+    code = "query_rejected"
+    status_code = 422
+
+
+class QueryTimeout(SQLGuardError):
+    code = "query_timeout"
+    status_code = 504
+
+
+class _Budget:
+    """SQLite progress handler enforcing a wall-clock and VM-step budget."""
+
+    def __init__(self, timeout: float, max_steps: int):
+        self.deadline = time.monotonic() + timeout
+        self.max_steps = max_steps
+        self.steps = 0
+        self.tripped = None
+
+    def __call__(self):
+        self.steps += PROGRESS_INTERVAL
+        if self.steps > self.max_steps:
+            self.tripped = f"exceeded {self.max_steps} VM steps"
+        elif time.monotonic() > self.deadline:
+            self.tripped = "exceeded wall-clock budget"
+        # A non-zero return makes SQLite abort the statement with "interrupted"
+        return 1 if self.tripped else 0
+
+
+def _authorize_read(action: int, *args) -> int:
+    return sqlite3.SQLITE_OK if action in _READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _first_statement_end(sql: str) -> int:
+    """Index just past the first complete statement; semicolons inside literals and comments don't count."""
+    for match in re.finditer(";", sql):
+        if sqlite3.complete_statement(sql[:match.end()]):
+            return match.end()
+    return len(sql)
+
+
+def check_statement(sql: str) -> str:
+    sql = sql.strip()
+    end = _first_statement_end(sql)
+    statement = sql[:end].rstrip(";").strip()
+    if not _ALLOWED_STATEMENT.match(statement):
+        metrics.incr("sql_guard.rejected.not_select")
+        raise QueryRejected("Only SELECT queries are allowed")
+    if sql[end:].strip(" \t\r\n;"):
+        metrics.incr("sql_guard.rejected.multiple_statements")
+        raise QueryRejected("Only a single statement is allowed")
+    return statement
+
+
+def check_plan(conn, statement: str, parameters: tuple = ()):
+    try:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    except DatabaseError as e:
+        if "not authorized" not in str(e.orig):
+            raise
+        metrics.incr("sql_guard.rejected.write")
+        raise QueryRejected("Only read-only queries are allowed") from e
+
+    full_scans = {}
+    for _, parent, _, detail in plan:
+        if detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail:
+            full_scans[parent] = full_scans.get(parent, 0) + 1
+
+    worst = max(full_scans.values(), default=0)
+    if worst > MAX_NESTED_SCANS:
+        metrics.incr("sql_guard.rejected.plan")
+        raise QueryRejected(
+            f"Query plan nests {worst} full table scans (likely a cartesian join); add a join condition or filter"
+        )
+
+
+def run_guarded(engine: Engine, sql: str, parameters: tuple = ()) -> tuple[list[str], list[tuple], bool]:
+    """Runs a read-only query under plan, row and time guards.
+
+    Returns (columns, rows, truncated)."""
+    statement = check_statement(sql)
+
+    with engine.connect() as conn:
+        raw = conn.connection.dbapi_connection
+        # Pooled connections outlive this query, so the authorizer is removed again below
+        raw.set_authorizer(_authorize_read)
+        try:
+            check_plan(conn, statement, parameters)
+
+            budget = _Budget(QUERY_TIMEOUT_SECONDS, MAX_VM_STEPS)
+            raw.set_progress_handler(budget, PROGRESS_INTERVAL)
+            started = time.perf_counter()
+            try:
+                result = conn.exec_driver_sql(statement, parameters)
+                columns = list(result.keys())
+                rows = result.fetchmany(MAX_ROWS + 1)
+            except OperationalError as e:
+                if budget.tripped:
+                    metrics.incr("sql_guard.timeout")
+                    raise QueryTimeout(f"Query aborted: {budget.tripped}") from e
+                raise
+            finally:
+                raw.set_progress_handler(None, 0)
+                metrics.observe("sql_guard.query_seconds", time.perf_counter() - started)
+        finally:
+            raw.set_authorizer(None)
+
+    truncated = len(rows) > MAX_ROWS
+    if truncated:
+        metrics.incr("sql_guard.row_cap")
+        rows = rows[:MAX_ROWS]
+
+    return columns, [tuple(r) for r in rows], truncated
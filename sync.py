@@ -0,0 +1,64 @@
+import pandas as pd
+
+from database import SessionLocal
+from batch_validation import validate_batch
+from canonicalize import canonicalizer
+from field_mapper import source_fields
+from frame_normalizer import normalize_frame
+from ingest import bulk_upsert_employees, bulk_upsert_frame, FullRefresh
+from llm_mapper import get_dynamic_field_mapping
+from loaders.loader_registry import loader_registry
+from outbox import outbox_dispatcher
+from quarantine import quarantine_frame, quarantine_rejected
+
+
+def sync_source(source_name: str, mode: str = "incremental") -> dict:
+    """Loads, maps, validates and upserts one source in its own transaction; returns the run's counts."""
+    loader = loader_registry.get(source_name)
+    db = SessionLocal()
+    try:
+        refresh = FullRefresh(db, source_name) if mode == "full_refresh" else None
+        rejected = quarantined = 0
+
+        if loader.supports_frames:
+            # Columnar fast path for tabular sources, kept as frames through the upsert
+            valid_frames = []
+            field_map = None
+            for frame in loader.load_frames():
+                if field_map is None:
+                    field_map = get_dynamic_field_mapping(source_name, list(frame.columns))
+                valid, invalid = normalize_frame(frame, field_map, source_name=source_name)
+                valid_frames.append(valid)
+                rejected += len(invalid)
+                quarantined += quarantine_frame(db, source_name, invalid)
+                if refresh is not None:
+                    refresh.add(valid["employee_id"])
+            if valid_frames:
+                counts = bulk_upsert_frame(db, source_name, pd.concat(valid_frames, ignore_index=True))
+            else:
+                counts = bulk_upsert_employees(db, source_name, [])
+        else:
+            source_data = loader.load()
+            field_map = get_dynamic_field_mapping(source_name, source_fields(source_data))
+            result = validate_batch(source_data, field_map, source_name=source_name)
+            unified_records = canonicalizer.canonicalize_records(result.valid)
+            rejected += len(result.rejected)
+            quarantined += quarantine_rejected(db, source_name, source_data, result.rejected)
+            if refresh is not None:
+                refresh.add(record["employee_id"] for record in unified_records)
+            counts = bulk_upsert_employees(db, source_name, unified_records)
+
+        if refresh is not None:
+            # A rejected row's employee may still exist upstream, so only a clean load may delete
+            if rejected:
+                refresh.abandon()
+            counts["tombstoned"] = 0 if rejected else refresh.finish()
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    outbox_dispatcher.notify()
+    return {**counts, "rejected": rejected, "quarantined": quarantined}
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import mapping_registry
+from ingest_lock import run_exclusive, last_fingerprint, record_skipped, list_runs
+from loaders.loader_registry import loader_registry
+from metrics import metrics
+from qa_log_writer import utcnow
+from source_registry import source_registry
+from sync import sync_source
+
+# "FakeSAP=300;FakeWorkday=*/15 * * * *": seconds between syncs, or a five-field cron expression in UTC
+SYNC_SCHEDULE = os.getenv("SYNC_SCHEDULE", "")
+# Interval for connected sources missing from SYNC_SCHEDULE; 0 leaves them to /get-data
+SYNC_DEFAULT_INTERVAL_SECONDS = float(os.getenv("SYNC_DEFAULT_INTERVAL_SECONDS", "0"))
+# Each run starts up to this much later than planned so workers and sources don't all fire together
+SYNC_JITTER_SECONDS = float(os.getenv("SYNC_JITTER_SECONDS", "30"))
+SYNC_MAX_CONCURRENT = int(os.getenv("SYNC_MAX_CONCURRENT", "2"))
+SYNC_TICK_SECONDS = float(os.getenv("SYNC_TICK_SECONDS", "5"))
+SYNC_HISTORY_RUNS = 20
+
+logger = logging.getLogger(__name__)
+
+_CRON_FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 6)]
+
+
+class CronSchedule:
+    """Standard five-field cron: numbers, *, ranges, lists and steps. Sunday is 0 or 7.
+
+    As in cron, when both day of month and day of week are restricted a day matching either fires."""
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(part, low, high, name) for part, (name, low, high) in zip(parts, _CRON_FIELDS)
+        )
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int, name: str) -> set[int]:
+        values = set()
+        for item in field.split(","):
+            spec, _, step = item.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(v) for v in spec.split("-", 1))
+            else:
+                start = int(spec)
+                end = high if step else start
+            # 7 is Sunday too
+            top = 7 if name == "weekday" else high
+            if not (low <= start <= end <= top):
+                raise ValueError(f"Cron {name} out of range: {item!r}")
+            values.update(v % 7 if name == "weekday" else v for v in range(start, end + 1, int(step or 1)))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            # Jump a whole month, day or hour at a time when that part cannot match
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+def parse_schedule(spec: str) -> float | CronSchedule:
+    spec = spec.strip()
+    try:
+        seconds = float(spec)
+    except ValueError:
+        return CronSchedule(spec)
+    if seconds <= 0:
+        raise ValueError(f"Sync interval must be positive: {spec!r}")
+    return seconds
+
+
+def _configured_schedules() -> dict:
+    schedules = {}
+    for item in SYNC_SCHEDULE.split(";"):
+        if "=" in item:
+            name, spec = (part.strip() for part in item.split("=", 1))
+            schedules[name] = parse_schedule(spec)
+    return schedules
+
+
+def source_fingerprint(source_name: str, mode: str) -> str | None:
+    """The loader's data fingerprint plus the mode and mapping versions, since either changes what a sync writes.
+
+    None when the loader has no fingerprint, so the source is always synced."""
+    data = loader_registry.get(source_name).fingerprint()
+    if data is None:
+        return None
+    mappings = [(m["version"], m["status"], m["pinned"]) for m in mapping_registry.list_versions(source_name)]
+    payload = json.dumps([data, mode, mappings])
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class SyncScheduler:
+    """Runs background syncs of sources on an interval or cron schedule.
+
+    Scheduled runs go through the same ingest locks as /get-data and uploads, never wait on a run already
+    holding the lock, skip sources whose fingerprint has not changed since the last sync, and hold back
+    while interactive syncs in this process are running."""
+
+    def __init__(self):
+        self._schedules = _configured_schedules()
+        self._planned: dict[str, datetime] = {}
+        self._due: dict[str, datetime] = {}
+        self._running: set[str] = set()
+        self._interactive = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    @contextmanager
+    def interactive(self):
+        """Marks a client-triggered sync; scheduled runs don't start while one is active."""
+        with self._cond:
+            self._interactive += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive -= 1
+                self._cond.notify_all()
+
+    def _schedule_for(self, source_name: str):
+        return self._schedules.get(source_name, SYNC_DEFAULT_INTERVAL_SECONDS or None)
+
+    def _sources(self) -> dict[str, str]:
+        """Connected sources that have a schedule and a loader in this worker, mapped to their sync mode.
+
+        SYNC_SCHEDULE only sets intervals; a source listed there is not synced while it is disconnected."""
+        return {
+            source["name"]: source.get("mode", "incremental")
+            for source in source_registry.all()
+            if self._schedule_for(source["name"]) and loader_registry.exists(source["name"])
+        }
+
+    def _plan(self, source_name: str, now: datetime, previous: datetime | None = None) -> datetime:
+        schedule = self._schedule_for(source_name)
+        if isinstance(schedule, CronSchedule):
+            planned = schedule.next_after(now)
+        elif previous is None:
+            # Spread the first runs over one interval instead of firing everything at startup
+            planned = now + timedelta(seconds=random.uniform(0, schedule))
+        else:
+            planned = max(previous + timedelta(seconds=schedule), now)
+        self._planned[source_name] = planned
+        self._due[source_name] = planned + timedelta(seconds=random.uniform(0, SYNC_JITTER_SECONDS))
+        return self._due[source_name]
+
+    def _wait_for_interactive(self):
+        with self._cond:
+            if self._interactive:
+                metrics.incr("sync.scheduled.deferred")
+            while self._interactive and not self._stopping.is_set():
+                self._cond.wait(SYNC_TICK_SECONDS)
+
+    def run_source(self, source_name: str, mode: str) -> dict:
+        try:
+            self._wait_for_interactive()
+            if self._stopping.is_set():
+                return {"status": "cancelled"}
+            fingerprint = source_fingerprint(source_name, mode)
+            if fingerprint is not None and fingerprint == last_fingerprint(source_name):
+                metrics.incr("sync.scheduled.unchanged")
+                return {"run_id": record_skipped(source_name, "scheduler", fingerprint), "status": "skipped"}
+
+            run = run_exclusive(
+                source_name, "scheduler", lambda: sync_source(source_name, mode),
+                wait=False, fingerprint=fingerprint,
+            )
+            metrics.incr(f"sync.scheduled.{run['status']}")
+            return run
+        except Exception as e:
+            metrics.incr("sync.scheduled.failed")
+            logger.exception("Scheduled sync of %s failed", source_name)
+            return {"status": "failed", "error": str(e)}
+        finally:
+            with self._cond:
+                self._running.discard(source_name)
+
+    def tick(self) -> int:
+        """Starts every due source that isn't already running; returns how many were started."""
+        now = utcnow()
+        sources = self._sources()
+        for name in list(self._due):
+            if name not in sources:
+                del self._due[name], self._planned[name]
+
+        started = 0
+        for name, mode in sources.items():
+            if name not in self._due:
+                self._plan(name, now)
+                continue
+            if self._due[name] > now:
+                continue
+            with self._cond:
+                if name in self._running:
+                    continue
+                self._running.add(name)
+            self._plan(name, now, self._planned[name])
+            self._pool.submit(self.run_source, name, mode)
+            started += 1
+        return started
+
+    def _run(self):
+        while not self._stopping.wait(SYNC_TICK_SECONDS):
+            try:
+                self.tick()
+            except Exception:
+                metrics.incr("sync.scheduler_errors")
+                logger.exception("Sync scheduler failed")
+
+    def status(self) -> list[dict]:
+        """Each scheduled source's next run and a summary of its recent run history."""
+        with self._cond:
+            running = set(self._running)
+        sources = []
+        for name in sorted(self._sources()):
+            schedule = self._schedule_for(name)
+            runs = list_runs(name, SYNC_HISTORY_RUNS)
+            synced = [run for run in runs if run["status"] == "succeeded"]
+            durations = [run["duration_seconds"] for run in synced if run["duration_seconds"] is not None]
+            rates = [run["rows_per_second"] for run in synced if run["rows_per_second"] is not None]
+            sources.append({
+                "source_name": name,
+                "schedule": schedule.expression if isinstance(schedule, CronSchedule) else f"every {schedule:g}s",
+                "next_run_at": self._due[name].isoformat() if name in self._due else None,
+                "running": name in running,
+                "recent_runs": len(runs),
+                "succeeded": len(synced),
+                "skipped": sum(1 for run in runs if run["status"] == "skipped"),
+                "failed": sum(1 for run in runs if run["status"] in ("failed", "abandoned")),
+                "avg_duration_seconds": sum(durations) / len(durations) if durations else None,
+                "avg_rows_per_second": round(sum(rates) / len(rates)) if rates else None,
+                "last_run": runs[0] if runs else None,
+            })
+        return sources
+
+    def start(self):
+        if self._thread is None and (self._schedules or SYNC_DEFAULT_INTERVAL_SECONDS > 0):
+            self._stopping.clear()
+            self._pool = ThreadPoolExecutor(max_workers=SYNC_MAX_CONCURRENT, thread_name_prefix="sync")
+            self._thread = threading.Thread(target=self._run, name="sync-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopping.set()
+            with self._cond:
+                self._cond.notify_all()
+            self._thread.join()
+            self._thread = None
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+# Global instance
+sync_scheduler = SyncScheduler()
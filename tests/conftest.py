@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database and the offline model before any module reads its settings
+_scratch = tempfile.mkdtemp(prefix="synchub-tests-")
+os.environ.setdefault("DATABASE_PATH", os.path.join(_scratch, "employees.db"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_scratch, "llm_cache.db"))
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    import models  # noqa: F401  registers the tables
+    from database import migrate
+
+    migrate()
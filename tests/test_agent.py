@@ -0,0 +1,48 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import agent
+from main import app
+
+
+class ScriptedCassette:
+    """Answers every non-mapping prompt with the next scripted response, whatever its key."""
+
+    def __init__(self, responses: list[str]):
+        self.responses = list(responses)
+
+    def get(self, key: str) -> str:
+        return self.responses.pop(0)
+
+
+def _sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_runs_the_agent_on_the_fake_backend():
+    response = TestClient(app).post("/ask", json={"question": "Which department pays the most on the fake backend?"})
+
+    assert response.status_code == 200
+    assert response.json()["answer"] == "No recorded response for this question."
+
+
+def test_agent_runs_sql_through_the_guard(monkeypatch):
+    monkeypatch.setattr(agent.llm.inner, "cassette", ScriptedCassette([
+        "Thought: count them\nAction: sql_db_query\nAction Input: SELECT COUNT(*) AS n FROM employees WHERE source_name = 'nobody'",
+        "Thought: I know the answer\nFinal Answer: counted",
+    ]))
+
+    response = TestClient(app).post("/ask/stream", json={"question": "Count the live employee rows via the agent"})
+
+    events = _sse(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "answer"
+    assert ("sql", {"query": "SELECT COUNT(*) AS n FROM employees WHERE source_name = 'nobody'"}) in events
+    assert ("result", {"output": "[(0,)]"}) in events
+    assert kinds.count("answer") == 1
+    assert events[-1][1]["answer"] == "counted"
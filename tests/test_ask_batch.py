@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import ask_batch
+from ask_batch import stream_batch_answers
+
+
+class StubRunner:
+    """Answers each question after its delay, in seconds, taken from the question text."""
+
+    max_in_flight = 4
+
+    async def answer(self, question: str) -> str:
+        await asyncio.sleep(float(question.split()[-1]))
+        return f"answer to {question}"
+
+
+def _no_templates(monkeypatch):
+    monkeypatch.setattr(ask_batch, "answer_from_template", lambda question: None)
+
+
+def test_answers_are_logged_once_the_batch_is_done(monkeypatch):
+    _no_templates(monkeypatch)
+    logged = []
+
+    async def run():
+        return [json.loads(line) async for line in stream_batch_answers(StubRunner(), ["q 0", "q 0", "r 0.01"], logged.extend)]
+
+    lines = asyncio.run(run())
+
+    assert lines[-1]["done"] and lines[-1]["unique"] == 2
+    assert sorted(logged) == [("q 0", "answer to q 0"), ("q 0", "answer to q 0"), ("r 0.01", "answer to r 0.01")]
+
+
+def test_answers_are_logged_when_the_client_disconnects(monkeypatch):
+    _no_templates(monkeypatch)
+    logged = []
+
+    async def run():
+        stream = stream_batch_answers(StubRunner(), ["fast 0", "slow 30"], logged.extend)
+        first = json.loads(await anext(stream))
+        # What StreamingResponse does once the client goes away
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        try:
+            await pending
+        except asyncio.CancelledError:
+            pass
+        return first
+
+    first = asyncio.run(run())
+
+    assert first["question"] == "fast 0"
+    assert logged == [("fast 0", "answer to fast 0")]
@@ -0,0 +1,42 @@
+import asyncio
+
+from ask_stream import stream_agent_answer
+from metrics import metrics
+
+
+class HangingAgent:
+    """Starts a run, then waits forever on the model like a slow provider would."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def astream_events(self, inputs, version):
+        try:
+            yield {"event": "on_chain_start", "name": "AgentExecutor", "data": {}}
+            await asyncio.Event().wait()
+        finally:
+            self.closed = True
+
+
+def test_cancelled_stream_stops_the_agent_run():
+    agent, answers = HangingAgent(), []
+
+    async def run():
+        stream = stream_agent_answer(agent, "Who left?", answers.append)
+        assert (await anext(stream)).startswith("event: start")
+        # What StreamingResponse does once the client disconnects
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        try:
+            await pending
+        except asyncio.CancelledError:
+            pass
+
+    before = metrics.snapshot()["counters"].get("ask.stream.disconnects", 0)
+    asyncio.run(run())
+
+    assert agent.closed
+    assert answers == []
+    assert metrics.snapshot()["counters"]["ask.stream.disconnects"] == before + 1
+
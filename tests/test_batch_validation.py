@@ -0,0 +1,51 @@
+from batch_validation import validate_batch
+from schema import UnifiedEmployee
+
+FIELD_MAP = {"id": "employee_id", "full_name": "name", "pay": "salary"}
+
+
+def test_valid_rows_match_the_model_dump():
+    records = [
+        {"id": 7.0, "full_name": " Ann Lee ", "pay": "$1,200.50"},
+        {"id": "8", "full_name": "Bo Chan", "pay": 900},
+    ]
+
+    result = validate_batch(records, FIELD_MAP)
+
+    assert result.valid_positions == [0, 1]
+    assert result.valid == [
+        UnifiedEmployee(employee_id="7", name="Ann Lee", salary=1200.5).model_dump(),
+        UnifiedEmployee(employee_id="8", name="Bo Chan", salary=900.0).model_dump(),
+    ]
+    assert list(result.valid[0]) == list(UnifiedEmployee.model_fields)
+
+
+def test_only_failing_rows_are_rejected():
+    records = [
+        {"id": "1", "full_name": "Ann", "pay": "100"},
+        {"id": "2", "full_name": "n/a", "pay": "lots"},
+        {"id": "3", "full_name": "Cy", "pay": None},
+    ]
+
+    result = validate_batch(records, FIELD_MAP)
+
+    assert result.valid_positions == [0, 2]
+    assert [row["employee_id"] for row in result.valid] == ["1", "3"]
+    [(position, errors)] = result.rejected
+    assert position == 1
+    assert {(e["field"], e["type"]) for e in errors} == {("name", "string_type"), ("salary", "float_parsing")}
+
+
+def test_repeated_values_are_coerced_per_value():
+    # A memoised column must not merge values that compare equal across types
+    records = [{"id": str(i), "full_name": "Ann", "dept": dept} for i, dept in enumerate([1, 1.0, True, 1, 1.0] * 2)]
+
+    result = validate_batch(records, {"id": "employee_id", "full_name": "name", "dept": "department"})
+
+    assert [row["department"] for row in result.valid] == ["1", "1.0", "True", "1", "1.0"] * 2
+
+
+def test_unmapped_required_field_is_reported_missing():
+    result = validate_batch([{"id": "1"}], {"id": "employee_id"})
+
+    assert result.rejected == [(0, [{"field": "name", "message": "Field required", "type": "missing"}])]
@@ -0,0 +1,63 @@
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from canonicalize import Canonicalizer
+from database import SessionLocal
+from models import ValueAlias
+
+
+class FailingLLM:
+    def invoke(self, prompt):
+        raise ConnectionError("provider down")
+
+
+class AnsweringLLM:
+    def __init__(self, answer: str, started: threading.Event | None = None, release: threading.Event | None = None):
+        self.answer = answer
+        self.started = started
+        self.release = release
+
+    def invoke(self, prompt):
+        if self.started is not None:
+            self.started.set()
+            self.release.wait(5)
+        return SimpleNamespace(content=self.answer)
+
+
+def _aliases(field: str, raw: str) -> list[str]:
+    db = SessionLocal()
+    try:
+        return db.scalars(select(ValueAlias.canonical).where(ValueAlias.field == field, ValueAlias.raw_value == raw)).all()
+    finally:
+        db.close()
+
+
+def test_llm_failure_leaves_values_raw_and_unsaved():
+    canonicalizer = Canonicalizer({"department": {"Engineering": ["engineering"]}})
+    canonicalizer._llm = FailingLLM()
+
+    assert canonicalizer.resolve("department", ["Platform Guild", "engineering"]) == {"engineering": "Engineering"}
+    assert _aliases("department", "Platform Guild") == []
+
+    # Retried once the provider is back
+    canonicalizer._llm = AnsweringLLM('{"Platform Guild": "Engineering"}')
+    assert canonicalizer.resolve("department", ["Platform Guild"]) == {"Platform Guild": "Engineering"}
+    assert _aliases("department", "Platform Guild") == ["Engineering"]
+
+
+def test_llm_call_does_not_block_other_resolves():
+    canonicalizer = Canonicalizer({"location": {"Pune": ["pune"]}})
+    started, release = threading.Event(), threading.Event()
+    canonicalizer._llm = AnsweringLLM('{"Somewhere Far": null}', started, release)
+
+    slow = threading.Thread(target=canonicalizer.resolve, args=("location", ["Somewhere Far"]))
+    slow.start()
+    assert started.wait(5)
+    try:
+        assert canonicalizer.resolve("location", ["PUNE"]) == {"PUNE": "Pune"}
+    finally:
+        release.set()
+        slow.join()
+    assert canonicalizer.resolve("location", ["Somewhere Far"]) == {"Somewhere Far": "Somewhere Far"}
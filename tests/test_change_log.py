@@ -0,0 +1,60 @@
+import threading
+
+from sqlalchemy import func, select
+
+import outbox
+from change_log import record_changes, record_deletes
+from database import SessionLocal
+from models import Employee, EmployeeChange, OutboxMessage
+
+
+def _record(source: str, count: int):
+    for i in range(count):
+        db = SessionLocal()
+        try:
+            record_changes(db, [
+                {"source_name": source, "source_record_id": f"{i}-{n}", "employee_id": f"{i}-{n}", "op": "insert", "changed": {}}
+                for n in range(3)
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+
+def _captured(source: str) -> tuple[int, int, int]:
+    db = SessionLocal()
+    try:
+        seqs = select(EmployeeChange.seq).where(EmployeeChange.source_name == source)
+        changes = db.scalar(select(func.count()).select_from(seqs.subquery()))
+        messages = db.scalar(select(func.count()).where(OutboxMessage.change_seq.in_(seqs)))
+        distinct = db.scalar(select(func.count(func.distinct(OutboxMessage.change_seq))).where(OutboxMessage.change_seq.in_(seqs)))
+        return changes, messages, distinct
+    finally:
+        db.close()
+
+
+def test_concurrent_writers_capture_only_their_own_changes(monkeypatch):
+    monkeypatch.setattr(outbox, "WEBHOOK_ENDPOINTS", ["http://receiver.test/hook"])
+
+    threads = [threading.Thread(target=_record, args=(f"writer-{w}", 20)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for w in range(4):
+        assert _captured(f"writer-{w}") == (60, 60, 60)
+
+
+def test_record_deletes_captures_the_logged_rows(monkeypatch):
+    monkeypatch.setattr(outbox, "WEBHOOK_ENDPOINTS", ["http://receiver.test/hook"])
+    db = SessionLocal()
+    try:
+        db.add_all(Employee(name=f"E{i}", source_name="purged", source_record_id=str(i)) for i in range(5))
+        db.commit()
+        assert record_deletes(db, "source_name = ?", ("purged",)) == 5
+        db.commit()
+    finally:
+        db.close()
+
+    assert _captured("purged") == (5, 5, 5)
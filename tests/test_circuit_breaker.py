@@ -0,0 +1,52 @@
+import time
+
+import llm_mapper
+from circuit_breaker import CircuitBreaker
+from llm_governor import GovernorDeadlineExceeded
+
+
+def _open_breaker(monkeypatch) -> CircuitBreaker:
+    breaker = CircuitBreaker("test_mapping", failure_threshold=1, reset_timeout=0.05)
+    monkeypatch.setattr(llm_mapper, "mapping_breaker", breaker)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_governor_deadline_during_half_open_trial_releases_it(monkeypatch):
+    breaker = _open_breaker(monkeypatch)
+
+    def throttled(*args):
+        raise GovernorDeadlineExceeded("no capacity")
+
+    monkeypatch.setattr(llm_mapper, "_request_mapping", throttled)
+    mapping, degraded = llm_mapper._map_fields("FakeSAP", ["emp_id", "emp_name"])
+
+    assert degraded
+    assert "employee_id" in mapping.values()
+    # The trial ended without an answer, so the next call may try again
+    assert breaker.allow()
+
+
+def test_half_open_trial_success_closes_breaker(monkeypatch):
+    breaker = _open_breaker(monkeypatch)
+    monkeypatch.setattr(llm_mapper, "_request_mapping", lambda *args: {"emp_id": "employee_id"})
+
+    mapping, degraded = llm_mapper._map_fields("FakeSAP", ["emp_id"])
+
+    assert not degraded
+    assert mapping == {"emp_id": "employee_id"}
+    assert breaker.state == "closed"
+
+
+def test_only_one_trial_while_half_open():
+    breaker = CircuitBreaker("test_trial", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_trial()
+    assert breaker.allow()
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from coercion import CoercerRegistry, IdCoercer, NumberCoercer, TextCoercer, coerce_values, infer_coercer
+
+SALARIES = ["12,000", "$12000.00", "(1,500.50)", "INR 9,99,999", "N/A", "", None, "abc", 7000]
+
+
+def test_number_coercer_parses_currency_and_nulls():
+    coercer = infer_coercer("salary", SALARIES)
+
+    assert coercer.decimal == "."
+    assert [coercer.value(v) for v in SALARIES] == [12000.0, 12000.0, -1500.5, 999999.0, None, None, None, "abc", 7000.0]
+
+
+def test_number_coercer_infers_european_decimals():
+    coercer = infer_coercer("salary", ["1.200,50", "€ 3.000", "45,5"])
+
+    assert coercer.decimal == ","
+    assert coercer.value("1.200,50") == 1200.5
+    assert coercer.value("€ 3.000") == 3000.0
+
+
+def test_series_agrees_with_value_and_flags_unparseable():
+    coercer = NumberCoercer()
+    raw = pd.Series(["12,000", "$5.5", "N/A", "abc"] * 3, dtype=object)
+
+    numbers, failed = coercer.series(raw)
+
+    assert numbers.iloc[0] == coercer.value("12,000") and numbers.iloc[1] == coercer.value("$5.5")
+    assert pd.isna(numbers.iloc[2]) and pd.isna(numbers.iloc[3])
+    assert failed.tolist() == [False, False, False, True] * 3
+
+
+def test_id_coercer_pads_to_the_source_width():
+    coercer = infer_coercer("employee_id", [" 001 ", "042", "7"])
+
+    assert isinstance(coercer, IdCoercer) and coercer.width == 3
+    assert [coercer.value(v) for v in [" 001 ", 7, 12000.0, "12.0", "E-9", "null"]] == ["001", "007", "12000", "012", "E-9", None]
+    ids, _ = coercer.series(pd.Series([" 001 ", "7", "12.0", "E-9", "null"], dtype=object))
+    assert ids.tolist()[:4] == ["001", "007", "012", "E-9"] and pd.isna(ids.iloc[4])
+
+
+def test_coerce_values_keeps_int_and_float_apart():
+    calls = []
+
+    class Recording(TextCoercer):
+        def value(self, raw):
+            calls.append(raw)
+            return super().value(raw)
+
+    values = [1, 1.0, 1, 1.0, "HR", "HR", "HR", "HR"]
+
+    assert coerce_values(Recording(), values) == ["1", "1.0", "1", "1.0", "HR", "HR", "HR", "HR"]
+    assert len(calls) == 3
+
+
+def test_registry_reuses_coercers_until_the_mapping_changes():
+    registry = CoercerRegistry()
+    mapping = {"sal": "salary"}
+
+    first = registry.for_columns("Src", mapping, {"salary": ["1.200,50"]})
+    again = registry.for_columns("Src", mapping, {"salary": ["1,200.50"]})
+    remapped = registry.for_columns("Src", {"pay": "salary"}, {"salary": ["1,200.50"]})
+
+    assert again is first and first["salary"].decimal == ","
+    assert remapped["salary"].decimal == "."
+    assert registry.describe()["Src"]["salary"]["kind"] == "number"
@@ -0,0 +1,54 @@
+import sqlite3
+
+from sqlalchemy import create_engine, insert, select
+
+import database
+from database import LEGACY_SOURCE, migrate
+from models import Employee
+
+# The employees and qa_logs tables as the first release created them
+PRE_SERIES_SCHEMA = """
+CREATE TABLE qa_logs (id INTEGER PRIMARY KEY, question VARCHAR NOT NULL, answer VARCHAR NOT NULL, asked_at DATETIME DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE employees (id INTEGER PRIMARY KEY, employee_id VARCHAR, name VARCHAR, salary INTEGER, email VARCHAR, department VARCHAR, location VARCHAR);
+CREATE INDEX ix_employees_id ON employees (id);
+CREATE INDEX ix_employees_employee_id ON employees (employee_id);
+"""
+
+
+def test_migrate_retires_rows_from_before_source_tracking(tmp_path, monkeypatch):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(PRE_SERIES_SCHEMA)
+    conn.executemany(
+        "INSERT INTO employees (employee_id, name, salary, department, location) VALUES (?, ?, ?, ?, ?)",
+        [("001", "Ann", 100, "HR", "Pune"), ("002", "Bo", 200, "HR", "Pune"), ("001", "Ann again", 150, "HR", "Pune"), (None, "Nobody", 0, None, None)],
+    )
+    conn.execute("INSERT INTO qa_logs (question, answer) VALUES ('q', 'a')")
+    conn.commit()
+    conn.close()
+
+    old = create_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(database, "engine", old)
+    monkeypatch.setattr(database, "DATABASE_PATH", str(path))
+    monkeypatch.setattr(database, "LOCK_DATABASE_PATH", f"{path}.locks")
+    monkeypatch.setattr(database, "lock_engine", create_engine(f"sqlite:///{path}.locks"))
+    migrate()
+    # Running it again changes nothing
+    migrate()
+
+    with old.connect() as conn:
+        rows = conn.execute(
+            select(Employee.id, Employee.source_name, Employee.source_record_id, Employee.name, Employee.deleted_at).order_by(Employee.id)
+        ).all()
+        assert [(r.source_name, r.source_record_id, r.name) for r in rows] == [
+            (LEGACY_SOURCE, "001", "Ann"),
+            (LEGACY_SOURCE, "002", "Bo"),
+            (LEGACY_SOURCE, "001#3", "Ann again"),
+            (LEGACY_SOURCE, "#4", "Nobody"),
+        ]
+        assert all(r.deleted_at is not None for r in rows)
+
+        # A source re-synced after the upgrade lives next to the retired rows
+        conn.execute(insert(Employee).values(employee_id="001", name="Ann", source_name="FakeSAP", source_record_id="001"))
+        live = conn.execute(select(Employee.source_name).where(Employee.deleted_at.is_(None))).scalars().all()
+        assert live == ["FakeSAP"]
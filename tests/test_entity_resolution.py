@@ -0,0 +1,56 @@
+from entity_resolution import link_records, normalize_employee_id
+
+
+def _record(source: str, record_id: str, employee_id: str, name: str, email: str | None = None) -> dict:
+    return {
+        "source_name": source,
+        "source_record_id": record_id,
+        "employee_id": employee_id,
+        "name": name,
+        "email": email,
+    }
+
+
+def _clusters(result) -> list[list[int]]:
+    return sorted(sorted(members) for members in result.clusters)
+
+
+def test_zero_padded_ids_link_across_sources():
+    records = [
+        _record("FakeSAP", "SAP42", "0000042", "Sita Iyer"),
+        _record("CSV", "CSV42", "42", "SITA IYER"),
+    ]
+
+    result = link_records(records)
+
+    assert _clusters(result) == [[0, 1]]
+    assert normalize_employee_id("000") == "0"
+    assert normalize_employee_id("E-007") == "E-007"
+
+
+def test_fuzzy_link_refused_when_cluster_already_has_that_source():
+    records = [
+        _record("FakeSAP", "SAP1", "1", "John Smith", "john.smith@example.com"),
+        _record("FakeWorkday", "WD1", "1", "John Smith"),
+        # A second SAP person sharing the id and a similar name; linking it to the Workday row would
+        # chain it into the first SAP person's cluster
+        _record("FakeSAP", "SAP2", "1", "John Smyth", "j.smyth@example.com"),
+    ]
+
+    result = link_records(records)
+
+    assert _clusters(result) == [[0, 1], [2]]
+    assert result.stats.cannot_links > 0
+
+
+def test_shared_email_still_links_same_source_rows():
+    records = [
+        _record("CSV", "a", "7", "Priya Nair", "Priya.Nair+hr@example.com"),
+        _record("CSV", "b", "8", "P Nair", "priya.nair@example.com"),
+        _record("FakeSAP", "c", "0000007", "Priya Nair"),
+    ]
+
+    result = link_records(records)
+
+    assert _clusters(result) == [[0, 1, 2]]
+    assert result.stats.cannot_links == 0
@@ -0,0 +1,93 @@
+import pandas as pd
+from sqlalchemy import select
+
+from database import SessionLocal
+from frame_normalizer import frame_to_records, normalize_frame
+from ingest import bulk_upsert_employees, bulk_upsert_frame, content_hash, frame_content_hashes
+from models import Employee, EmployeeChange
+
+FIELD_MAPPING = {"id": "employee_id", "name": "name", "sal": "salary", "mail": "email", "dept": "department", "city": "location"}
+
+
+def _frame(rows: list[list[str]]) -> pd.DataFrame:
+    raw = pd.DataFrame(rows, columns=list(FIELD_MAPPING), dtype=str)
+    valid, _ = normalize_frame(raw, FIELD_MAPPING, canonicalize=False)
+    return valid
+
+
+def _changes(db, source_name: str) -> list[tuple]:
+    return db.execute(
+        select(EmployeeChange.source_record_id, EmployeeChange.op, EmployeeChange.changed)
+        .where(EmployeeChange.source_name == source_name)
+        .order_by(EmployeeChange.seq)
+    ).all()
+
+
+def test_frame_hashes_match_content_hash():
+    frame = _frame([
+        ["1", "Zoë \"Z\" O'Neil", "1200", "z@example.com", "R&D", "Zürich"],
+        ["2", "Bo", "", "", "HR", "Pune"],
+        ["3", "Cy\\Tab\t", "99.5", "c@example.com", "", "日本"],
+    ])
+
+    hashes, _ = frame_content_hashes(frame)
+
+    assert list(hashes) == [content_hash(record) for record in frame_to_records(frame)]
+
+
+def test_frame_upsert_inserts_skips_and_updates():
+    db = SessionLocal()
+    try:
+        first = _frame([["1", "Ann", "100", "a@example.com", "HR", "Pune"], ["2", "Bo", "200", "", "HR", "Pune"]])
+        assert bulk_upsert_frame(db, "FrameSrc", first) == {"inserted": 2, "updated": 0, "unchanged": 0}
+        db.commit()
+
+        # The records path hashes the same rows identically
+        assert bulk_upsert_employees(db, "FrameSrc", frame_to_records(first))["unchanged"] == 2
+
+        # Later rows win for a repeated id
+        second = _frame([["1", "Ann", "100", "a@example.com", "HR", "Pune"], ["2", "Bo", "250", "", "HR", "Pune"], ["2", "Bo", "300", "", "HR", "Pune"]])
+        assert bulk_upsert_frame(db, "FrameSrc", second) == {"inserted": 0, "updated": 1, "unchanged": 1}
+        db.commit()
+
+        stored = db.scalars(select(Employee).where(Employee.source_name == "FrameSrc").order_by(Employee.source_record_id)).all()
+        assert [(e.employee_id, e.salary, e.email, e.deleted_at) for e in stored] == [("1", 100.0, "a@example.com", None), ("2", 300.0, None, None)]
+        assert stored[0].ingested_at is not None
+        assert _changes(db, "FrameSrc") == [
+            ("1", "insert", {"employee_id": "1", "name": "Ann", "salary": 100.0, "email": "a@example.com", "department": "HR", "location": "Pune"}),
+            ("2", "insert", {"employee_id": "2", "name": "Bo", "salary": 200.0, "email": None, "department": "HR", "location": "Pune"}),
+            ("2", "update", {"salary": 300.0}),
+        ]
+    finally:
+        db.close()
+
+
+def test_content_hash_ignores_key_order_and_number_type():
+    record = {"employee_id": "1", "name": "Ann", "salary": 12000, "email": None, "department": "HR", "location": "Pune"}
+
+    assert content_hash(record) == content_hash({**dict(reversed(record.items())), "salary": 12000.0})
+    assert content_hash(record) != content_hash({**record, "location": "Mumbai"})
+
+
+def test_unchanged_records_are_not_rewritten():
+    records = [
+        {"employee_id": "1", "name": "Ann", "salary": 100.0, "email": None, "department": "HR", "location": "Pune"},
+        {"employee_id": "2", "name": "Bo", "salary": 200.0, "email": None, "department": "HR", "location": "Pune"},
+    ]
+    db = SessionLocal()
+    try:
+        assert bulk_upsert_employees(db, "HashSrc", records) == {"inserted": 2, "updated": 0, "unchanged": 0}
+        db.commit()
+        loaded_at = db.scalars(select(Employee.ingested_at).where(Employee.source_name == "HashSrc").order_by(Employee.source_record_id)).all()
+
+        resent = [dict(records[0]), {**records[1], "salary": 250}]
+        assert bulk_upsert_employees(db, "HashSrc", resent) == {"inserted": 0, "updated": 1, "unchanged": 1}
+        db.commit()
+
+        stored = db.scalars(select(Employee).where(Employee.source_name == "HashSrc").order_by(Employee.source_record_id)).all()
+        # The unchanged row keeps its original write
+        assert stored[0].ingested_at == loaded_at[0] and stored[1].ingested_at != loaded_at[1]
+        assert [op for _, op, _ in _changes(db, "HashSrc")] == ["insert", "insert", "update"]
+        assert bulk_upsert_employees(db, "HashSrc", resent)["unchanged"] == 2
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from sqlalchemy import insert
+
+import ingest_lock
+from database import SessionLocal
+from ingest_lock import run_exclusive
+from models import IngestRun, QALog
+
+
+def _hold(source: str, started: threading.Event, release: threading.Event, results: list, result: dict):
+    def work():
+        started.set()
+        release.wait(10)
+        return result
+
+    results.append(run_exclusive(source, "test", work))
+
+
+def test_waiter_attaches_to_the_running_sync():
+    started, release, results = threading.Event(), threading.Event(), []
+    holder = threading.Thread(target=_hold, args=("attach-src", started, release, results, {"inserted": 3}))
+    holder.start()
+    assert started.wait(5)
+
+    calls = []
+    waiter = threading.Thread(target=lambda: results.append(run_exclusive("attach-src", "test", lambda: calls.append(1))))
+    waiter.start()
+    time.sleep(0.3)
+    release.set()
+    holder.join()
+    waiter.join()
+
+    assert calls == []
+    first, attached = results
+    assert attached == {"run_id": first["run_id"], "attached": True, "status": "succeeded", "result": {"inserted": 3}}
+
+
+def test_no_wait_returns_busy_while_held():
+    started, release, results = threading.Event(), threading.Event(), []
+    holder = threading.Thread(target=_hold, args=("busy-src", started, release, results, {}))
+    holder.start()
+    assert started.wait(5)
+    try:
+        busy = run_exclusive("busy-src", "test", lambda: {}, wait=False)
+    finally:
+        release.set()
+        holder.join()
+
+    assert busy["status"] == "busy"
+    assert busy["run_id"] == results[0]["run_id"]
+    assert run_exclusive("busy-src", "test", lambda: {"ok": True}, wait=False)["status"] == "succeeded"
+
+
+def test_expired_lock_is_taken_over(monkeypatch):
+    monkeypatch.setattr(ingest_lock, "INGEST_LOCK_TTL_SECONDS", 0.3)
+    # A worker took the lock and died: nothing renews it
+    dead_run, _ = ingest_lock._try_acquire("takeover-src", "test")
+
+    run = run_exclusive("takeover-src", "test", lambda: {"ok": True})
+
+    assert run["status"] == "succeeded" and run["run_id"] != dead_run
+    db = SessionLocal()
+    try:
+        assert db.get(IngestRun, dead_run).status == "abandoned"
+    finally:
+        db.close()
+
+
+def test_lease_is_renewed_while_work_holds_the_write_lock(monkeypatch):
+    monkeypatch.setattr(ingest_lock, "INGEST_LOCK_TTL_SECONDS", 0.3)
+    started, release, results = threading.Event(), threading.Event(), []
+
+    def work():
+        # Like sync_source: one long write transaction on the main database
+        db = SessionLocal()
+        try:
+            db.execute(insert(QALog).values(question="q", answer="a"))
+            started.set()
+            release.wait(10)
+            db.rollback()
+        finally:
+            db.close()
+        return {}
+
+    holder = threading.Thread(target=lambda: results.append(run_exclusive("renew-src", "test", work)))
+    holder.start()
+    assert started.wait(5)
+    try:
+        # Several TTLs pass; without renewal another worker could take the lock over
+        for _ in range(4):
+            time.sleep(0.3)
+            assert run_exclusive("renew-src", "test", lambda: {}, wait=False)["status"] == "busy"
+    finally:
+        release.set()
+        holder.join()
+
+    assert results[0]["status"] == "succeeded"
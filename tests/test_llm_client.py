@@ -0,0 +1,55 @@
+import asyncio
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm_client import CachedChatModel, LLMResponseCache
+
+
+class WholeAnswerModel(BaseChatModel):
+    """A provider without streaming support: only _generate."""
+
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "whole-answer"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        message = AIMessage(content="forty-two", usage_metadata={"input_tokens": 3, "output_tokens": 1, "total_tokens": 4})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _model(tmp_path) -> CachedChatModel:
+    inner = WholeAnswerModel()
+    return CachedChatModel(inner=inner, caller="test", response_cache=LLMResponseCache(str(tmp_path / "cache.db"), 10))
+
+
+def test_stream_from_a_non_streaming_model_on_miss_and_hit(tmp_path):
+    model = _model(tmp_path)
+
+    missed = list(model.stream("What is the answer?"))
+    hit = list(model.stream("What is the answer?"))
+
+    assert "".join(chunk.content for chunk in missed) == "forty-two"
+    assert all(isinstance(chunk, AIMessageChunk) for chunk in missed + hit)
+    assert "".join(chunk.content for chunk in hit) == "forty-two"
+    assert model.inner.calls == 1
+
+
+def test_stream_events_come_from_the_wrapper_only(tmp_path):
+    model = _model(tmp_path)
+
+    async def collect():
+        return [event async for event in model.astream_events("Tell me once", version="v2")]
+
+    tokens = [e for e in asyncio.run(collect()) if e["event"] == "on_chat_model_stream" and e["data"]["chunk"].content]
+    assert [(e["name"], e["data"]["chunk"].content) for e in tokens] == [("CachedChatModel", "forty-two")]
+
+
+def test_cache_file_directory_is_created(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "data" / "llm_cache.db"), 10)
+    cache.put("key", "content", {})
+    assert cache.get("key") == ("content", {})
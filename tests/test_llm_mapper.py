@@ -0,0 +1,40 @@
+import pytest
+
+import mapping_registry
+from llm_mapper import get_dynamic_field_mapping
+from mapping_registry import MappingPendingReview
+
+
+def _versions(source_name: str) -> list[tuple[int, str]]:
+    return [(v["version"], v["status"]) for v in mapping_registry.list_versions(source_name)]
+
+
+def test_new_source_is_not_ingested_until_its_mapping_is_approved():
+    fields = ["emp_id", "emp_name", "emp_sal"]
+
+    with pytest.raises(MappingPendingReview) as pending:
+        get_dynamic_field_mapping("ReviewNew", fields)
+    # Asking again doesn't propose the same headers twice
+    with pytest.raises(MappingPendingReview):
+        get_dynamic_field_mapping("ReviewNew", fields)
+    assert _versions("ReviewNew") == [(pending.value.version, "proposed")]
+
+    mapping_registry.set_status("ReviewNew", pending.value.version, status="approved")
+    assert get_dynamic_field_mapping("ReviewNew", fields) == {"emp_id": "employee_id", "emp_name": "name", "emp_sal": "salary"}
+
+
+def test_proposed_drift_mapping_is_not_applied():
+    approved = {"emp_id": "employee_id", "emp_name": "name"}
+    mapping_registry.import_mappings([
+        {"source_name": "ReviewDrift", "fields": list(approved), "mapping": approved, "status": "approved"},
+    ])
+
+    drifted = ["emp_id", "emp_name", "emp_dept"]
+    assert get_dynamic_field_mapping("ReviewDrift", drifted) == approved
+
+    proposal, baseline = _versions("ReviewDrift")
+    assert proposal[1] == "proposed" and baseline[1] == "approved"
+    assert mapping_registry.list_versions("ReviewDrift")[0]["mapping"] == {**approved, "emp_dept": "department"}
+
+    mapping_registry.set_status("ReviewDrift", proposal[0], status="approved")
+    assert get_dynamic_field_mapping("ReviewDrift", drifted) == {**approved, "emp_dept": "department"}
@@ -0,0 +1,53 @@
+import threading
+
+import mapping_registry
+from mapping_registry import AcceptedMappings, list_versions, save_mapping, set_status
+from schema_drift import header_fingerprint
+
+
+def test_pin_in_another_worker_drops_cached_mapping(monkeypatch):
+    monkeypatch.setattr(mapping_registry, "MAPPING_CACHE_TTL_SECONDS", 0)
+    fields = ["id", "full_name"]
+    fingerprint = header_fingerprint(fields)
+    save_mapping("PinSource", fields, {"id": "employee_id", "full_name": "name"})
+    version = list_versions("PinSource")[0]["version"]
+
+    # This worker's cache, separate from the module's global one that set_status clears directly
+    worker = AcceptedMappings()
+    cached, revision = worker.lookup("PinSource", fingerprint)
+    assert cached is None
+    worker.put("PinSource", fingerprint, {"id": "employee_id", "full_name": "name"}, revision)
+    assert worker.lookup("PinSource", fingerprint)[0] == {"id": "employee_id", "full_name": "name"}
+
+    set_status("PinSource", version, pinned=True)
+
+    assert worker.lookup("PinSource", fingerprint)[0] is None
+
+
+def test_put_with_stale_revision_is_ignored(monkeypatch):
+    monkeypatch.setattr(mapping_registry, "MAPPING_CACHE_TTL_SECONDS", 0)
+    worker = AcceptedMappings()
+    _, revision = worker.lookup("StaleSource", "fp")
+    save_mapping("StaleSource", ["id"], {"id": "employee_id"})
+    worker.lookup("StaleSource", "fp")
+
+    worker.put("StaleSource", "fp", {"id": "employee_id"}, revision)
+
+    assert worker.lookup("StaleSource", "fp")[0] is None
+
+
+def test_concurrent_saves_get_distinct_versions():
+    start = threading.Barrier(8)
+
+    def save(i):
+        start.wait()
+        save_mapping("RaceSource", [f"col{i}"], {f"col{i}": "employee_id"})
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    versions = [entry["version"] for entry in list_versions("RaceSource")]
+    assert sorted(versions) == list(range(1, 9))
@@ -0,0 +1,129 @@
+import gzip
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import insert, select, update
+
+import outbox
+from database import SessionLocal
+from models import OutboxMessage
+from qa_log_writer import utcnow
+
+
+class Receiver(BaseHTTPRequestHandler):
+    received: Counter
+
+    def do_POST(self):
+        body = gzip.decompress(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.02)  # widens the window in which two dispatchers could pick the same rows
+        for change in json.loads(body)["changes"]:
+            self.server.received[change["seq"]] += 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def receiver():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    server.received = Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+def _dispatcher() -> outbox.OutboxDispatcher:
+    dispatcher = outbox.OutboxDispatcher()
+    dispatcher._pool = ThreadPoolExecutor(max_workers=outbox.WEBHOOK_CONCURRENCY)
+    return dispatcher
+
+
+def _enqueue(endpoint: str, count: int):
+    now = utcnow()
+    db = SessionLocal()
+    try:
+        db.execute(insert(OutboxMessage), [
+            {"endpoint": endpoint, "change_seq": seq, "partition_key": f"src:{seq % 7}", "payload": {"seq": seq},
+             "status": "pending", "attempts": 0, "next_attempt_at": now, "created_at": now}
+            for seq in range(1, count + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def _statuses(endpoint: str) -> Counter:
+    db = SessionLocal()
+    try:
+        return Counter(db.scalars(select(OutboxMessage.status).where(OutboxMessage.endpoint == endpoint)).all())
+    finally:
+        db.close()
+
+
+def test_two_workers_never_post_the_same_message(receiver, monkeypatch):
+    endpoint = f"http://127.0.0.1:{receiver.server_port}/hook"
+    monkeypatch.setattr(outbox, "WEBHOOK_ENDPOINTS", [endpoint])
+    monkeypatch.setattr(outbox, "WEBHOOK_BATCH_SIZE", 10)
+    _enqueue(endpoint, 300)
+
+    def drain(dispatcher):
+        deadline = time.monotonic() + 20
+        while _statuses(endpoint)["pending"] + _statuses(endpoint)["sending"] and time.monotonic() < deadline:
+            dispatcher.dispatch_once()
+
+    workers = [threading.Thread(target=drain, args=(_dispatcher(),)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert _statuses(endpoint) == {"delivered": 300}
+    assert set(receiver.received) == set(range(1, 301))
+    assert max(receiver.received.values()) == 1
+
+
+def test_unsendable_batch_is_retried_then_dead(monkeypatch):
+    endpoint = "not a url"
+    monkeypatch.setattr(outbox, "WEBHOOK_ENDPOINTS", [endpoint])
+    monkeypatch.setattr(outbox, "WEBHOOK_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(outbox, "_backoff", lambda attempts: 0)
+    _enqueue(endpoint, 3)
+
+    dispatcher = _dispatcher()
+    dispatcher.dispatch_once()
+    assert _statuses(endpoint) == {"pending": 3}
+    dispatcher.dispatch_once()
+    assert _statuses(endpoint) == {"dead": 3}
+
+
+def test_expired_lease_is_reclaimed(receiver, monkeypatch):
+    endpoint = f"http://127.0.0.1:{receiver.server_port}/lease"
+    monkeypatch.setattr(outbox, "WEBHOOK_ENDPOINTS", [endpoint])
+    _enqueue(endpoint, 2)
+
+    # A worker claimed the batch and died before posting it
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(OutboxMessage).where(OutboxMessage.endpoint == endpoint)
+            .values(status="sending", lease_until=utcnow() + timedelta(seconds=60))
+        )
+        db.commit()
+        dispatcher = _dispatcher()
+        assert dispatcher.dispatch_once() == 0
+
+        db.execute(update(OutboxMessage).where(OutboxMessage.endpoint == endpoint).values(lease_until=utcnow() - timedelta(seconds=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    assert dispatcher.dispatch_once() == 2
+    assert _statuses(endpoint) == {"delivered": 2}
@@ -0,0 +1,58 @@
+import threading
+import time
+
+from sqlalchemy import select
+
+import mapping_registry
+import quarantine
+from database import SessionLocal
+from models import Employee, IngestRun, QuarantinedRecord
+from quarantine import quarantine_records
+
+
+def _hold(source: str, started: threading.Event, release: threading.Event):
+    from ingest_lock import run_exclusive
+
+    def work():
+        started.set()
+        release.wait(10)
+        return {}
+
+    run_exclusive(source, "test", work)
+
+
+def test_replay_waits_for_the_source_lock_and_notifies_the_outbox(monkeypatch):
+    mapping = {"emp_id": "employee_id", "emp_name": "name"}
+    mapping_registry.import_mappings([
+        {"source_name": "ReplaySrc", "fields": list(mapping), "mapping": mapping, "status": "approved"},
+    ])
+    db = SessionLocal()
+    quarantine_records(db, "ReplaySrc", [(0, {"emp_id": "41", "emp_name": "Ann"}, [{"field": "name"}])])
+    db.commit()
+    db.close()
+    notified = []
+    monkeypatch.setattr(quarantine.outbox_dispatcher, "notify", lambda: notified.append(1))
+
+    started, release, results = threading.Event(), threading.Event(), []
+    holder = threading.Thread(target=_hold, args=("ReplaySrc", started, release))
+    holder.start()
+    assert started.wait(5)
+    replayer = threading.Thread(target=lambda: results.append(quarantine.replay("ReplaySrc")))
+    replayer.start()
+    time.sleep(0.3)
+    # Still waiting behind the running sync
+    assert results == []
+    release.set()
+    holder.join()
+    replayer.join()
+
+    [result] = results
+    assert result["replayed"] == 1 and result["inserted"] == 1
+    assert notified == [1]
+    db = SessionLocal()
+    try:
+        assert db.get(IngestRun, result["run_id"]).trigger == "replay"
+        assert db.scalar(select(Employee.name).where(Employee.source_name == "ReplaySrc")) == "Ann"
+        assert db.scalar(select(QuarantinedRecord.status).where(QuarantinedRecord.source_name == "ReplaySrc")) == "replayed"
+    finally:
+        db.close()
@@ -0,0 +1,34 @@
+import mapping_registry
+from llm_mapper import get_dynamic_field_mapping
+from metrics import metrics
+from schema_drift import diff_headers, header_fingerprint
+
+
+def test_diff_headers_pairs_similar_names_as_renames():
+    drift = diff_headers(["emp_id", "emp_name", "dept"], ["emp_id", "emp_full_name", "branch"])
+
+    assert drift.unchanged == ["emp_id"]
+    assert drift.renamed == {"emp_name": "emp_full_name"}
+    assert drift.new_columns == ["branch"]
+    assert drift.removed == ["emp_name", "dept"]
+    assert header_fingerprint(["a", "b"]) == header_fingerprint(["b", "a"])
+
+
+def test_drift_remaps_only_columns_nothing_else_can_place():
+    approved = {"emp_id": "employee_id", "emp_name": "name", "emp_sal": "salary"}
+    mapping_registry.import_mappings([
+        {"source_name": "DriftOnly", "fields": list(approved), "mapping": approved, "status": "approved"},
+    ])
+    before = metrics.snapshot()["counters"].get("mapping.llm_fields", 0)
+
+    drifted = ["emp_id", "emp_full_name", "emp_sal", "work_site", "zq_flag"]
+    mapping = get_dynamic_field_mapping("DriftOnly", drifted)
+
+    # Unchanged and renamed columns keep their targets, heuristics place work_site, and only the
+    # column nothing recognises goes to the LLM
+    assert metrics.snapshot()["counters"]["mapping.llm_fields"] == before + 1
+    assert mapping == {"emp_id": "employee_id", "emp_full_name": "name", "emp_sal": "salary"}
+    event = mapping_registry.drift_events("DriftOnly")[0]
+    assert event["renamed"] == {"emp_name": "emp_full_name"}
+    assert event["remapped"] == ["zq_flag"]
+    assert mapping_registry.list_versions("DriftOnly")[0]["mapping"]["work_site"] == "location"
@@ -0,0 +1,34 @@
+import source_registry as registry_module
+from source_registry import SourceRegistry
+
+
+def test_connect_is_idempotent_and_reconnect_updates_mode():
+    registry = SourceRegistry()
+
+    assert registry.connect("RegOnce", "incremental") is True
+    assert registry.connect("RegOnce", "full_refresh") is False
+    assert registry.get("RegOnce")["mode"] == "incremental"
+
+    assert registry.disconnect("RegOnce") is True
+    assert registry.disconnect("RegOnce") is False
+    assert registry.get("RegOnce") is None
+
+    assert registry.connect("RegOnce", "full_refresh") is True
+    assert registry.get("RegOnce")["mode"] == "full_refresh"
+    registry.disconnect("RegOnce")
+
+
+def test_other_workers_see_changes_once_their_cache_expires(monkeypatch):
+    writer, reader = SourceRegistry(), SourceRegistry()
+    monkeypatch.setattr(registry_module, "SOURCE_CACHE_TTL_SECONDS", 3600)
+    assert reader.get("RegShared") is None
+
+    writer.connect("RegShared")
+    # Still inside the reader's TTL, so it hasn't looked at the table yet
+    assert reader.get("RegShared") is None
+
+    monkeypatch.setattr(registry_module, "SOURCE_CACHE_TTL_SECONDS", 0)
+    assert reader.get("RegShared")["mode"] == "incremental"
+
+    writer.disconnect("RegShared")
+    assert "RegShared" not in {source["name"] for source in reader.all()}
@@ -0,0 +1,59 @@
+import pytest
+
+import sql_guard
+from database import readonly_engine
+from sql_guard import QueryRejected, QueryTimeout, check_statement, run_guarded
+
+
+def test_literal_semicolons_are_part_of_the_statement():
+    statement = "SELECT COUNT(*) FROM employees WHERE name = 'Smith; John' -- a; b\n;"
+    assert check_statement(statement) == "SELECT COUNT(*) FROM employees WHERE name = 'Smith; John' -- a; b"
+
+    columns, rows, truncated = run_guarded(readonly_engine, "SELECT 'a;b' AS v;")
+    assert (columns, rows, truncated) == (["v"], [("a;b",)], False)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; SELECT 2",
+    "SELECT 1; DELETE FROM employees",
+    "SELECT ';'; DROP TABLE employees;",
+])
+def test_multiple_statements_are_rejected(sql):
+    with pytest.raises(QueryRejected, match="single statement"):
+        check_statement(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM employees",
+    "UPDATE employees SET salary = 0",
+    "PRAGMA writable_schema = 1",
+])
+def test_write_statements_are_rejected(sql):
+    with pytest.raises(QueryRejected, match="Only SELECT"):
+        run_guarded(readonly_engine, sql)
+
+
+def test_write_behind_a_with_clause_is_rejected():
+    with pytest.raises(QueryRejected, match="read-only"):
+        run_guarded(readonly_engine, "WITH doomed AS (SELECT id FROM employees) DELETE FROM employees WHERE id IN doomed")
+
+    # The authorizer does not stay on the pooled connection
+    assert run_guarded(readonly_engine, "WITH one AS (SELECT 1 AS n) SELECT n FROM one")[1] == [(1,)]
+
+
+def test_nested_full_scans_are_rejected():
+    with pytest.raises(QueryRejected, match="full table scans"):
+        run_guarded(readonly_engine, "SELECT a.name, b.question FROM employees a, qa_logs b")
+
+
+def test_runaway_query_hits_the_budget(monkeypatch):
+    monkeypatch.setattr(sql_guard, "MAX_VM_STEPS", 100000)
+    runaway = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n"
+
+    with pytest.raises(QueryTimeout, match="VM steps"):
+        run_guarded(readonly_engine, runaway)
+
+    monkeypatch.setattr(sql_guard, "MAX_VM_STEPS", 10**12)
+    monkeypatch.setattr(sql_guard, "QUERY_TIMEOUT_SECONDS", 0.05)
+    with pytest.raises(QueryTimeout, match="wall-clock"):
+        run_guarded(readonly_engine, runaway)
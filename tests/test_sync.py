@@ -0,0 +1,87 @@
+import itertools
+
+import pytest
+from sqlalchemy import select
+
+import mapping_registry
+from database import SessionLocal
+from loaders.base_loader import BaseLoader
+from loaders.loader_registry import loader_registry
+from models import Employee, EmployeeChange
+from sync import sync_source
+
+MAPPING = {"id": "employee_id", "name": "name", "sal": "salary"}
+_source_numbers = itertools.count()
+
+
+class ListLoader(BaseLoader):
+    def __init__(self, source_name: str, frames: bool):
+        self.source_name = source_name
+        self.supports_frames = frames
+        self.records = []
+
+    def name(self):
+        return self.source_name
+
+    def load(self):
+        return list(self.records)
+
+
+@pytest.fixture(params=[False, True], ids=["records", "frames"])
+def loader(request, monkeypatch):
+    source_name = f"Refresh{next(_source_numbers)}"
+    loader = ListLoader(source_name, request.param)
+    monkeypatch.setitem(loader_registry.all(), source_name, loader)
+    mapping_registry.import_mappings([
+        {"source_name": source_name, "fields": list(MAPPING), "mapping": MAPPING, "status": "approved"},
+    ])
+    return loader
+
+
+def _rows(loader) -> dict:
+    db = SessionLocal()
+    try:
+        rows = db.scalars(select(Employee).where(Employee.source_name == loader.source_name)).all()
+        return {row.source_record_id: row.deleted_at is not None for row in rows}
+    finally:
+        db.close()
+
+
+def _ops(loader) -> list[tuple[str, str]]:
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(EmployeeChange.source_record_id, EmployeeChange.op)
+            .where(EmployeeChange.source_name == loader.source_name)
+            .order_by(EmployeeChange.seq)
+        ).all()
+    finally:
+        db.close()
+
+
+def test_full_refresh_tombstones_missing_rows_and_revives_returning_ones(loader):
+    loader.records = [{"id": "1", "name": "Ann", "sal": "100"}, {"id": "2", "name": "Bo", "sal": "200"}]
+    assert sync_source(loader.source_name, "full_refresh")["tombstoned"] == 0
+
+    loader.records = loader.records[:1]
+    result = sync_source(loader.source_name, "full_refresh")
+    assert (result["tombstoned"], result["unchanged"]) == (1, 1)
+    assert _rows(loader) == {"1": False, "2": True}
+
+    # Incremental syncs never delete, and a returning row comes back live
+    loader.records = [{"id": "2", "name": "Bo", "sal": "200"}]
+    assert "tombstoned" not in sync_source(loader.source_name)
+    assert _rows(loader) == {"1": False, "2": False}
+    assert [tuple(op) for op in _ops(loader)] == [("1", "insert"), ("2", "insert"), ("2", "delete"), ("2", "insert")]
+
+
+def test_full_refresh_with_rejected_rows_deletes_nothing(loader):
+    loader.records = [{"id": "1", "name": "Ann", "sal": "100"}, {"id": "2", "name": "Bo", "sal": "200"}]
+    sync_source(loader.source_name, "full_refresh")
+
+    # Row 2 is rejected rather than gone, so it may still exist upstream
+    loader.records = [{"id": "1", "name": "Ann", "sal": "100"}, {"id": "2", "name": "Bo", "sal": "lots"}]
+    result = sync_source(loader.source_name, "full_refresh")
+
+    assert (result["tombstoned"], result["rejected"]) == (0, 1)
+    assert _rows(loader) == {"1": False, "2": False}
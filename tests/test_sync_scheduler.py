@@ -0,0 +1,59 @@
+import pytest
+
+import loaders.sap_loader  # noqa: F401  registers FakeSAP
+import loaders.workday_loader  # noqa: F401  registers FakeWorkday
+import sync_scheduler
+from loaders.base_loader import BaseLoader
+from loaders.loader_registry import loader_registry
+from source_registry import source_registry
+from sync_scheduler import SyncScheduler, source_fingerprint
+
+
+@pytest.fixture
+def connected():
+    names = []
+
+    def connect(name: str):
+        source_registry.connect(name, "incremental")
+        names.append(name)
+
+    yield connect
+    for name in names:
+        source_registry.disconnect(name)
+
+
+def test_schedule_only_covers_connected_sources(connected):
+    scheduler = SyncScheduler()
+    scheduler._schedules = {"FakeSAP": 60.0, "FakeWorkday": 60.0}
+    connected("FakeSAP")
+
+    assert scheduler._sources() == {"FakeSAP": "incremental"}
+
+    source_registry.disconnect("FakeSAP")
+    assert scheduler._sources() == {}
+
+
+def test_default_interval_covers_every_connected_source(connected, monkeypatch):
+    monkeypatch.setattr(sync_scheduler, "SYNC_DEFAULT_INTERVAL_SECONDS", 300.0)
+    scheduler = SyncScheduler()
+    scheduler._schedules = {}
+    connected("FakeSAP")
+    connected("FakeWorkday")
+
+    assert scheduler._sources() == {"FakeSAP": "incremental", "FakeWorkday": "incremental"}
+
+
+class UnversionedLoader(BaseLoader):
+    def name(self):
+        return "Unversioned"
+
+    def load(self):
+        raise AssertionError("fingerprinting must not load the source")
+
+
+def test_loader_without_fingerprint_is_never_skipped(monkeypatch):
+    loader = UnversionedLoader()
+    monkeypatch.setitem(loader_registry.all(), loader.name(), loader)
+
+    assert source_fingerprint("Unversioned", "incremental") is None
+    assert source_fingerprint("FakeSAP", "incremental") == source_fingerprint("FakeSAP", "incremental")
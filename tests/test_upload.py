@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+import mapping_registry
+import upload_stream
+from coercion import coercer_registry
+from main import app
+
+HEADER = "emp_id,emp_name,emp_sal,emp_email_id"
+
+
+def _approve(source_name: str):
+    mapping = {"emp_id": "employee_id", "emp_name": "name", "emp_sal": "salary", "emp_email_id": "email"}
+    mapping_registry.import_mappings([
+        {"source_name": source_name, "fields": list(mapping), "mapping": mapping, "status": "approved"},
+    ])
+
+
+def _upload(source_name: str, body: str):
+    return TestClient(app).post(
+        "/upload-csv",
+        data={"source_name": source_name},
+        files={"file": ("people.csv", body.encode(), "text/csv")},
+    )
+
+
+def test_header_only_csv_is_rejected():
+    assert _upload("UploadHeaderOnly", HEADER + "\n").status_code == 400
+    assert _upload("UploadHeaderOnly", HEADER).status_code == 400
+
+
+def test_mapping_is_resolved_after_the_body_when_not_started_early(monkeypatch):
+    _approve("UploadLate")
+    monkeypatch.setattr(upload_stream.CSVUploadStream, "ready_for_mapping", property(lambda self: False))
+
+    response = _upload("UploadLate", HEADER + "\n1,Ann Lee,50000,ann@example.com\n2,Bo Chan,61000,bo@example.com\n")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["inserted"] == 2
+    # Normalised with the source's name, so its compiled coercers are kept for the next upload
+    assert "UploadLate" in coercer_registry.describe()
+
+
+def test_unapproved_header_is_a_conflict():
+    response = _upload("UploadUnreviewed", HEADER + "\n1,Ann Lee,50000,ann@example.com\n")
+
+    assert response.status_code == 409
+    assert "pending review" in response.json()["detail"]
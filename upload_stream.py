@@ -0,0 +1,150 @@
+import csv
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # older python-multipart releases
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Rows beyond this many bytes spill from memory to a temp file while the mapping resolves
+UPLOAD_SPILL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPILL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Documents the hand-parsed multipart body for Swagger UI
+UPLOAD_CSV_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["source_name", "file"],
+                    "properties": {
+                        "source_name": {"type": "string"},
+                        "file": {"type": "string", "format": "binary"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+class UploadError(ValueError):
+    pass
+
+
+class CSVUploadStream:
+    """Parses a multipart CSV upload chunk by chunk.
+
+    The CSV header is available as soon as its first line has arrived, so field mapping can start
+    while the rest of the body is still streaming into a bounded spill file."""
+
+    def __init__(self, content_type: str):
+        media_type, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data upload")
+
+        self.source_name = None
+        self.file_content_type = None
+        self.header = None
+        self.size = 0
+        self.spill = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPILL_MEMORY_BYTES)
+
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part = None
+        self._field_value = b""
+        self._first_line = b""
+        self._has_file = False
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    @property
+    def ready_for_mapping(self) -> bool:
+        return self.source_name is not None and self.header is not None
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._field_value = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._part = options.get(b"name", b"").decode()
+
+        if self._part == "file":
+            self._has_file = True
+            self.file_content_type = self._headers.get(b"content-type", b"").decode()
+            if self.file_content_type != "text/csv":
+                raise UploadError("Only CSV files are allowed")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        chunk = data[start:end]
+        if self._part != "file":
+            self._field_value += chunk
+            return
+
+        self.spill.write(chunk)
+        if self.header is None:
+            self._first_line += chunk
+            newline = self._first_line.find(b"\n")
+            if newline != -1:
+                line = self._first_line[:newline].decode("utf-8-sig").rstrip("\r")
+                self.header = next(csv.reader([line]))
+                self._first_line = b""
+
+    def _on_part_end(self):
+        if self._part == "source_name":
+            self.source_name = self._field_value.decode().strip()
+        elif self._part == "file" and self.header is None and self._first_line.strip():
+            # Header-only file without a trailing newline
+            self.header = next(csv.reader([self._first_line.decode("utf-8-sig").rstrip("\r")]))
+        self._part = None
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise UploadError(f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+        self._parser.write(chunk)
+
+    def finish(self):
+        self._parser.finalize()
+        if not self.source_name:
+            raise UploadError("source_name is required")
+        if not self._has_file:
+            raise UploadError("file is required")
+        self.spill.seek(0)
+
+    def frame(self) -> pd.DataFrame:
+        # Everything as text; type coercion happens in the normaliser
+        try:
+            return pd.read_csv(self.spill, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        except pd.errors.EmptyDataError:
+            return pd.DataFrame()
+
+    def close(self):
+        self.spill.close()